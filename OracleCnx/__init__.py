@@ -1,3 +1,26 @@
-from .oracle_cnx import ConnectionDB as CnxOracle
-from .oracle_pool import PoolDB as PoolOracle
-from .oracle_async import AsyncDB as AsyncOracle
+"""
+Las clases se importan al primer uso, para que importar el paquete no cargue el driver de Oracle ni
+asyncio en procesos que solo usan una de ellas.
+"""
+import importlib
+
+_EXPORTS = {
+    'CnxOracle': ('.oracle_cnx', 'ConnectionDB'),
+    'PoolOracle': ('.oracle_pool', 'PoolDB'),
+    'AsyncOracle': ('.oracle_async', 'AsyncDB'),
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module, attribute = _EXPORTS[name]
+    value = getattr(importlib.import_module(module, __name__), attribute)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
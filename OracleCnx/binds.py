@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Parámetros de tipo lista enlazados como colecciones de Oracle (SYS.ODCINUMBERLIST, SYS.ODCIVARCHAR2LIST,
+SYS.ODCIDATELIST o un tipo propio) para usarlos con TABLE(:ids) en un texto SQL único, sin importar
+cuántos valores traiga la lista.
+
+@author: Jhonatan Martínez
+"""
+
+import datetime
+import decimal
+import threading
+from itertools import product
+from typing import Dict, List, Optional, Sequence, Tuple
+from OracleCnx.constants import *
+
+# Tipos de objeto por usuario, base de datos y nombre, compartidos por las sesiones de un mismo pool:
+# gettype es un viaje a la base de datos.
+_types = {}
+_types_lock = threading.Lock()
+
+
+class Collection:
+    """ Lista de valores para enlazar con un tipo de colección propio en lugar del tipo SYS.ODCI* que
+    se deduce de los valores."""
+
+    def __init__(self, values: Sequence, type_name: Optional[str] = None) -> None:
+        """Constructor.
+
+        Args:
+            values (Sequence): Valores de la colección.
+            type_name (str, optional): Tipo de colección, por ejemplo 'MY_SCHEMA.ID_LIST'; por defecto
+                SYS.ODCINUMBERLIST, SYS.ODCIVARCHAR2LIST o SYS.ODCIDATELIST según los valores.
+        """
+        self.values = list(values)
+        self.type_name = type_name
+
+    def __repr__(self) -> str:
+        return f"Collection({self.values!r}, type_name={self.type_name!r})"
+
+
+def is_collection(value) -> bool:
+    """True si el valor de un parámetro se enlaza como colección."""
+    return isinstance(value, (list, tuple, set, frozenset, Collection))
+
+
+def is_plsql(query: str) -> bool:
+    """True si la sentencia es un bloque PL/SQL, donde las listas son arreglos asociativos de cx_Oracle."""
+    return query.lstrip().lower().startswith(('begin', 'declare', 'call'))
+
+
+def has_collections(query: Optional[str], parameters) -> bool:
+    """Indicar si una consulta tiene parámetros con nombre de tipo lista para enlazar como colección.
+
+    Args:
+        query (str, optional): Consulta; None si el cursor ya tiene la consulta preparada.
+        parameters: Parámetros de la consulta.
+
+    Returns:
+        bool: True si hay al menos un parámetro de tipo lista.
+    """
+    if not isinstance(parameters, dict) or (query is not None and is_plsql(query)):
+        return False
+    return any(is_collection(value) for value in parameters.values())
+
+
+def collection_type_name(values: List) -> str:
+    """Deducir el tipo SYS.ODCI* de una lista a partir de sus valores.
+
+    Args:
+        values (List): Valores de la lista.
+
+    Returns:
+        str: Nombre del tipo de colección.
+    """
+    sample = next((value for value in values if value is not None), None)
+    if sample is None or isinstance(sample, (bool, int, float, decimal.Decimal)):
+        return COLLECTION_NUMBER_TYPE
+    if isinstance(sample, str):
+        return COLLECTION_VARCHAR_TYPE
+    if isinstance(sample, (datetime.date, datetime.datetime)):
+        return COLLECTION_DATE_TYPE
+    raise ValueError(f"{INVALID_COLLECTION} {type(sample).__name__}")
+
+
+def _object_type(cnx, type_name: str):
+    """Obtener un tipo de objeto de la base de datos, guardado para no repetir el viaje de gettype."""
+    key = (getattr(cnx, 'username', None), getattr(cnx, 'dsn', None), type_name.upper())
+    with _types_lock:
+        object_type = _types.get(key)
+    if object_type is None:
+        object_type = cnx.gettype(type_name)
+        with _types_lock:
+            _types[key] = object_type
+    return object_type
+
+
+def _collection_values(value) -> Tuple[Optional[str], List]:
+    """Tipo propio (o None) y valores de un parámetro de tipo lista."""
+    if isinstance(value, Collection):
+        return value.type_name, value.values
+    return None, list(value)
+
+
+def bind_collections(cnx, query: Optional[str], parameters, chunk_size: int = COLLECTION_CHUNK_SIZE) -> List:
+    """Convertir los parámetros de tipo lista de una consulta en colecciones de Oracle, dividiendo las
+    listas más grandes que chunk_size.
+
+    Solo para lecturas donde cada lista es un filtro IN puro, en conjunción con el resto de la condición:
+    col IN (SELECT column_value FROM TABLE(:x)). Si hay varias listas divididas se combinan todos sus
+    bloques y los resultados se concatenan, así que cada fila que cumple la condición aparece en exactamente
+    una combinación. Al dividir se eliminan los valores repetidos para que una fila no aparezca en dos
+    bloques. Con NOT IN, agregaciones, ORDER BY o ROWNUM el resultado por bloques no es el de la consulta
+    completa: en esos casos se usa una Collection con un tipo propio de tabla anidada, que no se divide.
+
+    Args:
+        cnx: Conexión donde se crean las colecciones.
+        query (str, optional): Consulta; None si el cursor ya tiene la consulta preparada.
+        parameters: Parámetros de la consulta.
+        chunk_size (int, optional): Valores máximos por colección de los tipos SYS.ODCI*.
+
+    Returns:
+        List: Parámetros para cada ejecución; una sola ejecución con los parámetros originales si no hay listas.
+    """
+    if not has_collections(query, parameters):
+        return [parameters]
+    options: Dict[str, List] = {}
+    for name, value in parameters.items():
+        if not is_collection(value):
+            options[name] = [value]
+            continue
+        type_name, values = _collection_values(value)
+        object_type = _object_type(cnx, type_name or collection_type_name(values))
+        if type_name is not None:
+            options[name] = [object_type.newobject(values)]
+            continue
+        if len(values) > chunk_size:
+            values = list(dict.fromkeys(values))
+        options[name] = [object_type.newobject(values[start:start + chunk_size])
+                         for start in range(0, max(len(values), 1), chunk_size)]
+    names = list(options)
+    return [dict(zip(names, combination)) for combination in product(*options.values())]
+
+
+def bind_statement(cnx, query: Optional[str], parameters, chunk_size: int = COLLECTION_CHUNK_SIZE):
+    """Convertir los parámetros de tipo lista de una sentencia DML en colecciones de Oracle, sin dividirlas:
+    la sentencia se ejecuta una sola vez con cada lista completa.
+
+    Args:
+        cnx: Conexión donde se crean las colecciones.
+        query (str, optional): Sentencia; None si el cursor ya tiene la sentencia preparada.
+        parameters: Parámetros de la sentencia.
+        chunk_size (int, optional): Valores máximos de los tipos SYS.ODCI*.
+
+    Returns:
+        Parámetros de la ejecución; los originales si no hay listas.
+
+    Raises:
+        ValueError: Si una lista de un tipo SYS.ODCI* tiene más de chunk_size valores; una Collection con un
+            tipo propio de tabla anidada no tiene ese límite.
+    """
+    if not has_collections(query, parameters):
+        return parameters
+    bound = {}
+    for name, value in parameters.items():
+        if not is_collection(value):
+            bound[name] = value
+            continue
+        type_name, values = _collection_values(value)
+        if type_name is None and len(values) > chunk_size:
+            raise ValueError(f"{COLLECTION_TOO_LARGE} {name} ({len(values)})")
+        bound[name] = _object_type(cnx, type_name or collection_type_name(values)).newobject(values)
+    return bound
+
+
+def merge_results(results: List, datatype: str):
+    """Unir los resultados de las ejecuciones por bloque de una consulta.
+
+    Args:
+        results (List): Resultado de cada bloque con el mismo datatype.
+        datatype (str): 'dict', 'list', 'columnar', 'numpy' o 'pandas'.
+
+    Returns:
+        Resultado único con el formato solicitado.
+    """
+    if len(results) == 1:
+        return results[0]
+    if datatype == 'list':
+        return [results[0][0], [row for result in results for row in result[1]]]
+    if datatype == 'columnar':
+        merged = results[0]
+        for result in results[1:]:
+            for name, column in result.items():
+                merged[name].merge(column)
+        return merged
+    if datatype == 'numpy':
+        import numpy as np
+
+        merged = {}
+        for name in results[0]:
+            arrays = [result[name] for result in results]
+            masked = any(isinstance(values, np.ma.MaskedArray) for values in arrays)
+            merged[name] = np.ma.concatenate(arrays) if masked else np.concatenate(arrays)
+        return merged
+    if datatype == 'pandas':
+        import pandas as pd
+
+        return pd.concat(results, ignore_index=True)
+    return [row for result in results for row in result]
+
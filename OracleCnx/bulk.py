@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Carga masiva por bloques sobre executemany, tolerante a errores por fila.
+
+@author: Jhonatan Martínez
+"""
+
+import datetime
+import time
+from itertools import islice
+from typing import Dict, Iterable, List, Optional
+from loguru import logger
+from OracleCnx.constants import *
+from OracleCnx.driver import oracle
+
+
+class BulkLoadResult:
+    """ Resultado de una carga masiva."""
+
+    def __init__(self) -> None:
+        self.rows_loaded: int = 0
+        self.rejected: List = []
+        self.batches: List[Dict] = []
+        self.arraydmlrowcounts: List[int] = []
+        self.seconds: float = 0.0
+        self.error: Optional[str] = None
+
+    @property
+    def rows_rejected(self) -> int:
+        """Cantidad de filas rechazadas."""
+        return len(self.rejected)
+
+    @property
+    def ok(self) -> bool:
+        """True si la carga terminó sin un error general (puede tener filas rechazadas)."""
+        return self.error is None
+
+    def __repr__(self) -> str:
+        return (f"BulkLoadResult(rows_loaded={self.rows_loaded}, rows_rejected={self.rows_rejected}, "
+                f"batches={len(self.batches)}, seconds={self.seconds:.3f}, error={self.error!r})")
+
+
+def _bind_type(values: List):
+    """Obtener el tipo o tamaño para setinputsizes a partir de los valores de una columna.
+
+    Args:
+        values (List): Valores de la columna en el primer bloque.
+
+    Returns:
+        Tipo de Oracle, tamaño máximo para textos o None para dejar el tipo por defecto.
+    """
+    sample = next((value for value in values if value is not None), None)
+    if sample is None:
+        return None
+    if isinstance(sample, str):
+        longest = max(len(value) for value in values if value is not None)
+        # Margen para bloques siguientes con textos más largos; el driver amplía el buffer si hace falta.
+        size = 16
+        while size < longest:
+            size *= 2
+        return min(size, MAX_STRING_BIND)
+    if isinstance(sample, bool) or isinstance(sample, (int, float)):
+        return oracle.DB_TYPE_NUMBER
+    if isinstance(sample, datetime.datetime):
+        return oracle.DB_TYPE_TIMESTAMP
+    if isinstance(sample, datetime.date):
+        return oracle.DB_TYPE_DATE
+    if isinstance(sample, bytes):
+        return oracle.DB_TYPE_RAW if len(sample) <= MAX_RAW_BIND else oracle.DB_TYPE_BLOB
+    return None
+
+
+def set_input_sizes(cursor, batch: List) -> None:
+    """Declarar los tipos de los parámetros a partir del primer bloque para que el driver no tenga
+    que recorrer cada bloque para calcularlos.
+
+    Args:
+        cursor: Cursor con la sentencia preparada.
+        batch (List): Primer bloque de filas (tuplas o diccionarios).
+    """
+    if isinstance(batch[0], dict):
+        sizes = {name: _bind_type([row.get(name) for row in batch]) for name in batch[0]}
+        cursor.setinputsizes(**sizes)
+    else:
+        cursor.setinputsizes(*[_bind_type(list(values)) for values in zip(*batch)])
+
+
+def bulk_load(cnx, query: str, rows: Iterable, batch_size: int = BATCH_SIZE, commit_every: int = 0) -> BulkLoadResult:
+    """Cargar filas en bloques de tamaño fijo con executemany(batcherrors=True).
+
+    Las filas con error se registran en el resultado y no detienen la carga.
+
+    Args:
+        cnx: Conexión a la base de datos.
+        query (str): Sentencia INSERT/UPDATE/MERGE con parámetros.
+        rows (Iterable): Filas a cargar; puede ser un generador.
+        batch_size (int, optional): Filas por executemany.
+        commit_every (int, optional): Hacer commit cada vez que se carguen al menos esta cantidad de filas;
+            0 para hacer un solo commit al final.
+
+    Returns:
+        BulkLoadResult: Filas cargadas, filas rechazadas con su error, tiempos por bloque y arraydmlrowcounts.
+    """
+    result = BulkLoadResult()
+    start = time.perf_counter()
+    iterator = iter(rows)
+    pending = 0
+    try:
+        with cnx.cursor() as cursor:
+            cursor.prepare(query)
+            number = 0
+            while True:
+                batch = list(islice(iterator, batch_size))
+                if not batch:
+                    break
+                if number == 0:
+                    set_input_sizes(cursor, batch)
+                batch_start = time.perf_counter()
+                cursor.executemany(None, batch, batcherrors=True, arraydmlrowcounts=True)
+                errors = cursor.getbatcherrors()
+                rowcounts = cursor.getarraydmlrowcounts()
+                for error in errors:
+                    result.rejected.append((batch[error.offset], error.message))
+                loaded = len(batch) - len(errors)
+                result.rows_loaded += loaded
+                result.arraydmlrowcounts.extend(rowcounts)
+                pending += loaded
+                if commit_every and pending >= commit_every:
+                    cnx.commit()
+                    pending = 0
+                result.batches.append({
+                    'batch': number,
+                    'rows': len(batch),
+                    'rejected': len(errors),
+                    'seconds': time.perf_counter() - batch_start,
+                })
+                number += 1
+        cnx.commit()
+    except (oracle.DatabaseError, Exception) as exc:
+        # Lo ya confirmado con commit_every se conserva; lo pendiente se revierte.
+        result.error = str(exc)
+        result.rows_loaded -= pending
+        logger.error(f"Error en query {query}: {str(exc)}", exc_info=True)
+        try:
+            cnx.rollback()
+        except (oracle.DatabaseError, Exception) as rollback_exc:
+            logger.error(str(rollback_exc), exc_info=True)
+    result.seconds = time.perf_counter() - start
+    return result
@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+"""
+Caché en memoria de resultados de consultas con TTL, desalojo LRU por bytes, deduplicación de
+consultas simultáneas (single-flight) e invalidación por etiqueta o por tabla.
+
+@author: Jhonatan Martínez
+"""
+
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+from OracleCnx.constants import *
+from OracleCnx.columnar import Column
+
+# Tablas referenciadas por una consulta o modificadas por una sentencia DML. Las listas del FROM
+# (FROM a x, b y) se leen completas; INSERT ALL tiene un INTO por tabla destino.
+TABLE_NAME = r"[A-Z0-9_$#\"]+(?:\.[A-Z0-9_$#\"]+)?"
+TABLE_PATTERN = re.compile(r"\b(?:JOIN|INTO|UPDATE|MERGE\s+INTO|DELETE(?:\s+FROM)?|TRUNCATE\s+TABLE)\s+"
+                           rf"({TABLE_NAME})", re.IGNORECASE)
+FROM_PATTERN = re.compile(rf"\bFROM\s+({TABLE_NAME}(?:\s+\w+)?(?:\s*,\s*{TABLE_NAME}(?:\s+\w+)?)*)",
+                          re.IGNORECASE)
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(query: str) -> str:
+    """Normalizar el texto SQL para usarlo como llave del caché.
+
+    Args:
+        query (str): Consulta.
+
+    Returns:
+        str: Consulta sin espacios repetidos ni punto y coma final.
+    """
+    return WHITESPACE.sub(" ", query).strip().rstrip(";")
+
+
+def find_tables(query: str) -> Set[str]:
+    """Obtener los nombres de las tablas que aparecen en una sentencia.
+
+    La búsqueda es por patrones, no un parser de SQL: las tablas que no encuentra (vistas que ocultan otras
+    tablas, sinónimos, SQL dinámico dentro de PL/SQL, ...) se deben invalidar con etiquetas explícitas.
+
+    Args:
+        query (str): Sentencia SQL.
+
+    Returns:
+        Set[str]: Nombres de tablas en mayúscula, sin esquema.
+    """
+    names = TABLE_PATTERN.findall(query)
+    for tables in FROM_PATTERN.findall(query):
+        # Cada elemento de la lista es "tabla [alias]".
+        names.extend(table.split()[0] for table in tables.split(',') if table.strip())
+    return {name.replace('"', '').split('.')[-1].upper() for name in names}
+
+
+def estimate_size(value) -> int:
+    """Estimar el tamaño en bytes de un resultado.
+
+    Args:
+        value: Resultado de read_data.
+
+    Returns:
+        int: Bytes aproximados.
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, Column):
+        size += sys.getsizeof(value.values) + sys.getsizeof(value.validity)
+        if value.kind == 'object':
+            size += sum(estimate_size(item) for item in value.values)
+    elif isinstance(value, dict):
+        size += sum(estimate_size(key) + estimate_size(item) for key, item in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(estimate_size(item) for item in value)
+    return size
+
+
+class _Entry:
+    __slots__ = ('value', 'size', 'expires', 'tags')
+
+    def __init__(self, value, size: int, expires: float, tags: Set[str]) -> None:
+        self.value = value
+        self.size = size
+        self.expires = expires
+        self.tags = tags
+
+
+class ResultCache:
+    """ Caché de resultados de consultas compartible entre ConnectionDB, PoolDB y AsyncDB.
+
+    Los resultados se entregan tal como se guardaron, sin copiarlos: no se deben modificar.
+    """
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES, default_ttl: float = CACHE_TTL) -> None:
+        """Constructor.
+
+        Args:
+            max_bytes (int, optional): Bytes máximos del caché; al superarlos se desalojan los resultados
+                usados hace más tiempo.
+            default_ttl (float, optional): Segundos de vida por defecto de cada resultado.
+
+        Returns:
+            None.
+        """
+        self.__max_bytes = max_bytes
+        self.__default_ttl = default_ttl
+        self.__entries: "OrderedDict[Tuple, _Entry]" = OrderedDict()
+        self.__bytes = 0
+        self.__lock = threading.Lock()
+        self.__flights: Dict[Tuple, threading.Event] = {}
+        self.__async_flights: Dict[Tuple, "asyncio.Future"] = {}
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+        self.__invalidations = 0
+        # Cambia con cada invalidación: una carga que empezó antes no guarda su resultado, que puede ser viejo.
+        self.__generation = 0
+
+    @staticmethod
+    def make_key(query: str, parameters, datatype: str, rowfactory: Optional[Callable] = None) -> Tuple:
+        """Construir la llave de un resultado con el SQL normalizado, los parámetros y el datatype.
+
+        Args:
+            query (str): Consulta.
+            parameters: Parámetros de la consulta.
+            datatype (str): Tipo de datos solicitado.
+            rowfactory (Callable, optional): Función de las filas; los resultados de funciones distintas no se
+                comparten.
+
+        Returns:
+            Tuple: Llave del caché.
+        """
+        if isinstance(parameters, dict):
+            parameters = tuple(sorted((str(key), repr(value)) for key, value in parameters.items()))
+        elif parameters:
+            parameters = tuple(repr(value) for value in parameters)
+        else:
+            parameters = ()
+        return normalize_sql(query), parameters, datatype, rowfactory
+
+    def get(self, key: Tuple) -> Tuple[bool, object]:
+        """Obtener un resultado vigente.
+
+        Args:
+            key (Tuple): Llave del resultado.
+
+        Returns:
+            Tuple[bool, object]: (True, valor) si existe y no ha expirado, (False, None) en caso contrario.
+        """
+        found, value = self.__lookup(key)
+        self.__record(found)
+        return found, value
+
+    def set(self, key: Tuple, value, ttl: Optional[float] = None, tags: Iterable[str] = ()) -> None:
+        """Guardar un resultado.
+
+        Args:
+            key (Tuple): Llave del resultado.
+            value: Resultado a guardar.
+            ttl (float, optional): Segundos de vida; por defecto default_ttl.
+            tags (Iterable[str], optional): Etiquetas para invalidar el resultado; las tablas que find_tables no
+                encuentra en la consulta se deben indicar aquí.
+        """
+        self.__store(key, value, ttl, tags, None)
+
+    def get_or_load(self, key: Tuple, loader: Callable, ttl: Optional[float] = None, tags: Iterable[str] = ()):
+        """Obtener un resultado o cargarlo con loader. Si varios hilos piden la misma llave a la vez,
+        solo uno ejecuta loader y los demás esperan su resultado.
+
+        Args:
+            key (Tuple): Llave del resultado.
+            loader (Callable): Función sin argumentos que consulta la base de datos.
+            ttl (float, optional): Segundos de vida del resultado.
+            tags (Iterable[str], optional): Etiquetas para invalidar el resultado.
+
+        Returns:
+            Resultado de la consulta.
+        """
+        while True:
+            found, value = self.__lookup(key)
+            if found:
+                self.__record(True)
+                return value
+            with self.__lock:
+                flight = self.__flights.get(key)
+                if flight is None:
+                    flight = self.__flights[key] = threading.Event()
+                    self.__misses += 1
+                    generation = self.__generation
+                    break
+            flight.wait()
+            # Si el líder falló o el resultado no se guardó, se vuelve a intentar.
+        try:
+            value = loader()
+            self.__store(key, value, ttl, tags, generation)
+            return value
+        finally:
+            with self.__lock:
+                self.__flights.pop(key, None)
+            flight.set()
+
+    async def get_or_load_async(self, key: Tuple, loader: Callable, ttl: Optional[float] = None,
+                                tags: Iterable[str] = ()):
+        """Versión asíncrona de get_or_load; loader es una función que retorna un awaitable.
+
+        Args:
+            key (Tuple): Llave del resultado.
+            loader (Callable): Función sin argumentos que retorna la corrutina de consulta.
+            ttl (float, optional): Segundos de vida del resultado.
+            tags (Iterable[str], optional): Etiquetas para invalidar el resultado.
+
+        Returns:
+            Resultado de la consulta.
+        """
+        # asyncio se importa aquí para que los clientes síncronos no lo carguen.
+        import asyncio
+
+        while True:
+            found, value = self.__lookup(key)
+            if found:
+                self.__record(True)
+                return value
+            flight = self.__async_flights.get(key)
+            if flight is None:
+                break
+            try:
+                value = await asyncio.shield(flight)
+                self.__record(True)
+                return value
+            except asyncio.CancelledError:
+                # Solo se propaga si la cancelada es esta tarea; si fue el líder, se vuelve a intentar.
+                task = asyncio.current_task()
+                if not flight.cancelled() or (hasattr(task, 'cancelling') and task.cancelling()):
+                    raise
+            except Exception:
+                # El líder falló: se vuelve a intentar, como en get_or_load.
+                pass
+        self.__record(False)
+        flight = self.__async_flights[key] = asyncio.get_running_loop().create_future()
+        with self.__lock:
+            generation = self.__generation
+        try:
+            value = await loader()
+            self.__store(key, value, ttl, tags, generation)
+            flight.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except Exception as exc:
+            flight.set_exception(exc)
+            # Evita el aviso de excepción no recuperada cuando nadie más esperaba.
+            flight.exception()
+            raise
+        finally:
+            self.__async_flights.pop(key, None)
+
+    def invalidate(self, tags: Iterable[str] = (), tables: Iterable[str] = ()) -> int:
+        """Eliminar los resultados asociados a etiquetas o tablas.
+
+        Args:
+            tags (Iterable[str], optional): Etiquetas a invalidar.
+            tables (Iterable[str], optional): Tablas a invalidar.
+
+        Returns:
+            int: Cantidad de resultados eliminados.
+        """
+        targets = {tag.upper() for tag in tags} | {f"TABLE:{table.split('.')[-1].upper()}" for table in tables}
+        if not targets:
+            return 0
+        with self.__lock:
+            self.__generation += 1
+            keys = [key for key, entry in self.__entries.items() if entry.tags & targets]
+            for key in keys:
+                self.__remove(key)
+            self.__invalidations += len(keys)
+            return len(keys)
+
+    def invalidate_query(self, query: str) -> int:
+        """Invalidar los resultados de las tablas modificadas por una sentencia DML.
+
+        Args:
+            query (str): Sentencia ejecutada.
+
+        Returns:
+            int: Cantidad de resultados eliminados.
+        """
+        return self.invalidate(tables=find_tables(query))
+
+    def clear(self) -> None:
+        """Eliminar todos los resultados."""
+        with self.__lock:
+            self.__generation += 1
+            self.__entries.clear()
+            self.__bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Obtener las estadísticas del caché.
+
+        Returns:
+            Dict[str, float]: hits, misses, hit_ratio, evictions, invalidations, entries y bytes.
+        """
+        with self.__lock:
+            requests = self.__hits + self.__misses
+            return {
+                'hits': self.__hits,
+                'misses': self.__misses,
+                'hit_ratio': self.__hits / requests if requests else 0.0,
+                'evictions': self.__evictions,
+                'invalidations': self.__invalidations,
+                'entries': len(self.__entries),
+                'bytes': self.__bytes,
+            }
+
+    def __lookup(self, key: Tuple) -> Tuple[bool, object]:
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None and entry.expires > time.monotonic():
+                self.__entries.move_to_end(key)
+                return True, entry.value
+            if entry is not None:
+                self.__remove(key)
+            return False, None
+
+    def __record(self, hit: bool) -> None:
+        with self.__lock:
+            if hit:
+                self.__hits += 1
+            else:
+                self.__misses += 1
+
+    def __remove(self, key: Tuple) -> None:
+        entry = self.__entries.pop(key, None)
+        if entry is not None:
+            self.__bytes -= entry.size
+
+    def __store(self, key: Tuple, value, ttl: Optional[float], tags: Iterable[str],
+                generation: Optional[int]) -> None:
+        if value is None:
+            return
+        size = estimate_size(value)
+        if size > self.__max_bytes:
+            return
+        # Las tablas de la consulta también sirven como etiquetas de invalidación.
+        all_tags = {tag.upper() for tag in tags} | {f"TABLE:{table}" for table in find_tables(key[0])}
+        entry = _Entry(value, size, time.monotonic() + (self.__default_ttl if ttl is None else ttl), all_tags)
+        with self.__lock:
+            if generation is not None and generation != self.__generation:
+                # Hubo una invalidación mientras se cargaba el resultado.
+                return
+            self.__remove(key)
+            self.__entries[key] = entry
+            self.__bytes += size
+            while self.__bytes > self.__max_bytes and self.__entries:
+                self.__remove(next(iter(self.__entries)))
+                self.__evictions += 1
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+Lectura de resultados por columnas: cada columna se llena directamente en un arreglo tipado a partir
+de cursor.description, sin crear un diccionario por fila.
+
+@author: Jhonatan Martínez
+"""
+
+import datetime
+from array import array
+from typing import Dict, List, Optional
+from OracleCnx.driver import oracle
+from OracleCnx.metrics import QueryMetrics, timed
+from OracleCnx.utils import fetch_batches, get_columns
+
+EPOCH = datetime.datetime(1970, 1, 1)
+MICROSECOND = datetime.timedelta(microseconds=1)
+
+# Códigos de array.array por tipo de columna; las columnas 'object' se guardan en una lista.
+TYPECODES = {'int64': 'q', 'float64': 'd', 'datetime64[us]': 'q'}
+
+
+class Column:
+    """Columna de un resultado con sus valores en un buffer tipado y una máscara de validez.
+
+    Los buffers de tipo int64/float64/datetime64[us] son array.array, compatibles con el protocolo de
+    buffer (numpy.frombuffer, pyarrow.py_buffer). En validity un 1 indica un valor y un 0 un NULL.
+    """
+
+    __slots__ = ('name', 'kind', 'values', 'validity')
+
+    def __init__(self, name: str, kind: str) -> None:
+        self.name = name
+        self.kind = kind
+        self.values = array(TYPECODES[kind]) if kind in TYPECODES else []
+        self.validity = bytearray()
+
+    def __len__(self) -> int:
+        return len(self.validity)
+
+    def extend(self, items) -> None:
+        """Agregar un bloque de valores a la columna.
+
+        Args:
+            items: Valores de la columna para un bloque de filas.
+        """
+        self.validity.extend(0 if item is None else 1 for item in items)
+        if self.kind == 'int64':
+            self.values.extend(0 if item is None else int(item) for item in items)
+        elif self.kind == 'float64':
+            self.values.extend(0.0 if item is None else float(item) for item in items)
+        elif self.kind == 'datetime64[us]':
+            self.values.extend(0 if item is None else (item - EPOCH) // MICROSECOND for item in items)
+        else:
+            self.values.extend(items)
+
+    def merge(self, other: "Column") -> None:
+        """Agregar al final los valores de otra columna del mismo tipo.
+
+        Args:
+            other (Column): Columna con los valores a agregar.
+        """
+        self.values.extend(other.values)
+        self.validity.extend(other.validity)
+
+    def to_list(self) -> List:
+        """Obtener los valores de la columna como lista, con None para los NULL.
+
+        Returns:
+            List: Valores de la columna.
+        """
+        if self.kind == 'object':
+            return list(self.values)
+        if self.kind == 'datetime64[us]':
+            return [EPOCH + value * MICROSECOND if valid else None
+                    for value, valid in zip(self.values, self.validity)]
+        return [value if valid else None for value, valid in zip(self.values, self.validity)]
+
+
+def column_kind(column) -> str:
+    """Obtener el tipo de arreglo adecuado para una columna de cursor.description.
+
+    Args:
+        column: Descripción de la columna.
+
+    Returns:
+        str: 'int64', 'float64', 'datetime64[us]' u 'object'.
+    """
+    # column_name, type_code, display_size, internal_size, precision, scale, null_ok = column
+    type_code, precision, scale = column[1], column[4], column[5]
+    if type_code == oracle.DB_TYPE_NUMBER:
+        if scale == 0:
+            # NUMBER(p, 0) cabe en int64 solo si tiene hasta 18 dígitos; los enteros más grandes o sin
+            # precisión conocida (INTEGER es NUMBER(38)) quedan como int de Python para no perder dígitos.
+            return 'int64' if 0 < (precision or 0) <= 18 else 'object'
+        return 'float64'
+    if type_code in (oracle.DB_TYPE_BINARY_DOUBLE, oracle.DB_TYPE_BINARY_FLOAT):
+        return 'float64'
+    if type_code in (oracle.DB_TYPE_DATE, oracle.DB_TYPE_TIMESTAMP,
+                     oracle.DB_TYPE_TIMESTAMP_LTZ, oracle.DB_TYPE_TIMESTAMP_TZ):
+        return 'datetime64[us]'
+    return 'object'
+
+
+def fetch_columnar(cursor, batch_size: int) -> Dict[str, Column]:
+    """Obtener todas las filas de un cursor ya ejecutado llenando un arreglo por columna.
+
+    Args:
+        cursor: Cursor con la consulta ejecutada.
+        batch_size (int): Cantidad de filas por fetchmany.
+
+    Returns:
+        Dict[str, Column]: Columnas del resultado en el orden de la consulta.
+    """
+    columns = [Column(name, column_kind(column))
+               for name, column in zip(get_columns(cursor.description), cursor.description)]
+    for rows in fetch_batches(cursor, batch_size):
+        for column, items in zip(columns, zip(*rows)):
+            column.extend(items)
+    return {column.name: column for column in columns}
+
+
+def to_numpy(columns: Dict[str, Column]) -> Dict:
+    """Convertir las columnas a arreglos de numpy; las columnas con NULL se devuelven como MaskedArray.
+
+    Args:
+        columns (Dict[str, Column]): Columnas obtenidas con fetch_columnar.
+
+    Returns:
+        Dict: Arreglos de numpy por nombre de columna.
+    """
+    import numpy as np
+
+    arrays = {}
+    for name, column in columns.items():
+        if column.kind == 'object':
+            values = np.array(column.values, dtype=object)
+        else:
+            values = np.frombuffer(column.values, dtype='int64' if column.kind != 'float64' else 'float64')
+            if column.kind == 'datetime64[us]':
+                values = values.view('datetime64[us]')
+        mask = np.frombuffer(bytes(column.validity), dtype=np.uint8) == 0
+        arrays[name] = np.ma.MaskedArray(values, mask=mask) if mask.any() else values
+    return arrays
+
+
+def to_pandas(columns: Dict[str, Column]):
+    """Convertir las columnas a un DataFrame de pandas con tipos que admiten NULL.
+
+    Args:
+        columns (Dict[str, Column]): Columnas obtenidas con fetch_columnar.
+
+    Returns:
+        pandas.DataFrame: Resultado de la consulta.
+    """
+    import numpy as np
+    import pandas as pd
+
+    data = {}
+    for name, column in columns.items():
+        mask = np.frombuffer(bytes(column.validity), dtype=np.uint8) == 0
+        if column.kind == 'int64':
+            data[name] = pd.arrays.IntegerArray(np.frombuffer(column.values, dtype='int64').copy(), mask)
+        elif column.kind == 'float64':
+            data[name] = pd.arrays.FloatingArray(np.frombuffer(column.values, dtype='float64').copy(), mask)
+        elif column.kind == 'datetime64[us]':
+            values = np.frombuffer(column.values, dtype='int64').view('datetime64[us]').copy()
+            values[mask] = np.datetime64('NaT')
+            data[name] = values
+        else:
+            data[name] = column.values
+    return pd.DataFrame(data, columns=list(columns))
+
+
+def read_columnar(cursor, datatype: str, batch_size: int, metrics: Optional[QueryMetrics] = None):
+    """Obtener el resultado de un cursor ya ejecutado en formato columnar, numpy o pandas.
+
+    Args:
+        cursor: Cursor con la consulta ejecutada.
+        datatype (str): 'columnar', 'numpy' o 'pandas'.
+        batch_size (int): Cantidad de filas por fetchmany.
+        metrics (QueryMetrics, optional): Métricas donde se registran las fases 'fetch' y 'shape'.
+
+    Returns:
+        Columnas del resultado con el formato solicitado.
+    """
+    with timed(metrics, 'fetch'):
+        columns = fetch_columnar(cursor, batch_size)
+    if metrics is not None:
+        metrics.record_fetch(cursor, len(next(iter(columns.values()), ())))
+    with timed(metrics, 'shape'):
+        if datatype == 'numpy':
+            return to_numpy(columns)
+        if datatype == 'pandas':
+            return to_pandas(columns)
+        return columns
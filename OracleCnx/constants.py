@@ -7,3 +7,98 @@ INVALID_DATATYPE = "The datatype is not valid"
 MISSING_ATTRIBUTES = "Missing attributes."
 NO_CONNECTION = "There is no connection."
 IS_CLOSED = "The connection is already closed."
+BATCH_SIZE = 10000
+QUEUE_SIZE = 4
+LOST_CONNECTION = "The connection was lost, reconnecting:"
+PING_INTERVAL = 60
+POOL_SIZE = 10
+DATATYPES = ['dict', 'list', 'tuple', 'namedtuple', 'columnar', 'numpy', 'pandas']
+ROW_DATATYPES = ['dict', 'list', 'tuple', 'namedtuple']
+COLUMNAR_DATATYPES = ['columnar', 'numpy', 'pandas']
+LOB_CHUNK_SIZE = 1048576
+LOB_FETCH_MODES = ['inline', 'stream']
+INVALID_LOB_FETCH = "The lob_fetch mode is not valid:"
+FETCH_PROFILES = ['lookup', 'bulk', 'auto']
+FETCH_MEMORY_BUDGET = 64 * 1024 * 1024
+LOOKUP_ROWS = 20
+AUTO_ARRAYSIZE = 1000
+BULK_ARRAYSIZE = 10000
+MAX_ARRAYSIZE = 100000
+MIN_COLUMN_SIZE = 8
+LOB_COLUMN_SIZE = 65536
+ROW_WIDTH_CACHE_SIZE = 512
+INVALID_FETCH_PROFILE = "The fetch_profile is not valid:"
+STMT_CACHE_SIZE = 20
+STATEMENT_CACHE_SIZE = 50
+UNKNOWN_STATEMENT = "The statement is not registered:"
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+CACHE_TTL = 60
+MAX_STRING_BIND = 32767
+MAX_RAW_BIND = 32767
+SLICE_BIND = "oracnx_slice"
+INVALID_PARTITIONS = "read_parallel needs partitions > 0 or explicit ranges."
+INVALID_PARALLEL_PARAMETERS = "read_parallel only supports named parameters (dict)."
+EXPORT_FORMATS = ['csv', 'jsonl', 'parquet']
+EXPORT_COMPRESSIONS = ['gzip', 'bz2', 'xz']
+EXPORT_BUFFER_SIZE = 1024 * 1024
+INVALID_EXPORT_FORMAT = "The export format is not valid:"
+INVALID_EXPORT_COMPRESSION = "The export compression is not valid:"
+DATA_EXPORTED = "Data was exported successfully for:"
+METRICS_PREFIX = "oraclecnx"
+METRICS_HOOK_ERROR = "The metrics hook failed:"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+POOL_MIN = 1
+POOL_INCREMENT = 1
+POOL_WAIT_TIMEOUT = 10
+POOL_IDLE_TIMEOUT = 300
+POOL_MAX_LIFETIME = 0
+POOL_IDLE_EVICTION = 1800
+POOL_EVICTION_INTERVAL = 60
+POOL_OPENED = "Session pool opened for"
+POOL_EVICTED = "Idle session pool closed for"
+TRANSACTION_COMMITTED = "Transaction committed, statements:"
+TRANSACTION_ROLLED_BACK = "Transaction rolled back:"
+INVALID_SAVEPOINT = "The savepoint name is not valid:"
+COLLECTION_CHUNK_SIZE = 32767
+COLLECTION_NUMBER_TYPE = "SYS.ODCINUMBERLIST"
+COLLECTION_VARCHAR_TYPE = "SYS.ODCIVARCHAR2LIST"
+COLLECTION_DATE_TYPE = "SYS.ODCIDATELIST"
+INVALID_COLLECTION = "The list values cannot be bound as a collection:"
+COLLECTION_TOO_LARGE = "The list exceeds the SYS.ODCI* limit; use a Collection with a nested table type:"
+BACKENDS = ['cx_oracle', 'thin', 'thick']
+INVALID_BACKEND = "The backend is not valid:"
+BACKEND_IN_USE = "A different driver backend is already in use for this process:"
+RECORD_CLASS_CACHE_SIZE = 256
+INVALID_ROWFACTORY = "The rowfactory only applies to row datatypes:"
+QUERY_TIMEOUT = "The query exceeded its timeout of"
+QUERY_CANCELLED = "The query was cancelled before it started"
+INVALID_READ_REQUEST = "read_many expects SQL strings or (query, parameters) tuples:"
+ROUTING_KEYS = ['endpoints', 'balance', 'read_your_writes', 'eject_after', 'eject_seconds', 'probe_query']
+ENDPOINT_ROLES = ['primary', 'replica']
+BALANCE_MODES = ['least_outstanding', 'ewma']
+ROUTING_EJECT_AFTER = 3
+ROUTING_EJECT_SECONDS = 30
+ROUTING_EWMA_ALPHA = 0.3
+ROUTING_PROBE_QUERY = "select 1 from dual"
+INVALID_ENDPOINT_ROLE = "The endpoint role is not valid, using replica:"
+INVALID_PRIMARY = "The endpoints need exactly one primary, using the first endpoint. Primaries found:"
+INVALID_BALANCE = "The balance mode is not valid, using least_outstanding:"
+ENDPOINT_EJECTED = "Endpoint ejected from the read rotation:"
+ENDPOINT_READMITTED = "Endpoint readmitted to the read rotation:"
+SLOW_QUERY_THRESHOLD = 1.0
+SLOW_QUERY_SAMPLE_RATE = 0.1
+SLOW_QUERY_CAPACITY = 1000
+SLOW_QUERY_PLAN_BACKLOG = 8
+SLOW_QUERY_PLAN_FORMAT = "TYPICAL"
+SLOW_QUERY_PLAN_SQL = "select plan_table_output from table(dbms_xplan.display_cursor(:sql_id, null, :format))"
+SLOW_QUERY = "Slow query:"
+SLOW_QUERY_NO_PLAN = "The execution plan could not be obtained for sql_id"
+UPSERT_STAGING_PREFIX = "OCX_STG_"
+UPSERT_STAGING_EXISTS = "select 1 from user_tables where table_name = :name"
+UPSERT_STAGING_CREATED = "Upsert staging table created:"
+INVALID_IDENTIFIER = "The name is not a valid Oracle identifier:"
+INVALID_UPSERT_KEYS = "The key columns must be part of the upsert columns:"
+UPSERT_COLUMNS_REQUIRED = "The columns are required when the upsert rows are not dictionaries"
+UPSERT_ABORTED = "Upsert stopped because another session failed"
+UPSERTED_ROWS = "Upsert finished for"
+MULTI_RESULT_PREFIX = "result_"
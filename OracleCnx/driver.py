@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Backend del driver de Oracle: cx_Oracle (cliente grueso, el comportamiento original) o python-oracledb en
+modo thin (sin Instant Client) o thick.
+
+El backend se elige con la key 'backend' del setup ('cx_oracle', 'thin' o 'thick'). Un proceso usa un
+solo backend: el primero que se elige queda fijo, porque los tipos y las excepciones de los dos drivers
+son distintos. El resto del paquete usa el objeto oracle, que resuelve cada atributo en el módulo del
+backend activo.
+
+@author: Jhonatan Martínez
+"""
+
+import importlib
+import threading
+from typing import Dict
+from loguru import logger
+from OracleCnx.constants import *
+
+_MODULES = {'cx_oracle': 'cx_Oracle', 'thin': 'oracledb', 'thick': 'oracledb'}
+
+
+class _Driver:
+    """ Módulo del driver activo; los atributos (connect, DatabaseError, DB_TYPE_*, ...) se resuelven
+    en cada uso, así que el backend puede elegirse después de importar el paquete."""
+
+    def __init__(self) -> None:
+        self.__module = None
+        self.__backend = None
+        self.__client_ready = False
+        self.__lock = threading.Lock()
+
+    @property
+    def backend(self) -> str:
+        """Backend activo: 'cx_oracle', 'thin' o 'thick'."""
+        if self.__module is None:
+            self.select(default_backend())
+        return self.__backend
+
+    def select(self, backend: str) -> str:
+        """Elegir el backend del proceso la primera vez; después solo valida que sea el mismo.
+
+        Args:
+            backend (str): 'cx_oracle', 'thin' o 'thick'.
+
+        Returns:
+            str: Backend activo.
+        """
+        with self.__lock:
+            if self.__module is None:
+                self.__module = importlib.import_module(_MODULES[backend])
+                self.__backend = backend
+            elif backend != self.__backend:
+                logger.warning(f"{BACKEND_IN_USE} {self.__backend}")
+            return self.__backend
+
+    def init_client(self, lib_dir: str) -> None:
+        """Cargar las librerías del cliente de Oracle una sola vez por proceso; en modo thin no se cargan.
+
+        Args:
+            lib_dir (str): Carpeta del Instant Client; vacío para buscarlo en el path del sistema.
+        """
+        if self.backend == 'thin':
+            return
+        with self.__lock:
+            if self.__client_ready:
+                return
+            self.__client_ready = True
+            try:
+                self.__module.init_oracle_client(lib_dir=lib_dir or None)
+            except (self.__module.DatabaseError, Exception) as exc:
+                # Si la aplicación ya había iniciado el cliente, el error es esperado.
+                if self.__client_loaded():
+                    logger.debug(str(exc))
+                else:
+                    logger.warning(str(exc))
+
+    def __client_loaded(self) -> bool:
+        """True si las librerías del cliente de Oracle ya están cargadas en el proceso."""
+        try:
+            return self.__module.clientversion() is not None
+        except (self.__module.DatabaseError, Exception):
+            return False
+
+    def __getattr__(self, name: str):
+        if self.__module is None:
+            self.select(default_backend())
+        return getattr(self.__module, name)
+
+
+oracle = _Driver()
+
+
+def default_backend() -> str:
+    """Backend por defecto: cx_Oracle si está instalado, si no python-oracledb en modo thin."""
+    try:
+        importlib.import_module('cx_Oracle')
+        return 'cx_oracle'
+    except ImportError:
+        return 'thin'
+
+
+def use_backend(setup: Dict[str, str]) -> str:
+    """Elegir el backend indicado en el setup e iniciar el cliente de Oracle si el backend lo necesita.
+
+    Args:
+        setup (Dict[str, str]): Setup de la conexión; la key opcional 'backend' elige el driver.
+
+    Returns:
+        str: Backend activo.
+    """
+    backend = str(setup.get('backend') or default_backend()).lower()
+    if backend not in BACKENDS:
+        logger.warning(f"{INVALID_BACKEND} {backend}")
+        backend = default_backend()
+    backend = oracle.select(backend)
+    oracle.init_client(setup.get('driver', ''))
+    return backend
+
+
+def required_attributes(backend: str) -> list:
+    """Keys obligatorias del setup; el modo thin no necesita la carpeta del driver."""
+    attributes = ['host', 'port', 'sdi', 'user', 'password', 'driver']
+    return attributes[:-1] if backend == 'thin' else attributes
+
+
+def describe_setup(setup: Dict[str, str]) -> Dict[str, str]:
+    """Copia del setup para los logs, sin la contraseña."""
+    return {key: '***' if str(key).lower() == 'password' else value for key, value in setup.items()}
+
+
+def make_dsn(setup: Dict[str, str]) -> str:
+    """Construir el DSN host:port/sdi del setup."""
+    return setup["host"] + ":" + setup["port"] + '/' + setup["sdi"]
+
+
+def connect(setup: Dict[str, str], **kwargs):
+    """Abrir una conexión independiente con el backend activo.
+
+    Args:
+        setup (Dict[str, str]): Setup de la conexión.
+        **kwargs: Parámetros adicionales de connect.
+
+    Returns:
+        Conexión a la base de datos.
+    """
+    if oracle.backend != 'cx_oracle':
+        # python-oracledb siempre usa UTF-8 y no acepta encoding.
+        kwargs.pop('encoding', None)
+    return oracle.connect(user=setup["user"], password=setup["password"], dsn=make_dsn(setup), **kwargs)
+
+
+def create_pool(setup: Dict[str, str], **kwargs):
+    """Crear un pool de sesiones con el backend activo.
+
+    Args:
+        setup (Dict[str, str]): Setup de la conexión.
+        **kwargs: Parámetros del pool (min, max, increment, getmode, wait_timeout, timeout, ...).
+
+    Returns:
+        Pool de sesiones.
+    """
+    if oracle.backend == 'cx_oracle':
+        return oracle.SessionPool(user=setup["user"], password=setup["password"], dsn=make_dsn(setup), **kwargs)
+    # python-oracledb: los pools siempre admiten varios hilos y usan UTF-8.
+    kwargs.pop('threaded', None)
+    kwargs.pop('encoding', None)
+    return oracle.create_pool(user=setup["user"], password=setup["password"], dsn=make_dsn(setup), **kwargs)
+
+
+def warm_pool(pool, sessions: int) -> int:
+    """Abrir sesiones en un pool tomándolas hasta que haya al menos sessions abiertas, y liberarlas.
+
+    Args:
+        pool: Pool de sesiones.
+        sessions (int): Sesiones abiertas que se buscan.
+
+    Returns:
+        int: Sesiones abiertas en el pool.
+    """
+    held = []
+    try:
+        while pool.opened < sessions and len(held) < sessions:
+            held.append(pool.acquire())
+    finally:
+        for cnx in held:
+            pool.release(cnx)
+    return pool.opened
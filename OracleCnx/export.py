@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Exportación directa de resultados a archivos CSV, JSONL y Parquet por bloques, sin cargar todo el
+resultado en memoria.
+
+@author: Jhonatan Martínez
+"""
+
+import bz2
+import csv
+import decimal
+import io
+import json
+import lzma
+import os
+import queue
+import threading
+import time
+import zlib
+from typing import Optional
+from OracleCnx.columnar import column_kind
+from OracleCnx.constants import *
+from OracleCnx.driver import oracle
+from OracleCnx.utils import fetch_batches, get_columns
+
+
+class ExportResult:
+    """ Resultado de una exportación."""
+
+    def __init__(self, path: str, file_format: str) -> None:
+        self.path = path
+        self.format = file_format
+        self.rows: int = 0
+        self.bytes_written: int = 0
+        self.seconds: float = 0.0
+        self.error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        """True si la exportación terminó sin errores."""
+        return self.error is None
+
+    @property
+    def rows_per_second(self) -> float:
+        """Filas exportadas por segundo."""
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        """Bytes escritos por segundo."""
+        return self.bytes_written / self.seconds if self.seconds else 0.0
+
+    def __repr__(self) -> str:
+        return (f"ExportResult(path={self.path!r}, format={self.format!r}, rows={self.rows}, "
+                f"bytes_written={self.bytes_written}, seconds={self.seconds:.3f}, error={self.error!r})")
+
+
+def _compressor(compression: str):
+    """Crear el compresor de un formato de compresión de texto.
+
+    Args:
+        compression (str): 'gzip', 'bz2' o 'xz'.
+
+    Returns:
+        Objeto con compress(data) y flush().
+    """
+    if compression == 'gzip':
+        return zlib.compressobj(wbits=31)
+    if compression == 'bz2':
+        return bz2.BZ2Compressor()
+    return lzma.LZMACompressor()
+
+
+class _CompressedSink:
+    """ Archivo binario que comprime en un hilo aparte, para que la compresión se solape con el fetch.
+
+    Los bloques se pasan al hilo por una cola acotada; si el hilo falla, el error se lanza en la
+    siguiente escritura o al cerrar.
+    """
+
+    def __init__(self, path: str, compression: str) -> None:
+        self.__file = open(path, 'wb', buffering=EXPORT_BUFFER_SIZE)
+        self.__compressor = _compressor(compression)
+        self.__chunks = queue.Queue(maxsize=QUEUE_SIZE)
+        self.__error: Optional[BaseException] = None
+        self.__thread = threading.Thread(target=self.__compress, daemon=True)
+        self.__thread.start()
+
+    def __compress(self) -> None:
+        try:
+            while True:
+                chunk = self.__chunks.get()
+                if chunk is None:
+                    break
+                self.__file.write(self.__compressor.compress(chunk))
+            self.__file.write(self.__compressor.flush())
+        except BaseException as exc:
+            self.__error = exc
+            # Vaciar la cola para no bloquear al productor.
+            while self.__chunks.get() is not None:
+                pass
+
+    def write(self, chunk: bytes) -> None:
+        if self.__error is not None:
+            raise self.__error
+        self.__chunks.put(chunk)
+
+    def close(self) -> None:
+        self.__chunks.put(None)
+        self.__thread.join()
+        self.__file.close()
+        if self.__error is not None:
+            raise self.__error
+
+
+def _open_sink(path: str, compression: Optional[str]):
+    """Abrir el archivo de salida, comprimido en segundo plano si se indica compresión."""
+    if compression:
+        return _CompressedSink(path, compression)
+    return open(path, 'wb', buffering=EXPORT_BUFFER_SIZE)
+
+
+def _write_text(cursor, path: str, file_format: str, compression: Optional[str], batch_size: int,
+                result: ExportResult) -> None:
+    """Escribir un resultado en CSV o JSONL, serializando y escribiendo un bloque a la vez."""
+    columns = get_columns(cursor.description)
+    sink = _open_sink(path, compression)
+    try:
+        buffer = io.StringIO()
+        if file_format == 'csv':
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+        for rows in fetch_batches(cursor, batch_size):
+            if file_format == 'csv':
+                writer.writerows(rows)
+            else:
+                for row in rows:
+                    buffer.write(json.dumps(dict(zip(columns, row)), default=str, ensure_ascii=False))
+                    buffer.write("\n")
+            sink.write(buffer.getvalue().encode('utf-8'))
+            buffer.seek(0)
+            buffer.truncate()
+            result.rows += len(rows)
+        if buffer.tell():
+            sink.write(buffer.getvalue().encode('utf-8'))
+    finally:
+        sink.close()
+
+
+def _arrow_schema(column_descriptions):
+    """Construir el esquema de Arrow a partir de cursor.description, para que todos los grupos de
+    filas tengan los mismos tipos aunque un bloque solo traiga NULL en alguna columna."""
+    import pyarrow as pa
+
+    fields = []
+    for column in column_descriptions:
+        kind = column_kind(column)
+        if kind == 'int64':
+            arrow_type = pa.int64()
+        elif kind == 'float64':
+            arrow_type = pa.float64()
+        elif kind == 'datetime64[us]':
+            arrow_type = pa.timestamp('us')
+        elif column[1] == oracle.DB_TYPE_NUMBER:
+            # Enteros de más de 18 dígitos: decimal exacto en lugar de float64.
+            arrow_type = pa.decimal128(column[4] if 0 < (column[4] or 0) <= 38 else 38, 0)
+        elif column[1] in (oracle.DB_TYPE_BLOB, oracle.DB_TYPE_RAW, oracle.DB_TYPE_LONG_RAW):
+            arrow_type = pa.binary()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column[0], arrow_type))
+    return pa.schema(fields)
+
+
+def _write_parquet(cursor, path: str, compression: Optional[str], batch_size: int, result: ExportResult) -> None:
+    """Escribir un resultado en Parquet, un grupo de filas por bloque."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(cursor.description)
+    with pq.ParquetWriter(path, schema, compression=compression or 'snappy') as writer:
+        for rows in fetch_batches(cursor, batch_size):
+            arrays = []
+            for index, field in enumerate(schema):
+                values = [row[index] for row in rows]
+                if pa.types.is_string(field.type):
+                    values = [value if value is None or isinstance(value, str) else str(value) for value in values]
+                elif pa.types.is_decimal(field.type):
+                    values = [value if value is None else decimal.Decimal(value) for value in values]
+                arrays.append(pa.array(values, type=field.type))
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema), row_group_size=len(rows))
+            result.rows += len(rows)
+
+
+def export_cursor(cursor, path: str, file_format: str = 'csv', compression: Optional[str] = None,
+                  batch_size: int = BATCH_SIZE) -> ExportResult:
+    """Exportar el resultado de un cursor ya ejecutado a un archivo.
+
+    Args:
+        cursor: Cursor con la consulta ejecutada.
+        path (str): Ruta del archivo de salida.
+        file_format (str, optional): 'csv', 'jsonl' o 'parquet'.
+        compression (str, optional): 'gzip', 'bz2' o 'xz' para CSV/JSONL; para Parquet un códec de
+            pyarrow ('snappy', 'zstd', 'gzip', ...).
+        batch_size (int, optional): Filas por bloque (y por grupo de filas en Parquet).
+
+    Returns:
+        ExportResult: Filas y bytes escritos, duración y velocidad.
+    """
+    result = ExportResult(path, file_format)
+    start = time.perf_counter()
+    if file_format == 'parquet':
+        _write_parquet(cursor, path, compression, batch_size, result)
+    else:
+        _write_text(cursor, path, file_format, compression, batch_size, result)
+    result.seconds = time.perf_counter() - start
+    result.bytes_written = os.path.getsize(path)
+    return result
+
+
+def validate_export(file_format: str, compression: Optional[str]) -> Optional[str]:
+    """Validar el formato y la compresión de una exportación.
+
+    Args:
+        file_format (str): Formato solicitado.
+        compression (str, optional): Compresión solicitada.
+
+    Returns:
+        str: Mensaje de error, o None si son válidos.
+    """
+    if file_format not in EXPORT_FORMATS:
+        return f"{INVALID_EXPORT_FORMAT} {file_format}"
+    if compression and file_format != 'parquet' and compression not in EXPORT_COMPRESSIONS:
+        return f"{INVALID_EXPORT_COMPRESSION} {compression}"
+    return None
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Lectura de varias consultas independientes a la vez (AsyncDB.read_many): cada consulta tiene su propio
+resultado y error, y las consultas repetidas en un mismo lote se ejecutan una sola vez.
+
+@author: Jhonatan Martínez
+"""
+
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+from OracleCnx.constants import *
+from OracleCnx.cache import ResultCache
+
+
+class ReadResult:
+    """ Resultado de una consulta de read_many."""
+
+    def __init__(self, query: str, parameters: Optional[Dict] = None) -> None:
+        self.query: str = query
+        self.parameters: Optional[Dict] = parameters
+        self.data = None
+        self.seconds: float = 0.0
+        self.timed_out: bool = False
+        self.error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        """True si la consulta terminó sin errores."""
+        return self.error is None
+
+    def __repr__(self) -> str:
+        return (f"ReadResult(query={self.query!r}, ok={self.ok}, seconds={self.seconds:.3f}, "
+                f"timed_out={self.timed_out}, error={self.error!r})")
+
+
+class CancelScope:
+    """ Sesión donde corre una consulta, para interrumpirla con cancel() si se vence su tiempo.
+
+    La sesión se registra mientras se usa y se retira antes de volver al pool, así que cancel() nunca
+    interrumpe a otra consulta que tome la misma sesión después. Si cancel() llega antes de que la consulta
+    tenga sesión (el hilo aún espera en acquire o en el executor), la consulta ya no se ejecuta.
+    """
+
+    def __init__(self) -> None:
+        self.__cnx = None
+        self.__lock = threading.Lock()
+        self.cancelled = False
+
+    def enter(self, cnx) -> None:
+        """Registrar la sesión en la que empieza a correr la consulta.
+
+        Raises:
+            RuntimeError: Si la consulta se canceló antes de empezar.
+        """
+        with self.__lock:
+            if self.cancelled:
+                raise RuntimeError(QUERY_CANCELLED)
+            self.__cnx = cnx
+
+    def exit(self) -> None:
+        """Retirar la sesión cuando la consulta termina."""
+        with self.__lock:
+            self.__cnx = None
+
+    def cancel(self) -> bool:
+        """Interrumpir la llamada en curso de la sesión, si la consulta aún está corriendo.
+
+        Returns:
+            bool: True si se envió la interrupción.
+        """
+        with self.__lock:
+            self.cancelled = True
+            if self.__cnx is None:
+                return False
+            try:
+                self.__cnx.cancel()
+                return True
+            except Exception:
+                return False
+
+
+def normalize_requests(queries: Sequence) -> List[Tuple[str, Optional[Dict]]]:
+    """Convertir las consultas de read_many en pares (query, parameters).
+
+    Args:
+        queries (Sequence): Textos SQL o tuplas (query, parameters).
+
+    Returns:
+        List[Tuple[str, Optional[Dict]]]: Consulta y parámetros de cada elemento.
+    """
+    requests = []
+    for item in queries:
+        if isinstance(item, str):
+            requests.append((item, None))
+        elif isinstance(item, (tuple, list)) and len(item) in (1, 2) and isinstance(item[0], str):
+            requests.append((item[0], item[1] if len(item) == 2 else None))
+        else:
+            raise ValueError(f"{INVALID_READ_REQUEST} {item!r}")
+    return requests
+
+
+def coalesce_requests(requests: List[Tuple[str, Optional[Dict]]], datatype: str,
+                      enabled: bool = True) -> Tuple[List[int], List[int]]:
+    """Agrupar las consultas repetidas de un lote (mismo SQL normalizado y mismos parámetros).
+
+    Args:
+        requests (List[Tuple[str, Optional[Dict]]]): Consulta y parámetros de cada elemento.
+        datatype (str): Tipo de datos solicitado.
+        enabled (bool, optional): False para ejecutar todas las consultas aunque se repitan.
+
+    Returns:
+        Tuple[List[int], List[int]]: Índices de las consultas que se ejecutan y, para cada elemento, la
+            posición de su consulta en la primera lista.
+    """
+    unique: List[int] = []
+    positions: List[int] = []
+    seen: Dict[Tuple, int] = {}
+    for index, (query, parameters) in enumerate(requests):
+        key = ResultCache.make_key(query, parameters, datatype) if enabled else index
+        if key not in seen:
+            seen[key] = len(unique)
+            unique.append(index)
+        positions.append(seen[key])
+    return unique, positions
@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+"""
+Métricas por consulta (tiempo por fase, filas, bytes y viajes estimados), un agregador de histogramas
+en memoria y la exposición en formato de texto de Prometheus.
+
+@author: Jhonatan Martínez
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+from loguru import logger
+from OracleCnx.constants import *
+
+
+class QueryMetrics:
+    """ Métricas de una llamada a read_data, execute_query o execute_many.
+
+    phases guarda los segundos de cada fase: 'acquire' (obtener la conexión o la sesión del pool),
+    'execute', 'fetch' (incluye armar las filas con la forma solicitada), 'lob' (lectura de localizadores
+    en modo 'stream') y 'commit'.
+    """
+
+    __slots__ = ('operation', 'query', 'phases', 'rows', 'bytes', 'round_trips', 'seconds', 'cached',
+                 'error', '_start')
+
+    def __init__(self, operation: str, query: str) -> None:
+        self.operation = operation
+        self.query = query
+        self.phases: Dict[str, float] = {}
+        self.rows: int = 0
+        self.bytes: int = 0
+        self.round_trips: int = 0
+        self.seconds: float = 0.0
+        self.cached: bool = False
+        self.error: Optional[str] = None
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Medir el tiempo de una fase; si la fase se repite, los tiempos se suman.
+
+        Args:
+            name (str): Nombre de la fase.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - start)
+
+    def add_phase(self, name: str, seconds: float) -> None:
+        """Sumar tiempo medido por fuera a una fase.
+
+        Args:
+            name (str): Nombre de la fase.
+            seconds (float): Segundos a sumar.
+        """
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def record_fetch(self, cursor, rows: int) -> None:
+        """Registrar las filas obtenidas, los bytes estimados con el ancho de fila de cursor.description y
+        los viajes a la base de datos estimados con prefetchrows y arraysize.
+
+        Args:
+            cursor: Cursor con la consulta ejecutada.
+            rows (int): Filas obtenidas.
+        """
+        from OracleCnx.tuning import row_width
+
+        self.rows += rows
+        if cursor.description:
+            self.bytes += rows * row_width(cursor.description)
+        self.round_trips += estimate_round_trips(rows, cursor.prefetchrows, cursor.arraysize)
+
+    def record_execute(self, cursor) -> None:
+        """Registrar las filas afectadas por un execute o executemany, que se resuelve en un viaje.
+
+        Args:
+            cursor: Cursor con la sentencia ejecutada.
+        """
+        self.rows += max(cursor.rowcount or 0, 0)
+        self.round_trips += 1
+
+    def finish(self, error: Optional[BaseException] = None) -> "QueryMetrics":
+        """Cerrar la medición.
+
+        Args:
+            error (BaseException, optional): Error de la llamada, si falló.
+
+        Returns:
+            QueryMetrics: La misma instancia.
+        """
+        self.seconds = time.perf_counter() - self._start
+        if error is not None:
+            self.error = str(error)
+        return self
+
+    def to_dict(self) -> Dict:
+        """Obtener las métricas como diccionario."""
+        return {name: getattr(self, name) for name in self.__slots__ if not name.startswith('_')}
+
+    def __repr__(self) -> str:
+        phases = ", ".join(f"{name}={seconds:.4f}" for name, seconds in self.phases.items())
+        return (f"QueryMetrics(operation={self.operation!r}, seconds={self.seconds:.4f}, rows={self.rows}, "
+                f"bytes={self.bytes}, round_trips={self.round_trips}, cached={self.cached}, phases=[{phases}], "
+                f"error={self.error!r})")
+
+
+@contextmanager
+def timed(metrics: Optional[QueryMetrics], name: str):
+    """Medir una fase solo si hay métricas activas.
+
+    Args:
+        metrics (QueryMetrics, optional): Métricas de la llamada o None.
+        name (str): Nombre de la fase.
+    """
+    if metrics is None:
+        yield
+    else:
+        with metrics.phase(name):
+            yield
+
+
+def estimate_round_trips(rows: int, prefetchrows: int, arraysize: int) -> int:
+    """Estimar los viajes a la base de datos de una consulta.
+
+    El execute trae hasta prefetchrows filas; cada fetch siguiente trae hasta arraysize y el último
+    viaje detecta el fin del resultado.
+
+    Args:
+        rows (int): Filas obtenidas.
+        prefetchrows (int): Filas traídas en el execute.
+        arraysize (int): Filas por fetch.
+
+    Returns:
+        int: Viajes estimados, incluido el execute.
+    """
+    if rows < prefetchrows:
+        return 1
+    return 1 + math.ceil((rows - prefetchrows + 1) / max(arraysize, 1))
+
+
+def emit(hook: Optional[Callable], metrics: QueryMetrics) -> None:
+    """Entregar las métricas al hook; un error del hook no afecta la consulta.
+
+    Args:
+        hook (Callable, optional): Función que recibe las métricas.
+        metrics (QueryMetrics): Métricas de la llamada.
+    """
+    if hook is None:
+        return
+    try:
+        hook(metrics)
+    except Exception as exc:
+        logger.warning(f"{METRICS_HOOK_ERROR} {str(exc)}")
+
+
+class Histogram:
+    """ Histograma acumulativo con límites fijos, al estilo de Prometheus."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self.counts: List[int] = [0] * (len(self.buckets) + 1)
+        self.sum: float = 0.0
+        self.count: int = 0
+
+    def observe(self, value: float) -> None:
+        """Registrar un valor.
+
+        Args:
+            value (float): Valor observado.
+        """
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimar un cuantil con interpolación lineal dentro del bucket.
+
+        Args:
+            q (float): Cuantil entre 0 y 1.
+
+        Returns:
+            float: Valor estimado.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else lower
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """Obtener los conteos acumulados por límite, incluido '+Inf'."""
+        total = 0
+        result = []
+        for bound, count in zip(list(self.buckets) + [math.inf], self.counts):
+            total += count
+            result.append(("+Inf" if bound == math.inf else repr(float(bound)), total))
+        return result
+
+
+class MetricsAggregator:
+    """ Agregador en memoria que se puede usar directamente como metrics_hook.
+
+    Guarda un histograma de duración por operación y por fase, y contadores de llamadas, errores,
+    aciertos de caché, filas, bytes y viajes.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        """Constructor.
+
+        Args:
+            buckets (Tuple[float, ...], optional): Límites en segundos de los histogramas.
+
+        Returns:
+            None.
+        """
+        self.__buckets = buckets
+        self.__lock = threading.Lock()
+        self.__latency: Dict[str, Histogram] = {}
+        self.__phases: Dict[Tuple[str, str], Histogram] = {}
+        self.__counters: Dict[Tuple[str, str], float] = {}
+
+    def __call__(self, metrics: QueryMetrics) -> None:
+        with self.__lock:
+            operation = metrics.operation
+            self.__histogram(self.__latency, operation).observe(metrics.seconds)
+            for phase, seconds in metrics.phases.items():
+                self.__histogram(self.__phases, (operation, phase)).observe(seconds)
+            self.__add('calls', operation, 1)
+            self.__add('rows', operation, metrics.rows)
+            self.__add('bytes', operation, metrics.bytes)
+            self.__add('round_trips', operation, metrics.round_trips)
+            self.__add('cache_hits', operation, int(metrics.cached))
+            self.__add('errors', operation, int(metrics.error is not None))
+
+    def __histogram(self, histograms: Dict, key) -> Histogram:
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram(self.__buckets)
+        return histogram
+
+    def __add(self, counter: str, operation: str, value: float) -> None:
+        key = (counter, operation)
+        self.__counters[key] = self.__counters.get(key, 0) + value
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Obtener un resumen por operación con contadores, p50, p95 y p99.
+
+        Returns:
+            Dict[str, Dict]: Resumen por operación, con el detalle por fase en 'phases'.
+        """
+        with self.__lock:
+            summary = {}
+            for operation, histogram in self.__latency.items():
+                item = {counter: value for (counter, name), value in self.__counters.items() if name == operation}
+                item.update(p50=histogram.quantile(0.5), p95=histogram.quantile(0.95),
+                            p99=histogram.quantile(0.99), seconds=histogram.sum)
+                item['phases'] = {phase: {'p50': phase_histogram.quantile(0.5),
+                                          'p95': phase_histogram.quantile(0.95),
+                                          'seconds': phase_histogram.sum}
+                                  for (name, phase), phase_histogram in self.__phases.items() if name == operation}
+                summary[operation] = item
+            return summary
+
+    def reset(self) -> None:
+        """Eliminar todas las métricas acumuladas."""
+        with self.__lock:
+            self.__latency.clear()
+            self.__phases.clear()
+            self.__counters.clear()
+
+    def prometheus_lines(self, prefix: str = METRICS_PREFIX) -> List[str]:
+        """Obtener las métricas acumuladas en formato de texto de Prometheus.
+
+        Args:
+            prefix (str, optional): Prefijo de los nombres de las métricas.
+
+        Returns:
+            List[str]: Líneas de la exposición.
+        """
+        with self.__lock:
+            lines = [f"# TYPE {prefix}_query_seconds histogram"]
+            for operation, histogram in sorted(self.__latency.items()):
+                lines.extend(_histogram_lines(f"{prefix}_query_seconds", {'operation': operation}, histogram))
+            lines.append(f"# TYPE {prefix}_phase_seconds histogram")
+            for (operation, phase), histogram in sorted(self.__phases.items()):
+                lines.extend(_histogram_lines(f"{prefix}_phase_seconds",
+                                              {'operation': operation, 'phase': phase}, histogram))
+            for counter in ('calls', 'errors', 'cache_hits', 'rows', 'bytes', 'round_trips'):
+                lines.append(f"# TYPE {prefix}_{counter}_total counter")
+                for (name, operation), value in sorted(self.__counters.items()):
+                    if name == counter:
+                        lines.append(f"{prefix}_{counter}_total{_labels({'operation': operation})} {value}")
+            return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _histogram_lines(name: str, labels: Dict[str, str], histogram: Histogram) -> List[str]:
+    lines = [f"{name}_bucket{_labels(dict(labels, le=bound))} {count}" for bound, count in histogram.cumulative()]
+    lines.append(f"{name}_sum{_labels(labels)} {histogram.sum}")
+    lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+    return lines
+
+
+def prometheus_text(aggregator: Optional[MetricsAggregator] = None, pools: Optional[Dict] = None,
+                    prefix: str = METRICS_PREFIX) -> str:
+    """Construir la exposición en formato de texto de Prometheus.
+
+    Args:
+        aggregator (MetricsAggregator, optional): Métricas de consultas acumuladas.
+        pools (Dict, optional): Pools por nombre (PoolDB u objetos con pool_stats()) para los gauges
+            busy, open, min, max, waiters e idle_seconds; los de un PoolRouter llevan además la etiqueta
+            endpoint.
+        prefix (str, optional): Prefijo de los nombres de las métricas.
+
+    Returns:
+        str: Texto para servir en /metrics.
+    """
+    lines = aggregator.prometheus_lines(prefix) if aggregator is not None else []
+    if pools:
+        stats = []
+        for name, pool in sorted(pools.items()):
+            if hasattr(pool, 'endpoint_pool_stats'):
+                stats.extend(({'pool': name, 'endpoint': endpoint}, values)
+                             for endpoint, values in sorted(pool.endpoint_pool_stats().items()))
+            else:
+                stats.append(({'pool': name}, pool.pool_stats()))
+        gauges = sorted({gauge for _, values in stats for gauge in values})
+        for gauge in gauges:
+            lines.append(f"# TYPE {prefix}_pool_{gauge} gauge")
+            for labels, values in stats:
+                if gauge in values:
+                    lines.append(f"{prefix}_pool_{gauge}{_labels(labels)} {values[gauge]}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Lectura de varios resultados con un solo execute: un bloque anónimo o procedimiento PL/SQL que abre
+REF CURSORs de salida o retorna resultados implícitos con DBMS_SQL.RETURN_RESULT.
+
+@author: Jhonatan Martínez
+"""
+
+from typing import Dict, List, Optional, Sequence
+from OracleCnx.constants import *
+from OracleCnx.columnar import read_columnar
+from OracleCnx.metrics import QueryMetrics, timed
+from OracleCnx.tuning import learn_row_width, tune_cursor
+from OracleCnx.utils import fetch_all, get_columns, row_factory, set_lob_fetch
+
+
+def result_names(cursors: Sequence[str], names: Optional[Sequence[str]], implicit: int) -> List[str]:
+    """Nombres de los resultados: los REF CURSORs por su parámetro y los implícitos por names o por posición.
+
+    Args:
+        cursors (Sequence[str]): Parámetros de salida de tipo REF CURSOR.
+        names (Sequence[str], optional): Nombres de los resultados implícitos, en orden.
+        implicit (int): Cantidad de resultados implícitos.
+
+    Returns:
+        List[str]: Nombre de cada resultado.
+    """
+    names = list(names or [])
+    return list(cursors) + [names[number] if number < len(names) else f"{MULTI_RESULT_PREFIX}{number + 1}"
+                            for number in range(implicit)]
+
+
+def read_multi(cursor, query: str, parameters: Optional[Dict], cursors: Sequence[str],
+               names: Optional[Sequence[str]], datatype: str, fetch_profile: str, lob_fetch: str,
+               memory_budget: int = FETCH_MEMORY_BUDGET, metrics: Optional[QueryMetrics] = None) -> Dict:
+    """Ejecutar un bloque PL/SQL y obtener cada uno de sus resultados con la forma solicitada.
+
+    Args:
+        cursor: Cursor donde se ejecuta el bloque.
+        query (str): Bloque anónimo o llamada a un procedimiento.
+        parameters (Dict, optional): Parámetros de entrada del bloque.
+        cursors (Sequence[str]): Parámetros de salida de tipo REF CURSOR; se enlazan automáticamente.
+        names (Sequence[str], optional): Nombres de los resultados implícitos, en orden.
+        datatype (str): Tipo de datos de cada resultado.
+        fetch_profile (str): Perfil de fetch de cada resultado.
+        lob_fetch (str): 'inline' o 'stream'.
+        memory_budget (int, optional): Bytes máximos por bloque de filas.
+        metrics (QueryMetrics, optional): Métricas donde se registran las fases de la lectura.
+
+    Returns:
+        Dict: Datos de cada resultado por nombre, primero los REF CURSORs y luego los implícitos.
+    """
+    values = dict(parameters or {})
+    # Cada REF CURSOR se enlaza como un cursor ya configurado, así sus primeras filas llegan en el mismo
+    # viaje del execute (prefetchrows) y los Lobs se definen con el manejo de lob_fetch.
+    refs = {}
+    for name in cursors:
+        refs[name] = cursor.connection.cursor()
+        tune_cursor(refs[name], f"{query}#{name}", fetch_profile, memory_budget)
+        set_lob_fetch(refs[name], lob_fetch)
+    values.update(refs)
+    set_lob_fetch(cursor, lob_fetch)
+    try:
+        with timed(metrics, 'execute'):
+            cursor.execute(query, values)
+        results = list(refs.values()) + list(cursor.getimplicitresults())
+        data = {}
+        for name, result in zip(result_names(cursors, names, len(results) - len(cursors)), results):
+            data[name] = read_result(result, f"{query}#{name}", datatype, fetch_profile, lob_fetch, memory_budget,
+                                     metrics)
+        return data
+    finally:
+        for ref in refs.values():
+            ref.close()
+
+
+def read_result(cursor, key: str, datatype: str, fetch_profile: str, lob_fetch: str,
+                memory_budget: int = FETCH_MEMORY_BUDGET, metrics: Optional[QueryMetrics] = None):
+    """Obtener las filas de un REF CURSOR o resultado implícito ya abierto.
+
+    El cursor ya se abrió en el servidor, así que solo cuenta arraysize; en los resultados implícitos las
+    columnas se definen en el primer fetch, por eso lob_fetch se aplica aquí también.
+
+    Args:
+        cursor: Cursor del resultado.
+        key (str): Identidad del resultado para recordar su ancho de fila.
+        datatype (str): Tipo de datos a retornar.
+        fetch_profile (str): Perfil de fetch.
+        lob_fetch (str): 'inline' o 'stream'.
+        memory_budget (int, optional): Bytes máximos por bloque de filas.
+        metrics (QueryMetrics, optional): Métricas donde se registran las fases de la lectura.
+
+    Returns:
+        Datos del resultado.
+    """
+    tune_cursor(cursor, key, fetch_profile, memory_budget)
+    set_lob_fetch(cursor, lob_fetch)
+    learn_row_width(key, cursor.description)
+    if datatype in COLUMNAR_DATATYPES:
+        return read_columnar(cursor, datatype, cursor.arraysize, metrics)
+    columns = get_columns(cursor.description)
+    rows = fetch_all(cursor, metrics, row_factory(columns, datatype))
+    if datatype == 'list':
+        return [columns, rows]
+    return rows
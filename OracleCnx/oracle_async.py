@@ -6,16 +6,50 @@ Created on Wed Jan 17 14:00:00 2024
 """
 
 import asyncio
-import cx_Oracle
-from typing import Dict, List, Optional
+import inspect
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import AsyncIterator, Callable, Dict, List, Optional, Sequence, Union
 from loguru import logger
 from OracleCnx.constants import *
+from OracleCnx.driver import create_pool, describe_setup, oracle, required_attributes, use_backend, warm_pool
+from OracleCnx.binds import bind_collections, bind_statement, has_collections, merge_results
+from OracleCnx.cache import ResultCache
+from OracleCnx.columnar import read_columnar
+from OracleCnx.metrics import QueryMetrics, emit, timed
+from OracleCnx.multi import read_multi
+from OracleCnx.routing import Endpoint, build_router, has_endpoints
+from OracleCnx.session import current_tag, wrap_session_callback
+from OracleCnx.slowlog import SlowQueryLog
+from OracleCnx.export import ExportResult, export_cursor, validate_export
+from OracleCnx.gather import CancelScope, ReadResult, coalesce_requests, normalize_requests
+from OracleCnx.transaction import AsyncTransaction, Transaction, commit_on_success
+from OracleCnx.tuning import learn_row_width, tune_cursor
+from OracleCnx.utils import fetch_all, fetch_batches, get_columns, is_disconnect_error, row_factory, set_lob_fetch
 
 
 class AsyncDB:
-    """ Permite realizar una conexión asincrona a una Base de Datos"""
-
-    def __init__(self, setup: Dict[str, str]) -> None:
+    """ Permite realizar una conexión asincrona a una Base de Datos
+
+    Si el setup trae la key 'endpoints' (un primario y réplicas de lectura), AsyncDB(setup) retorna un
+    AsyncRouter con la misma interfaz (ver OracleCnx.routing).
+    """
+
+    def __new__(cls, *args, **kwargs):
+        if has_endpoints(kwargs.get('setup', args[0] if args else {})):
+            # Varios endpoints: un pool por endpoint detrás de un AsyncRouter.
+            return AsyncRouter(*args, **kwargs)
+        return super(AsyncDB, cls).__new__(cls)
+
+    def __init__(self, setup: Dict[str, str], pool_min: int = 1, pool_max: int = POOL_SIZE,
+                 lob_fetch: str = 'inline', fetch_profile: str = 'auto',
+                 memory_budget: int = FETCH_MEMORY_BUDGET, stmtcachesize: int = STMT_CACHE_SIZE,
+                 cache: Optional[ResultCache] = None, metrics_hook: Optional[Callable] = None,
+                 slow_log: Optional[SlowQueryLog] = None, session_callback: Optional[Union[Callable, str]] = None,
+                 tag: Optional[str] = None) -> None:
         """Constructor.
 
         Args:
@@ -27,182 +61,925 @@ class AsyncDB:
                 - user: Database user.
                 - password: Database password.
                 - driver: Database driver.
+        pool_min (int): Cantidad mínima de sesiones abiertas en el pool.
+        pool_max (int): Cantidad máxima de sesiones; también limita los hilos y las consultas simultáneas.
+        lob_fetch (str): 'inline' obtiene los CLOB/NCLOB/BLOB como str/bytes en el mismo fetch;
+            'stream' obtiene localizadores y los lee por partes (para valores muy grandes).
+        fetch_profile (str): Ajuste por defecto de arraysize/prefetchrows: 'lookup', 'bulk' o 'auto'.
+        memory_budget (int): Bytes máximos por bloque de filas en los perfiles 'bulk' y 'auto'.
+        stmtcachesize (int): Tamaño del caché de sentencias del cliente Oracle para cada sesión del pool.
+        cache (ResultCache): Caché de resultados para read_data; None para no usar caché.
+        metrics_hook (Callable): Función que recibe un QueryMetrics después de cada read_data, execute_query
+            y execute_many, por ejemplo un MetricsAggregator; None para no medir.
+        slow_log (SlowQueryLog): Registro de las consultas lentas; None para no registrarlas.
+        session_callback (Callable, str): Función (sesión, etiqueta pedida) que configura una sesión cuando es
+            nueva o su etiqueta no coincide, o el nombre de un procedimiento PL/SQL; None para no configurar.
+        tag (str): Etiqueta por defecto de las sesiones, por ejemplo 'nls=iso;schema=APP'; un bloque
+            session_tag la reemplaza en la tarea donde se abre.
 
         Returns:
             None.
         """
-
-        self.__attributes = ['host', 'port', 'sdi', 'user', 'password', 'driver']
-        self.__connection: cx_Oracle.connect = None
         self.__setup: Dict = setup
+        self.__pool_min = pool_min
+        self.__pool_max = max(pool_max, pool_min)
+        self.__pool = None
+        self.__executor: ThreadPoolExecutor = None
+        self.__semaphore: asyncio.Semaphore = None
+        self.__pool_lock: asyncio.Lock = None
+        self.__lob_fetch = lob_fetch
+        self.__fetch_profile = fetch_profile
+        self.__memory_budget = memory_budget
+        self.__stmtcachesize = stmtcachesize
+        self.__cache = cache
+        self.__metrics_hook = metrics_hook
+        self.__slow_log = slow_log
+        self.__session_callback = wrap_session_callback(session_callback)
+        self.__tag = tag
         self.__validate_attributes()
 
-    @staticmethod
-    def __find_lob_columns(column_descriptions) -> List:
-        """Iterar sobre las descripciones de las columnas y mostrar información sobre los tipos de datos.
-        Returns:
-            List: Lista con los índices de las columnas Lobs.
-        """
-        lob_columns = []
-        for index, column in enumerate(column_descriptions):
-            # column_name, type_code, display_size, internal_size, precision, scale, null_ok = column
-            type_code: int = column[1]
-            if type_code == cx_Oracle.CLOB:
-                lob_columns.append(index)
-        return lob_columns
+    async def __aenter__(self) -> "AsyncDB":
+        await self.__open_pool()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.close()
 
     def __validate_attributes(self) -> None:
         """Válida que el diccionario contenga los atributos necesarios para que la clase funcione."""
-        logger.debug(self.__setup)
-        missing_attributes = [key for key in self.__attributes if str(key).lower() not in self.__setup.keys()]
+        logger.debug(describe_setup(self.__setup))
+        backend = use_backend(self.__setup)
+        missing_attributes = [key for key in required_attributes(backend) if str(key).lower() not in self.__setup.keys()]
         if missing_attributes:
             logger.error(MISSING_ATTRIBUTES)
             logger.error(missing_attributes)
-        try:
-            cx_Oracle.init_oracle_client(lib_dir=self.__setup["driver"])
-        except (cx_Oracle.DatabaseError, cx_Oracle.IntegrityError, Exception) as exc:
-            if cx_Oracle.clientversion() is None:
-                logger.warning(str(exc))
+        if self.__lob_fetch not in LOB_FETCH_MODES:
+            logger.warning(f"{INVALID_LOB_FETCH} {self.__lob_fetch}")
+        if self.__fetch_profile not in FETCH_PROFILES:
+            logger.warning(f"{INVALID_FETCH_PROFILE} {self.__fetch_profile}")
 
-    async def __open_connection(self) -> bool:
-        """Crear y obtener la conexión a una base de datos
+    async def __open_pool(self) -> bool:
+        """Crear el pool de sesiones, el executor y el semáforo de admisión la primera vez que se usan.
 
         Returns:
-            bool: True si se establece la conexión, False en caso contrario.
+            bool: True si el pool está disponible, False en caso contrario.
         """
+        if self.__pool is not None:
+            return True
+        if self.__pool_lock is None:
+            self.__pool_lock = asyncio.Lock()
+
+        async with self.__pool_lock:
+            if self.__pool is not None:
+                return True
+            server: str = f"{self.__setup['host']}:{self.__setup['port']}/{self.__setup['sdi']}"
+            executor = ThreadPoolExecutor(max_workers=self.__pool_max, thread_name_prefix="OracleCnx")
+
+            def sync_create_pool():
+                return create_pool(
+                    self.__setup,
+                    min=self.__pool_min,
+                    max=self.__pool_max,
+                    increment=1,
+                    threaded=True,
+                    getmode=oracle.SPOOL_ATTRVAL_WAIT,
+                    stmtcachesize=self.__stmtcachesize,
+                    encoding="UTF-8",
+                    **({'session_callback': self.__session_callback} if self.__session_callback is not None else {}))
+
+            try:
+                logger.debug(f"Trying to connect to server {server}")
+                self.__pool = await asyncio.get_running_loop().run_in_executor(executor, sync_create_pool)
+                self.__executor = executor
+                self.__semaphore = asyncio.Semaphore(self.__pool_max)
+                logger.debug(f"{ESTABLISHED_CONNECTION} {server}")
+                return True
+            except (ConnectionError, oracle.DatabaseError, Exception) as exc:
+                logger.error(f"Error connecting to server {server}: {str(exc)}", exc_info=True)
+                executor.shutdown(wait=False)
+                return False
+
+    async def __run(self, operation: Callable, metrics: Optional[QueryMetrics] = None,
+                    limit: Optional[asyncio.Semaphore] = None):
+        """Ejecutar una operación bloqueante con una sesión del pool en el executor propio.
+
+        El semáforo hace que las llamadas esperen en el event loop y no en los hilos. Si la tarea se
+        cancela, el hilo no se puede detener: los semáforos se liberan cuando el hilo termina, no antes.
+
+        Args:
+            operation (Callable): Función que recibe la conexión.
+            metrics (QueryMetrics, optional): Métricas donde se registra en la fase 'acquire' la espera
+                del semáforo, del executor y de la sesión.
+            limit (asyncio.Semaphore, optional): Límite adicional de la llamada, por ejemplo el de un lote.
 
-        self.__connection = None
-        server: str = f"{self.__setup['host']}:{self.__setup['port']}/{self.__setup['sdi']}"
-        response: bool = False
+        Returns:
+            Resultado de la operación.
+        """
+        start = time.perf_counter()
+        # La etiqueta se lee en la tarea, porque el executor no hereda su contexto.
+        options = self.__tag_options()
+
+        def sync_operation():
+            cnx = self.__pool.acquire(**options)
+            if metrics is not None:
+                metrics.add_phase('acquire', time.perf_counter() - start)
+            with cnx:
+                return operation(cnx)
+
+        semaphores = [self.__semaphore] if limit is None else [limit, self.__semaphore]
+        acquired = []
         try:
-            logger.debug(f"Trying to connect to server {server}")
-            loop = asyncio.get_running_loop()
+            for semaphore in semaphores:
+                await semaphore.acquire()
+                acquired.append(semaphore)
+            future = asyncio.get_running_loop().run_in_executor(self.__executor, sync_operation)
+        except BaseException:
+            for semaphore in acquired:
+                semaphore.release()
+            raise
+
+        def release(done) -> None:
+            for semaphore in semaphores:
+                semaphore.release()
+            # Evita el aviso de excepción no recuperada cuando la tarea ya fue cancelada.
+            if not done.cancelled():
+                done.exception()
+
+        future.add_done_callback(release)
+        return await asyncio.shield(future)
+
+    def __tag_options(self) -> Dict:
+        """Parámetros de acquire para pedir una sesión con la etiqueta activa; vacío si no hay etiqueta."""
+        tag = current_tag(self.__tag)
+        return {'tag': tag} if tag else {}
+
+    def __read(self, cursor, query: str, parameters: Optional[dict], datatype: str, fetch_profile: Optional[str],
+               metrics: Optional[QueryMetrics] = None, rowfactory: Optional[Callable] = None) -> [Dict, List]:
+        """Ejecutar una consulta en un cursor y obtener los datos con la forma solicitada.
+
+        Args:
+            cursor: Cursor donde se ejecuta la consulta.
+            query (str): Consulta a ejecutar.
+            parameters (dict, optional): Parámetros de la consulta; las listas se enlazan como colecciones.
+            datatype (str): Tipo de datos a retornar.
+            fetch_profile (str, optional): Perfil de fetch; por defecto el de la instancia.
+            metrics (QueryMetrics, optional): Métricas donde se registran las fases de la lectura.
+            rowfactory (Callable, optional): Función propia que construye cada fila a partir de sus valores.
 
-            def sync_connect():
-                conn = None
+        Returns:
+            Datos obtenidos.
+        """
+        if rowfactory is not None and datatype not in ROW_DATATYPES:
+            raise ValueError(f"{INVALID_ROWFACTORY} {datatype}")
+        if has_collections(query, parameters):
+            chunks = bind_collections(cursor.connection, query, parameters)
+            return merge_results([self.__read(cursor, query, chunk, datatype, fetch_profile, metrics, rowfactory)
+                                  for chunk in chunks], datatype)
+        tune_cursor(cursor, query, fetch_profile or self.__fetch_profile, self.__memory_budget)
+        set_lob_fetch(cursor, self.__lob_fetch)
+        # Ejecutar la consulta
+        with timed(metrics, 'execute'):
+            if parameters:
+                cursor.execute(query, parameters)
+            else:
+                cursor.execute(query)
+        learn_row_width(query, cursor.description)
+        if datatype in COLUMNAR_DATATYPES:
+            return read_columnar(cursor, datatype, cursor.arraysize, metrics)
+        # Gets column_names
+        columns = get_columns(cursor.description)
+        # El driver arma cada fila durante el fetch, sin una segunda pasada sobre los datos.
+        data = fetch_all(cursor, metrics, row_factory(columns, datatype, rowfactory))
+        if datatype == 'list':
+            return [columns, data]
+        return data
+
+    def __start_metrics(self, operation: str, query: str) -> Optional[QueryMetrics]:
+        """Crear las métricas de una llamada si hay un metrics_hook o un slow_log configurado."""
+        if self.__metrics_hook is None and self.__slow_log is None:
+            return None
+        return QueryMetrics(operation, query)
+
+    def __report(self, metrics: Optional[QueryMetrics], parameters=None) -> None:
+        """Cerrar las métricas de una llamada, registrarla en el slow_log si fue lenta y entregarlas al
+        metrics_hook."""
+        if metrics is None:
+            return
+        metrics.finish()
+        if self.__slow_log is not None:
+            self.__slow_log.observe(metrics, parameters, self.__plan_session)
+        emit(self.__metrics_hook, metrics)
+
+    def __plan_session(self):
+        """Sesión donde el slow_log consulta el plan de una consulta lenta; se cierra o libera al terminar."""
+        return self.__pool.acquire()
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[AsyncTransaction]:
+        """Ejecutar varias sentencias en una misma sesión del pool y cursor con un solo commit al final.
+
+        La sesión y un lugar del semáforo se conservan hasta terminar el bloque. Si el bloque termina con
+        un error se hace rollback y el error se propaga.
+
+        Yields:
+            AsyncTransaction: Transacción con execute, execute_many, read, savepoint y rollback_to.
+        """
+        metrics = self.__start_metrics('transaction', '')
+        if not await self.__open_pool():
+            logger.warning(NO_CONNECTION)
+            if metrics is not None:
+                metrics.error = NO_CONNECTION
+            self.__report(metrics)
+            raise ConnectionError(NO_CONNECTION)
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            async with self.__semaphore:
+                cnx = await loop.run_in_executor(self.__executor, partial(self.__pool.acquire, **self.__tag_options()))
+                if metrics is not None:
+                    metrics.add_phase('acquire', time.perf_counter() - start)
                 try:
-                    dsn = f"{self.__setup['host']}:{self.__setup['port']}/{self.__setup['sdi']}"
-                    conn = cx_Oracle.connect(
-                        user=self.__setup["user"],
-                        password=self.__setup["password"],
-                        dsn=dsn,
-                        encoding="UTF-8")
-                except ConnectionError as ce:
-                    logger.error(f"Error connecting to server {server}: {str(ce)}", exc_info=True)
-                except cx_Oracle.DatabaseError as de:
-                    logger.error(f"Error connecting to server {server}: {str(de)}", exc_info=True)
-                except Exception as e:
-                    logger.error(f"Error connecting to server {server}: {str(e)}", exc_info=True)
-
-                return conn
-
-            self.__connection = await asyncio.get_event_loop().run_in_executor(None, sync_connect)
-            response = True
-        except ConnectionError as ce:
-            logger.error(f"Error connecting to server {server}: {str(ce)}", exc_info=True)
-        except cx_Oracle.DatabaseError as de:
-            logger.error(f"Error connecting to server {server}: {str(de)}", exc_info=True)
-        except Exception as e:
-            logger.error(f"Error connecting to server {server}: {str(e)}", exc_info=True)
-
-        return response
-
-    async def read_data(self, query: str, parameters: Optional[dict] = None, datatype: str = "dict") -> [Dict, List]:
+                    transaction = Transaction(cnx, self.__read, self.__cache, metrics)
+                    tx = AsyncTransaction(transaction, self.__executor)
+                    try:
+                        yield tx
+                    except BaseException as exc:
+                        await tx.end(exc)
+                        raise
+                    await tx.end()
+                finally:
+                    await loop.run_in_executor(self.__executor, self.__pool.release, cnx)
+        finally:
+            self.__report(metrics)
+
+    async def warmup(self, sessions: Optional[int] = None) -> int:
+        """Crear el pool y abrir sesiones por adelantado para que las primeras consultas no esperen la conexión.
+
+        Args:
+            sessions (int, optional): Sesiones abiertas que se buscan; por defecto pool_max.
+
+        Returns:
+            int: Sesiones abiertas en el pool.
+        """
+        if not await self.__open_pool():
+            return 0
+        target = min(sessions or self.__pool_max, self.__pool_max)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.__executor, warm_pool, self.__pool, target)
+        except (oracle.DatabaseError, Exception) as exc:
+            logger.error(str(exc), exc_info=True)
+            return self.__pool.opened
+
+    async def close(self) -> None:
+        """Cerrar el pool de sesiones y detener el executor."""
+        pool, executor = self.__pool, self.__executor
+        self.__pool, self.__executor, self.__semaphore = None, None, None
+        if executor is not None:
+            await asyncio.get_running_loop().run_in_executor(None, executor.shutdown)
+        if pool is not None:
+            try:
+                pool.close()
+                logger.debug(CLOSE_CONNECTION)
+            except (oracle.DatabaseError, Exception) as exc:
+                logger.error(str(exc), exc_info=True)
+
+    async def read_data(self, query: str, parameters: Optional[dict] = None, datatype: str = "dict",
+                        fetch_profile: Optional[str] = None, cache_ttl: Optional[float] = None,
+                        cache_tags: List[str] = (), rowfactory: Optional[Callable] = None) -> [Dict, List]:
         """Obtener los datos de una consulta.
 
         Args:
             query (str): Consulta a ejecutar
-            parameters (dict, optional): Parámetros de la consulta
-            datatype (str, optional): Tipo de datos a retornar.
+            parameters (dict, optional): Parámetros de la consulta
+            datatype (str, optional): Tipo de datos a retornar: 'dict', 'list', 'tuple', 'namedtuple',
+                'columnar', 'numpy' o 'pandas'.
+            fetch_profile (str, optional): 'lookup', 'bulk' o 'auto'; por defecto el de la instancia.
+            cache_ttl (float, optional): Segundos de vida del resultado en el caché; 0 para no usar el caché.
+            cache_tags (List[str], optional): Etiquetas para invalidar el resultado con cache.invalidate.
+            rowfactory (Callable, optional): Función que recibe los valores de cada fila como argumentos y
+                construye la fila; el driver la aplica durante el fetch. Solo para 'dict', 'list', 'tuple' y
+                'namedtuple'.
+
+        Returns:
+            show_data[Dict, List]: Datos obtenidos.
+        """
+        metrics = self.__start_metrics('read_data', query)
+        if self.__cache is None or cache_ttl == 0 or datatype.lower() not in DATATYPES:
+            show_data = await self.__read_data(query, parameters, datatype, fetch_profile, metrics, rowfactory)
+        else:
+
+            def load():
+                if metrics is not None:
+                    metrics.cached = False
+                return self.__read_data(query, parameters, datatype, fetch_profile, metrics, rowfactory)
+
+            if metrics is not None:
+                metrics.cached = True
+            key = ResultCache.make_key(query, parameters, datatype.lower(), rowfactory)
+            show_data = await self.__cache.get_or_load_async(key, load, cache_ttl, cache_tags)
+        self.__report(metrics, parameters)
+        return show_data
+
+    async def __read_data(self, query: str, parameters: Optional[dict], datatype: str,
+                          fetch_profile: Optional[str], metrics: Optional[QueryMetrics] = None,
+                          rowfactory: Optional[Callable] = None) -> [Dict, List]:
+        """Obtener los datos de una consulta sin pasar por el caché.
+
+        Args:
+            query (str): Consulta a ejecutar
+            parameters (dict, optional): Parámetros de la consulta
+            datatype (str, optional): Tipo de datos a retornar: 'dict', 'list', 'tuple', 'namedtuple',
+                'columnar', 'numpy' o 'pandas'.
+            fetch_profile (str, optional): 'lookup', 'bulk' o 'auto'; por defecto el de la instancia.
+            metrics (QueryMetrics, optional): Métricas de la llamada.
+            rowfactory (Callable, optional): Función propia que construye cada fila.
 
         Returns:
             show_data[Dict, List]: Datos obtenidos.
         """
         show_data = None
         try:
-            if await self.__open_connection():
+            if await self.__open_pool():
                 datatype = datatype.lower()
 
-                if datatype in ['dict', 'list']:
+                if datatype in DATATYPES:
 
-                    def sync_read_data():
+                    def sync_read_data(cnx):
                         try:
-                            with self.__connection as cnx:
-                                with cnx.cursor() as cursor:
-                                    cursor.prefetchrows = 100000
-                                    cursor.arraysize = 100000
-                                    # Ejecutar la consulta
-                                    if parameters:
-                                        cursor.execute(query, parameters)
-                                    else:
-                                        cursor.execute(query)
-                                    # Obtener las descripciones de las columnas.
-                                    lob_columns = self.__find_lob_columns(cursor.description)
-                                    data = []
-
-                                    if len(lob_columns) > 0:
-                                        for row in cursor:
-                                            new_row = list(row)
-                                            for i, column in enumerate(row):
-                                                if i in lob_columns:
-                                                    new_row[i] = column.read()
-                                            data.append(tuple(new_row))
-                                    else:
-                                        data = cursor.fetchall()
-
-                                    # Gets column_names
-                                    columns = [column[0].upper() for column in cursor.description]
-
-                                    # Validate the datatype to return
-                                    if datatype == 'dict':
-                                        data = [dict(zip(columns, item)) for item in data]
-                                    elif datatype == 'list':
-                                        data = [columns, data]
-
-                                    logger.info(f'{DATA_OBTAINED} {query}')
-                                    return data
-                        except (cx_Oracle.DatabaseError, Exception) as exc:
+                            with cnx.cursor() as cursor:
+                                data = self.__read(cursor, query, parameters, datatype, fetch_profile, metrics,
+                                                   rowfactory)
+                                logger.info(f'{DATA_OBTAINED} {query}')
+                                return data
+                        except (oracle.DatabaseError, Exception) as exc:
                             logger.error(f"Error: {str(exc)}", exc_info=True)
+                            if metrics is not None:
+                                metrics.error = str(exc)
 
-                    show_data = await asyncio.get_event_loop().run_in_executor(None, sync_read_data)
+                    show_data = await self.__run(sync_read_data, metrics)
 
                 else:
                     logger.warning(INVALID_DATATYPE)
             else:
                 logger.warning(NO_CONNECTION)
+                if metrics is not None:
+                    metrics.error = NO_CONNECTION
         except Exception as exc:
             logger.error(f"Error: {str(exc)}", exc_info=True)
+            if metrics is not None:
+                metrics.error = str(exc)
         return show_data
 
-    async def execute_query(self, query: str, parameters: Optional[dict] = None) -> bool:
+    async def read_multi(self, query: str, parameters: dict = {}, cursors: Sequence[str] = (),
+                         names: Optional[Sequence[str]] = None, datatype: str = "dict",
+                         fetch_profile: Optional[str] = None) -> Optional[Dict]:
+        """Obtener varios resultados con un solo execute: REF CURSORs de salida y resultados implícitos de un
+        bloque PL/SQL, cada uno con la misma forma y manejo de Lobs que read_data.
+
+        Args:
+            query (str): Bloque anónimo o llamada a un procedimiento, por ejemplo
+                'begin dashboard.load(:client_id, :sales, :alerts); end;'.
+            parameters (Dict, optional): Parámetros de entrada del bloque.
+            cursors (Sequence[str], optional): Parámetros de salida de tipo REF CURSOR; se enlazan
+                automáticamente y su resultado lleva el nombre del parámetro.
+            names (Sequence[str], optional): Nombres de los resultados implícitos (DBMS_SQL.RETURN_RESULT), en
+                orden; los que falten se llaman result_1, result_2, ...
+            datatype (str, optional): Tipo de datos de cada resultado: 'dict', 'list', 'tuple', 'namedtuple',
+                'columnar', 'numpy' o 'pandas'.
+            fetch_profile (str, optional): 'lookup', 'bulk' o 'auto'; por defecto el de la instancia.
+
+        Returns:
+            Dict: Datos de cada resultado por nombre, primero los REF CURSORs y luego los implícitos; None si
+                hay un error.
+        """
+        metrics = self.__start_metrics('read_multi', query)
+        show_data = None
+        datatype = datatype.lower()
+        try:
+            if not await self.__open_pool():
+                logger.warning(NO_CONNECTION)
+                if metrics is not None:
+                    metrics.error = NO_CONNECTION
+            elif datatype not in DATATYPES:
+                logger.warning(INVALID_DATATYPE)
+            else:
+
+                def sync_read_multi(cnx):
+                    with cnx.cursor() as cursor:
+                        return read_multi(cursor, query, parameters, cursors, names, datatype,
+                                          fetch_profile or self.__fetch_profile, self.__lob_fetch,
+                                          self.__memory_budget, metrics)
+
+                show_data = await self.__run(sync_read_multi, metrics)
+                logger.info(f'{DATA_OBTAINED} {query}')
+        except (oracle.DatabaseError, Exception) as exc:
+            logger.error(f"Error: {str(exc)}", exc_info=True)
+            if metrics is not None:
+                metrics.error = str(exc)
+        self.__report(metrics, parameters)
+        return show_data
+
+    async def read_many(self, queries: Sequence, datatype: str = "dict", concurrency: Optional[int] = None,
+                        timeout: Optional[float] = None, fetch_profile: Optional[str] = None,
+                        coalesce: bool = True, cache_ttl: Optional[float] = None) -> List[ReadResult]:
+        """Obtener los datos de varias consultas independientes a la vez, en sesiones distintas del pool.
+
+        La latencia del lote es la de la consulta más lenta y no la suma de todas. Un error o un tiempo
+        vencido solo afecta a su consulta; al vencer el tiempo la llamada en curso se interrumpe con
+        cancel() y la sesión vuelve al pool.
+
+        Args:
+            queries (Sequence): Textos SQL o tuplas (query, parameters).
+            datatype (str, optional): Tipo de datos a retornar: 'dict', 'list', 'tuple', 'namedtuple',
+                'columnar', 'numpy' o 'pandas'.
+            concurrency (int, optional): Consultas ejecutadas a la vez; por defecto pool_max.
+            timeout (float, optional): Segundos máximos por consulta, contando la espera de la sesión.
+            fetch_profile (str, optional): 'lookup', 'bulk' o 'auto'; por defecto el de la instancia.
+            coalesce (bool, optional): True para ejecutar una sola vez las consultas repetidas del lote
+                (mismo SQL y parámetros); sus elementos comparten el mismo ReadResult.
+            cache_ttl (float, optional): Segundos de vida de los resultados en el caché; 0 para no usar el caché.
+
+        Returns:
+            List[ReadResult]: Resultado de cada consulta en el mismo orden de queries.
+        """
+        requests = normalize_requests(queries)
+        datatype = datatype.lower()
+        unique, positions = coalesce_requests(requests, datatype, coalesce)
+        results = [ReadResult(*requests[index]) for index in unique]
+        if datatype not in DATATYPES:
+            logger.warning(INVALID_DATATYPE)
+            for result in results:
+                result.error = INVALID_DATATYPE
+        elif not await self.__open_pool():
+            logger.warning(NO_CONNECTION)
+            for result in results:
+                result.error = NO_CONNECTION
+        else:
+            limit = asyncio.Semaphore(max(1, concurrency or self.__pool_max))
+            await asyncio.gather(*[self.__read_one(result, datatype, fetch_profile, limit, timeout, cache_ttl)
+                                   for result in results])
+        return [results[position] for position in positions]
+
+    async def __read_one(self, result: ReadResult, datatype: str, fetch_profile: Optional[str],
+                         limit: asyncio.Semaphore, timeout: Optional[float], cache_ttl: Optional[float]) -> None:
+        """Ejecutar una consulta de read_many y guardar sus datos o su error en result.
+
+        Args:
+            result (ReadResult): Resultado con la consulta y los parámetros.
+            datatype (str): Tipo de datos a retornar.
+            fetch_profile (str, optional): Perfil de fetch; por defecto el de la instancia.
+            limit (asyncio.Semaphore): Límite de consultas simultáneas del lote.
+            timeout (float, optional): Segundos máximos de la consulta.
+            cache_ttl (float, optional): Segundos de vida del resultado en el caché.
+        """
+        query, parameters = result.query, result.parameters
+        metrics = self.__start_metrics('read_many', query)
+        scope = CancelScope()
+        start = time.perf_counter()
+
+        def sync_read_one(cnx):
+            scope.enter(cnx)
+            try:
+                with cnx.cursor() as cursor:
+                    return self.__read(cursor, query, parameters, datatype, fetch_profile, metrics)
+            finally:
+                scope.exit()
+
+        async def load():
+            return await self.__run(sync_read_one, metrics, limit)
+
+        try:
+            if self.__cache is None or cache_ttl == 0:
+                loading = load()
+            else:
+                key = ResultCache.make_key(query, parameters, datatype)
+                loading = self.__cache.get_or_load_async(key, load, cache_ttl)
+            result.data = await asyncio.wait_for(loading, timeout)
+            logger.info(f'{DATA_OBTAINED} {query}')
+        except asyncio.TimeoutError:
+            scope.cancel()
+            result.timed_out = True
+            result.error = f"{QUERY_TIMEOUT} {timeout}s"
+            logger.error(f"Error in query {query}: {result.error}")
+        except asyncio.CancelledError:
+            scope.cancel()
+            raise
+        except (oracle.DatabaseError, Exception) as exc:
+            result.error = str(exc)
+            logger.error(f"Error in query {query}: {str(exc)}", exc_info=True)
+        finally:
+            result.seconds = time.perf_counter() - start
+            if metrics is not None:
+                metrics.error = result.error
+                self.__report(metrics, parameters)
+
+    async def read_batches(self, query: str, parameters: Optional[dict] = None, batch_size: int = BATCH_SIZE,
+                           datatype: str = "dict", queue_size: int = QUEUE_SIZE) -> AsyncIterator[List]:
+        """Obtener los datos de una consulta en bloques con `async for`.
+
+        Un hilo productor lee los bloques con fetchmany y los deja en una cola acotada; si el
+        consumidor es más lento, el productor espera (backpressure). La sesión del pool permanece
+        ocupada solo mientras se consume el iterador.
+
+        Args:
+            query (str): Consulta a ejecutar
+            parameters (dict, optional): Parámetros de la consulta
+            batch_size (int, optional): Cantidad de filas por bloque.
+            datatype (str, optional): 'dict' para diccionarios, 'namedtuple' para registros, 'list' o 'tuple'
+                para tuplas.
+            queue_size (int, optional): Cantidad máxima de bloques en espera.
+
+        Yields:
+            List: Bloque de filas.
+        """
+        datatype = datatype.lower()
+        if datatype not in ROW_DATATYPES:
+            logger.warning(INVALID_DATATYPE)
+            return
+        if not await self.__open_pool():
+            logger.warning(NO_CONNECTION)
+            return
+
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        stop = threading.Event()
+        done = object()
+
+        def put(item) -> None:
+            # Bloquea el hilo productor mientras la cola está llena.
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+        def sync_produce(cnx):
+            try:
+                with cnx.cursor() as cursor:
+                    cursor.prefetchrows = batch_size
+                    cursor.arraysize = batch_size
+                    set_lob_fetch(cursor, self.__lob_fetch)
+                    if parameters:
+                        cursor.execute(query, parameters)
+                    else:
+                        cursor.execute(query)
+                    columns = get_columns(cursor.description)
+                    for rows in fetch_batches(cursor, batch_size, row_factory(columns, datatype)):
+                        if stop.is_set():
+                            return
+                        put(rows)
+                logger.info(f'{DATA_OBTAINED} {query}')
+                if not stop.is_set():
+                    put(done)
+            except (oracle.DatabaseError, Exception) as exc:
+                logger.error(f"Error: {str(exc)}", exc_info=True)
+                if not stop.is_set():
+                    put(exc)
+
+        def producer_done(task: asyncio.Future) -> None:
+            # Si no se obtiene la sesión, sync_produce no corre y nada llega a la cola: se entrega el error.
+            if task.cancelled() or task.exception() is None:
+                return
+            logger.error(f"Error: {str(task.exception())}")
+            try:
+                queue.put_nowait(task.exception())
+            except asyncio.QueueFull:
+                pass
+
+        producer = asyncio.ensure_future(self.__run(sync_produce))
+        producer.add_done_callback(producer_done)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            # Vaciar la cola para liberar al productor si está esperando espacio.
+            while not producer.done():
+                while not queue.empty():
+                    queue.get_nowait()
+                await asyncio.wait([producer], timeout=0.1)
+
+    async def read_iter(self, query: str, parameters: Optional[dict] = None, batch_size: int = BATCH_SIZE,
+                        datatype: str = "dict") -> AsyncIterator:
+        """Obtener los datos de una consulta fila por fila con `async for`.
+
+        Args:
+            query (str): Consulta a ejecutar
+            parameters (dict, optional): Parámetros de la consulta
+            batch_size (int, optional): Cantidad de filas por viaje a la base de datos.
+            datatype (str, optional): 'dict' para diccionarios, 'namedtuple' para registros, 'list' o 'tuple'
+                para tuplas.
+
+        Yields:
+            Fila con la forma solicitada.
+        """
+        batches = self.read_batches(query, parameters, batch_size, datatype)
+        try:
+            async for rows in batches:
+                for row in rows:
+                    yield row
+        finally:
+            await batches.aclose()
+
+    async def export_query(self, query: str, parameters: Optional[dict] = None, path: str = "",
+                           file_format: str = 'csv', compression: Optional[str] = None,
+                           batch_size: int = BATCH_SIZE) -> ExportResult:
+        """Exportar el resultado de una consulta a un archivo por bloques en el executor, sin bloquear
+        el event loop ni cargar todo el resultado en memoria.
+
+        Args:
+            query (str): Consulta a ejecutar.
+            parameters (dict, optional): Parámetros de la consulta.
+            path (str): Ruta del archivo de salida.
+            file_format (str, optional): 'csv', 'jsonl' o 'parquet' (requiere pyarrow).
+            compression (str, optional): 'gzip', 'bz2' o 'xz' para CSV/JSONL, comprimido en un hilo aparte
+                mientras se obtienen los bloques; para Parquet un códec de pyarrow ('snappy', 'zstd', ...).
+            batch_size (int, optional): Filas por fetchmany y por grupo de filas en Parquet.
+
+        Returns:
+            ExportResult: Filas y bytes escritos, duración y velocidad; error si falló.
+        """
+        result = ExportResult(path, file_format)
+        result.error = validate_export(file_format, compression)
+        if result.error is not None:
+            logger.warning(result.error)
+            return result
+
+        def sync_export_query(cnx):
+            with cnx.cursor() as cursor:
+                cursor.arraysize = batch_size
+                cursor.prefetchrows = batch_size
+                set_lob_fetch(cursor, self.__lob_fetch)
+                cursor.execute(query, parameters or {})
+                return export_cursor(cursor, path, file_format, compression, batch_size)
+
+        try:
+            if await self.__open_pool():
+                result = await self.__run(sync_export_query)
+                logger.info(f"{DATA_EXPORTED} {query}")
+            else:
+                result.error = NO_CONNECTION
+        except (oracle.DatabaseError, Exception) as exc:
+            logger.error(f"Error in query {query}: {str(exc)}", exc_info=True)
+            result.error = str(exc)
+        return result
+
+    async def execute_query(self, query: str, parameters: Optional[dict] = None, autocommit: bool = False) -> bool:
         """
         Ejecutar una consulta.
 
         Args:
             query (str): Consulta a ejecutar.
-            parameters (Dict, optional): Parámetros de la consulta.
+            parameters (Dict, optional): Parámetros de la consulta; las listas se enlazan como colecciones.
+            autocommit (bool, optional): Confirmar en el mismo viaje que la sentencia, sin un commit aparte.
 
         Returns:
             bool: True si se ejecuta correctamente, False en caso contrario.
         """
-        if await self.__open_connection():
-            def sync_execute_query():
+        result = False
+        metrics = self.__start_metrics('execute_query', query)
+        if await self.__open_pool():
+            def sync_execute_query(cnx):
                 try:
-                    with self.__connection as cnx:
-                        with cnx.cursor() as cursor:
-                            if parameters:
-                                cursor.execute(query, parameters)
-                            else:
-                                cursor.execute(query)
-                        cnx.commit()
-                        logger.info(f"{EXECUTED_QUERY} {query}")
-                        return True
-                except (cx_Oracle.DatabaseError, Exception) as exc:
+                    with cnx.cursor() as cursor:
+                        values = bind_statement(cnx, query, parameters or {})
+                        with timed(metrics, 'execute'), commit_on_success(cnx, autocommit):
+                            cursor.execute(query, values)
+                            if metrics is not None:
+                                metrics.record_execute(cursor)
+                    if not autocommit:
+                        with timed(metrics, 'commit'):
+                            cnx.commit()
+                    if self.__cache is not None:
+                        self.__cache.invalidate_query(query)
+                    logger.info(f"{EXECUTED_QUERY} {query}")
+                    return True
+                except (oracle.DatabaseError, Exception) as exc:
                     logger.error(f"Error en query {query}: {str(exc)}", exc_info=True)
-                    cnx.rollback()
+                    if metrics is not None:
+                        metrics.error = str(exc)
+                    if not is_disconnect_error(exc):
+                        cnx.rollback()
+                    return False
+
+            try:
+                result = await self.__run(sync_execute_query, metrics)
+            except (oracle.DatabaseError, Exception) as exc:
+                # Error al obtener la sesión del pool (tiempo de espera, pool caído).
+                logger.error(f"Error en query {query}: {str(exc)}", exc_info=True)
+                if metrics is not None:
+                    metrics.error = str(exc)
+        else:
+            logger.warning(NO_CONNECTION)
+            if metrics is not None:
+                metrics.error = NO_CONNECTION
+        self.__report(metrics, parameters)
+        return result
 
-            await asyncio.get_event_loop().run_in_executor(None, sync_execute_query)
-            return True
+    async def execute_many(self, query: str, values: List, autocommit: bool = False) -> bool:
+        """Ejecutar una consulta con varios valores.
+
+        Args:
+            query (str): Consulta a ejecutar.
+            values (List): Valores de la consulta.
+            autocommit (bool, optional): Confirmar en el mismo viaje que la sentencia, sin un commit aparte.
+
+        Returns:
+            bool: True si se ejecuta correctamente, False en caso contrario.
+        """
+        result = False
+        metrics = self.__start_metrics('execute_many', query)
+        if await self.__open_pool():
+            def sync_execute_many(cnx):
+                try:
+                    with cnx.cursor() as cursor:
+                        with timed(metrics, 'execute'), commit_on_success(cnx, autocommit):
+                            cursor.prepare(query)
+                            cursor.executemany(None, values)
+                        if metrics is not None:
+                            metrics.record_execute(cursor)
+                    if not autocommit:
+                        with timed(metrics, 'commit'):
+                            cnx.commit()
+                    if self.__cache is not None:
+                        self.__cache.invalidate_query(query)
+                    logger.info(f"{EXECUTED_QUERY} {query}")
+                    return True
+                except (oracle.DatabaseError, Exception) as exc:
+                    logger.error(f"Error en query {query}: {str(exc)}", exc_info=True)
+                    if metrics is not None:
+                        metrics.error = str(exc)
+                    if not is_disconnect_error(exc):
+                        cnx.rollback()
+                    return False
+
+            try:
+                result = await self.__run(sync_execute_many, metrics)
+            except (oracle.DatabaseError, Exception) as exc:
+                # Error al obtener la sesión del pool (tiempo de espera, pool caído).
+                logger.error(f"Error en query {query}: {str(exc)}", exc_info=True)
+                if metrics is not None:
+                    metrics.error = str(exc)
         else:
             logger.warning(NO_CONNECTION)
-            return False
+            if metrics is not None:
+                metrics.error = NO_CONNECTION
+        self.__report(metrics, values[0] if values else None)
+        return result
+
+
+class AsyncRouter:
+    """ AsyncDB sobre varios endpoints (setup con la key 'endpoints', ver OracleCnx.routing): un pool por
+    endpoint, las lecturas repartidas entre las réplicas y las escrituras en el primario.
+
+    AsyncDB(setup) retorna un AsyncRouter cuando el setup trae 'endpoints'. Los métodos que no están aquí
+    (export_query, ...) se ejecutan en el primario.
+    """
+
+    def __init__(self, setup: Dict, *args, **kwargs) -> None:
+        """Constructor.
+
+        Args:
+            setup (Dict): Setup con la key 'endpoints' y las keys opcionales de enrutamiento.
+            *args, **kwargs: Parámetros de AsyncDB que se usan en el pool de cada endpoint (pool_max, cache,
+                ...); el metrics_hook recibe las métricas de todos los endpoints.
+        """
+        options = inspect.signature(AsyncDB.__init__).bind(None, setup, *args, **kwargs).arguments
+        self.__router, endpoints = build_router(setup)
+        self.__probe_query = setup.get('probe_query', ROUTING_PROBE_QUERY)
+        self.__metrics_hook = options.pop('metrics_hook', None)
+        self.__probes = set()
+        self.__pools: Dict[str, AsyncDB] = {}
+        for endpoint, endpoint_setup in endpoints:
+            options.update(setup=endpoint_setup,
+                           metrics_hook=lambda metrics, endpoint=endpoint: self.__observe(endpoint, metrics))
+            self.__pools[endpoint.name] = AsyncDB(**{key: value for key, value in options.items() if key != 'self'})
+
+    async def __aenter__(self) -> "AsyncRouter":
+        await self.warmup(1)
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.close()
+
+    def __getattr__(self, name: str):
+        # Solo se llama para los atributos que AsyncRouter no define.
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.__pools[self.__router.primary.name], name)
+
+    def __observe(self, endpoint: Endpoint, metrics: QueryMetrics) -> None:
+        """Registrar en el router la latencia y el error de una consulta y entregar las métricas al hook."""
+        self.__router.record(endpoint, metrics.seconds, metrics.error)
+        emit(self.__metrics_hook, metrics)
+
+    def __read_pool(self):
+        """Elegir el endpoint de una lectura y lanzar las pruebas de las réplicas pendientes."""
+        for endpoint in self.__router.due_probes():
+            task = asyncio.ensure_future(self.__probe(endpoint))
+            # Se guarda una referencia para que la tarea no se recolecte antes de terminar.
+            self.__probes.add(task)
+            task.add_done_callback(self.__probes.discard)
+        endpoint = self.__router.acquire_read()
+        return endpoint, self.__pools[endpoint.name]
+
+    async def __probe(self, endpoint: Endpoint) -> None:
+        """Probar una réplica fuera de la rotación con probe_query antes de volver a admitirla."""
+        healthy = False
+        try:
+            data = await self.__pools[endpoint.name].read_data(self.__probe_query, datatype='list', cache_ttl=0)
+            healthy = data is not None
+        finally:
+            self.__router.readmit(endpoint, healthy)
+
+    async def read_data(self, query: str, *args, **kwargs) -> [Dict, List]:
+        """Obtener los datos de una consulta en la réplica con menos carga (ver AsyncDB.read_data)."""
+        endpoint, pool = self.__read_pool()
+        try:
+            return await pool.read_data(query, *args, **kwargs)
+        finally:
+            self.__router.release(endpoint)
+
+    async def read_multi(self, query: str, *args, **kwargs) -> Optional[Dict]:
+        """Obtener varios resultados de un bloque PL/SQL en la réplica con menos carga (ver AsyncDB.read_multi)."""
+        endpoint, pool = self.__read_pool()
+        try:
+            return await pool.read_multi(query, *args, **kwargs)
+        finally:
+            self.__router.release(endpoint)
+
+    async def read_many(self, queries: Sequence, *args, **kwargs) -> List[ReadResult]:
+        """Obtener los datos de varias consultas a la vez en la réplica con menos carga (ver AsyncDB.read_many)."""
+        endpoint, pool = self.__read_pool()
+        try:
+            return await pool.read_many(queries, *args, **kwargs)
+        finally:
+            self.__router.release(endpoint)
+
+    async def read_batches(self, query: str, *args, **kwargs) -> AsyncIterator[List]:
+        """Obtener los datos de una consulta en bloques desde una réplica (ver AsyncDB.read_batches)."""
+        endpoint, pool = self.__read_pool()
+        batches = pool.read_batches(query, *args, **kwargs)
+        try:
+            async for rows in batches:
+                yield rows
+        finally:
+            await batches.aclose()
+            self.__router.release(endpoint)
+
+    async def read_iter(self, query: str, *args, **kwargs) -> AsyncIterator:
+        """Obtener los datos de una consulta fila por fila desde una réplica (ver AsyncDB.read_iter)."""
+        endpoint, pool = self.__read_pool()
+        rows = pool.read_iter(query, *args, **kwargs)
+        try:
+            async for row in rows:
+                yield row
+        finally:
+            await rows.aclose()
+            self.__router.release(endpoint)
+
+    async def __write(self, method: str, *args, **kwargs):
+        """Ejecutar una escritura en el primario."""
+        endpoint = self.__router.acquire_write()
+        try:
+            return await getattr(self.__pools[endpoint.name], method)(*args, **kwargs)
+        finally:
+            self.__router.release(endpoint)
+
+    async def execute_query(self, query: str, *args, **kwargs) -> bool:
+        """Ejecutar una sentencia en el primario (ver AsyncDB.execute_query)."""
+        return await self.__write('execute_query', query, *args, **kwargs)
+
+    async def execute_many(self, query: str, *args, **kwargs) -> bool:
+        """Ejecutar una sentencia con varios valores en el primario (ver AsyncDB.execute_many)."""
+        return await self.__write('execute_many', query, *args, **kwargs)
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[AsyncTransaction]:
+        """Ejecutar varias sentencias en el primario con un solo commit al final (ver AsyncDB.transaction)."""
+        endpoint = self.__router.acquire_write()
+        try:
+            async with self.__pools[endpoint.name].transaction() as tx:
+                yield tx
+        finally:
+            self.__router.release(endpoint)
+
+    def endpoint_stats(self) -> Dict[str, Dict]:
+        """Obtener los indicadores del router por endpoint (ver Router.stats)."""
+        return self.__router.stats()
+
+    async def warmup(self, sessions: Optional[int] = None) -> int:
+        """Crear el pool de cada endpoint y abrir sesiones por adelantado.
+
+        Returns:
+            int: Sesiones abiertas en todos los endpoints.
+        """
+        return sum(await asyncio.gather(*[pool.warmup(sessions) for pool in self.__pools.values()]))
+
+    async def close(self) -> None:
+        """Cerrar el pool de cada endpoint."""
+        for task in list(self.__probes):
+            task.cancel()
+        for pool in self.__pools.values():
+            await pool.close()
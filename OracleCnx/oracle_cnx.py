@@ -5,16 +5,35 @@ Created on Mon Oct 02 10:00:00 2023
 @author: Jhonatan Martínez
 """
 
-import cx_Oracle
-from typing import Dict, List
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence
 from loguru import logger
 from OracleCnx.constants import *
+from OracleCnx.driver import connect, describe_setup, oracle, required_attributes, use_backend
+from OracleCnx.binds import bind_collections, bind_statement, has_collections, merge_results
+from OracleCnx.bulk import BulkLoadResult, bulk_load
+from OracleCnx.cache import ResultCache
+from OracleCnx.columnar import read_columnar
+from OracleCnx.export import ExportResult, export_cursor, validate_export
+from OracleCnx.metrics import QueryMetrics, emit, timed
+from OracleCnx.multi import read_multi
+from OracleCnx.slowlog import SlowQueryLog
+from OracleCnx.statements import StatementCache
+from OracleCnx.transaction import Transaction, commit_on_success
+from OracleCnx.tuning import learn_row_width, tune_cursor
+from OracleCnx.upsert import BatchSource, UpsertResult, plan_upsert, upsert_batches
+from OracleCnx.utils import fetch_all, fetch_batches, get_columns, is_disconnect_error, row_factory, set_lob_fetch
 
 
 class ConnectionDB:
     """ Permite realizar una conexión a una Base de Datos"""
 
-    def __init__(self, setup: Dict[str, str]) -> None:
+    def __init__(self, setup: Dict[str, str], persistent: bool = False, ping_interval: float = PING_INTERVAL,
+                 lob_fetch: str = 'inline', fetch_profile: str = 'auto',
+                 memory_budget: int = FETCH_MEMORY_BUDGET, stmtcachesize: int = STMT_CACHE_SIZE,
+                 cache: Optional[ResultCache] = None, metrics_hook: Optional[Callable] = None,
+                 slow_log: Optional[SlowQueryLog] = None) -> None:
         """Constructor.
 
         Args:
@@ -26,51 +45,86 @@ class ConnectionDB:
                 - user: Database user.
                 - password: Database password.
                 - driver: Database driver.
+        persistent (bool): Si es True se reutiliza una sola conexión entre llamadas hasta invocar close().
+            Si es False se abre y se cierra una conexión por cada llamada.
+        ping_interval (float): Segundos de inactividad tras los cuales se valida la conexión persistente
+            con un ping antes de usarla.
+        lob_fetch (str): 'inline' obtiene los CLOB/NCLOB/BLOB como str/bytes en el mismo fetch;
+            'stream' obtiene localizadores y los lee por partes (para valores muy grandes).
+        fetch_profile (str): Ajuste por defecto de arraysize/prefetchrows: 'lookup', 'bulk' o 'auto'.
+        memory_budget (int): Bytes máximos por bloque de filas en los perfiles 'bulk' y 'auto'.
+        stmtcachesize (int): Tamaño del caché de sentencias del cliente Oracle para cada conexión.
+        cache (ResultCache): Caché de resultados para read_data; None para no usar caché.
+        metrics_hook (Callable): Función que recibe un QueryMetrics después de cada read_data, execute_query
+            y execute_many, por ejemplo un MetricsAggregator; None para no medir.
+        slow_log (SlowQueryLog): Registro de las consultas lentas; None para no registrarlas.
 
         Returns:
             None.
         """
-
-        self.__attributes = ['host', 'port', 'sdi', 'user', 'password', 'driver']
-        self.__connection: cx_Oracle.connect = None
+        self.__connection = None
         self.__setup: Dict = setup
+        self.__persistent = persistent
+        self.__ping_interval = ping_interval
+        self.__last_used: float = 0.0
+        self.__lob_fetch = lob_fetch
+        self.__fetch_profile = fetch_profile
+        self.__memory_budget = memory_budget
+        self.__stmtcachesize = stmtcachesize
+        self.__cache = cache
+        self.__metrics_hook = metrics_hook
+        self.__slow_log = slow_log
+        self.__statements = StatementCache()
         self.__main()
 
-    @staticmethod
-    def __find_lob_columns(column_descriptions) -> List:
-        """Iterar sobre las descripciones de las columnas y mostrar información sobre los tipos de datos.
-        Returns:
-            List: Lista con los índices de las columnas Lobs.
-        """
-        lob_columns = []
-        for index, column in enumerate(column_descriptions):
-            # column_name, type_code, display_size, internal_size, precision, scale, null_ok = column
-            type_code: int = column[1]
-            if type_code == cx_Oracle.CLOB:
-                lob_columns.append(index)
-        return lob_columns
+    def __enter__(self) -> "ConnectionDB":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
 
     def __main(self) -> None:
         """Válida que el diccionario contenga los atributos necesarios para que la clase funcione."""
-        logger.debug(self.__setup)
-        missing = [key for key in self.__attributes if str(key).lower() not in self.__setup.keys()]
+        logger.debug(describe_setup(self.__setup))
+        backend = use_backend(self.__setup)
+        missing = [key for key in required_attributes(backend) if str(key).lower() not in self.__setup.keys()]
         if len(missing) > 0:
             logger.error(MISSING_ATTRIBUTES)
             logger.error(missing)
-        try:
-            cx_Oracle.init_oracle_client(lib_dir=self.__setup["driver"])
-        except (cx_Oracle.DatabaseError, cx_Oracle.IntegrityError, Exception) as exc:
-            if cx_Oracle.clientversion() is None:
-                logger.warning(str(exc))
+        if self.__lob_fetch not in LOB_FETCH_MODES:
+            logger.warning(f"{INVALID_LOB_FETCH} {self.__lob_fetch}")
+        if self.__fetch_profile not in FETCH_PROFILES:
+            logger.warning(f"{INVALID_FETCH_PROFILE} {self.__fetch_profile}")
 
     def __close_connection(self) -> None:
         """Cerrar la conexión a la base de datos."""
+        self.__statements.clear()
         try:
             if self.__connection is not None:
                 self.__connection.close()
                 logger.debug(CLOSE_CONNECTION)
-        except (cx_Oracle.DatabaseError, Exception) as exc:
+        except (oracle.DatabaseError, Exception) as exc:
             logger.error(str(exc), exc_info=True)
+        finally:
+            self.__connection = None
+
+    def __is_alive(self) -> bool:
+        """Validar la conexión persistente con un ping si estuvo inactiva más de ping_interval.
+
+        Returns:
+            bool: True si la conexión se puede reutilizar, False en caso contrario.
+        """
+        if self.__connection is None:
+            return False
+        if time.monotonic() - self.__last_used < self.__ping_interval:
+            return True
+        try:
+            self.__connection.ping()
+            return True
+        except (oracle.DatabaseError, Exception) as exc:
+            logger.warning(f"{LOST_CONNECTION} {str(exc)}")
+            self.__close_connection()
+            return False
 
     def __get_connection(self) -> bool:
         """Crear y obtener la conexión a una base de datos
@@ -79,13 +133,13 @@ class ConnectionDB:
             bool: True si se establece la conexión, False en caso contrario.
         """
 
+        if self.__persistent and self.__is_alive():
+            return True
         self.__connection = None
         try:
-            dsn = self.__setup["host"] + ":" + self.__setup["port"] + '/' + self.__setup["sdi"]
-            self.__connection = cx_Oracle.connect(user=self.__setup["user"],
-                                                  password=self.__setup["password"],
-                                                  dsn=dsn,
-                                                  encoding="UTF-8")
+            self.__connection = connect(self.__setup, encoding="UTF-8")
+            self.__connection.stmtcachesize = self.__stmtcachesize
+            self.__last_used = time.monotonic()
             logger.debug(ESTABLISHED_CONNECTION, self.__setup["host"])
             return True
         except (ConnectionError, Exception) as exc:
@@ -93,113 +147,642 @@ class ConnectionDB:
             logger.error(str(exc), exc_info=True)
             return False
 
-    def read_data(self, query: str, parameters: dict = {}, datatype: str = "dict") -> [Dict, List]:
+    @contextmanager
+    def __use_connection(self) -> Iterator:
+        """Entregar la conexión actual; en modo de una sola llamada se cierra al terminar.
+
+        Yields:
+            cx_Oracle.Connection: Conexión a la base de datos.
+        """
+        try:
+            yield self.__connection
+        except oracle.DatabaseError as exc:
+            if is_disconnect_error(exc):
+                self.__close_connection()
+            raise
+        finally:
+            if self.__persistent:
+                self.__last_used = time.monotonic()
+            else:
+                self.__close_connection()
+
+    def __run(self, operation: Callable, retry: bool = True):
+        """Ejecutar una operación con la conexión. En modo persistente, si la conexión se perdió,
+        se reconecta y se reintenta una vez.
+
+        Args:
+            operation (Callable): Función que recibe la conexión.
+            retry (bool, optional): False para las escrituras: el servidor pudo aplicar la sentencia antes
+                de perder la conexión, así que no se repite; la conexión se recrea en la siguiente llamada.
+
+        Returns:
+            Resultado de la operación.
+        """
+        try:
+            with self.__use_connection() as cnx:
+                return operation(cnx)
+        except oracle.DatabaseError as exc:
+            if not (retry and self.__persistent and is_disconnect_error(exc)):
+                raise
+            logger.warning(f"{LOST_CONNECTION} {str(exc)}")
+            if not self.__get_connection():
+                raise
+            with self.__use_connection() as cnx:
+                return operation(cnx)
+
+    def __read(self, cursor, query: str, parameters: Dict, datatype: str, fetch_profile: Optional[str],
+               prepared: bool = False, metrics: Optional[QueryMetrics] = None,
+               rowfactory: Optional[Callable] = None) -> [Dict, List]:
+        """Ejecutar una consulta en un cursor y obtener los datos con la forma solicitada.
+
+        Args:
+            cursor: Cursor donde se ejecuta la consulta.
+            query (str): Consulta a ejecutar.
+            parameters (Dict): Parámetros de la consulta; las listas se enlazan como colecciones.
+            datatype (str): Tipo de datos a retornar.
+            fetch_profile (str, optional): Perfil de fetch; por defecto el de la instancia.
+            prepared (bool, optional): True si el cursor ya tiene la consulta preparada.
+            metrics (QueryMetrics, optional): Métricas donde se registran las fases de la lectura.
+            rowfactory (Callable, optional): Función propia que construye cada fila a partir de sus valores.
+
+        Returns:
+            Datos obtenidos.
+        """
+        if rowfactory is not None and datatype not in ROW_DATATYPES:
+            raise ValueError(f"{INVALID_ROWFACTORY} {datatype}")
+        if has_collections(query, parameters):
+            chunks = bind_collections(cursor.connection, query, parameters)
+            return merge_results([self.__read(cursor, query, chunk, datatype, fetch_profile, prepared, metrics,
+                                              rowfactory) for chunk in chunks], datatype)
+        tune_cursor(cursor, query, fetch_profile or self.__fetch_profile, self.__memory_budget)
+        set_lob_fetch(cursor, self.__lob_fetch)
+        # Ejecutar la consulta
+        with timed(metrics, 'execute'):
+            cursor.execute(None if prepared else query, parameters)
+        learn_row_width(query, cursor.description)
+        if datatype in COLUMNAR_DATATYPES:
+            return read_columnar(cursor, datatype, cursor.arraysize, metrics)
+        # Gets column_names
+        columns = get_columns(cursor.description)
+        # El driver arma cada fila durante el fetch, sin una segunda pasada sobre los datos.
+        data = fetch_all(cursor, metrics, row_factory(columns, datatype, rowfactory))
+        if datatype == 'list':
+            return [columns, data]
+        return data
+
+    def __start_metrics(self, operation: str, query: str) -> Optional[QueryMetrics]:
+        """Crear las métricas de una llamada si hay un metrics_hook o un slow_log configurado."""
+        if self.__metrics_hook is None and self.__slow_log is None:
+            return None
+        return QueryMetrics(operation, query)
+
+    def __report(self, metrics: Optional[QueryMetrics], parameters=None) -> None:
+        """Cerrar las métricas de una llamada, registrarla en el slow_log si fue lenta y entregarlas al
+        metrics_hook."""
+        if metrics is None:
+            return
+        metrics.finish()
+        if self.__slow_log is not None:
+            self.__slow_log.observe(metrics, parameters, self.__plan_session)
+        emit(self.__metrics_hook, metrics)
+
+    def __plan_session(self):
+        """Sesión donde el slow_log consulta el plan de una consulta lenta; se cierra o libera al terminar."""
+        return connect(self.__setup, encoding="UTF-8")
+
+    def warmup(self) -> bool:
+        """Abrir por adelantado la conexión persistente, para que la primera consulta no espere la conexión.
+
+        Returns:
+            bool: True si la conexión está abierta; False si falla o si la instancia no es persistente.
+        """
+        return self.__persistent and self.__get_connection()
+
+    def close(self) -> None:
+        """Cerrar la conexión persistente, si existe."""
+        self.__close_connection()
+
+    def read_data(self, query: str, parameters: dict = {}, datatype: str = "dict",
+                  fetch_profile: Optional[str] = None, cache_ttl: Optional[float] = None,
+                  cache_tags: List[str] = (), rowfactory: Optional[Callable] = None) -> [Dict, List]:
         """Obtener los datos de una consulta.
 
         Args:
             query (str): Consulta a ejecutar.
-            parameters (Dict, optional): Parámetros de la consulta.
-            datatype (str, optional): Tipo de datos a retornar.
+            parameters (Dict, optional): Parámetros de la consulta.
+            datatype (str, optional): Tipo de datos a retornar: 'dict', 'list', 'tuple', 'namedtuple',
+                'columnar', 'numpy' o 'pandas'.
+            fetch_profile (str, optional): 'lookup', 'bulk' o 'auto'; por defecto el de la instancia.
+            cache_ttl (float, optional): Segundos de vida del resultado en el caché; 0 para no usar el caché.
+            cache_tags (List[str], optional): Etiquetas para invalidar el resultado con cache.invalidate.
+            rowfactory (Callable, optional): Función que recibe los valores de cada fila como argumentos y
+                construye la fila; el driver la aplica durante el fetch. Solo para 'dict', 'list', 'tuple' y
+                'namedtuple'.
+
+        Returns:
+            show_data[Dict,List]: Datos obtenidos.
+        """
+        metrics = self.__start_metrics('read_data', query)
+        if self.__cache is None or cache_ttl == 0 or datatype.lower() not in DATATYPES:
+            show_data = self.__read_data(query, parameters, datatype, fetch_profile, metrics, rowfactory)
+        else:
+
+            def load():
+                if metrics is not None:
+                    metrics.cached = False
+                return self.__read_data(query, parameters, datatype, fetch_profile, metrics, rowfactory)
+
+            if metrics is not None:
+                metrics.cached = True
+            key = ResultCache.make_key(query, parameters, datatype.lower(), rowfactory)
+            show_data = self.__cache.get_or_load(key, load, cache_ttl, cache_tags)
+        self.__report(metrics, parameters)
+        return show_data
+
+    def __read_data(self, query: str, parameters: Dict, datatype: str, fetch_profile: Optional[str],
+                    metrics: Optional[QueryMetrics] = None, rowfactory: Optional[Callable] = None) -> [Dict, List]:
+        """Obtener los datos de una consulta sin pasar por el caché.
+
+        Args:
+            query (str): Consulta a ejecutar.
+            parameters (Dict, optional): Parámetros de la consulta.
+            datatype (str, optional): Tipo de datos a retornar: 'dict', 'list', 'tuple', 'namedtuple',
+                'columnar', 'numpy' o 'pandas'.
+            fetch_profile (str, optional): 'lookup', 'bulk' o 'auto'; por defecto el de la instancia.
+            metrics (QueryMetrics, optional): Métricas de la llamada.
+            rowfactory (Callable, optional): Función propia que construye cada fila.
 
         Returns:
             show_data[Dict,List]: Datos obtenidos.
         """
         show_data = None
-        if self.__get_connection():
+        with timed(metrics, 'acquire'):
+            connected = self.__get_connection()
+        if connected:
             datatype = datatype.lower()
-            if datatype in ['dict', 'list']:
+            if datatype in DATATYPES:
+
+                def sync_read_data(cnx):
+                    with cnx.cursor() as cursor:
+                        return self.__read(cursor, query, parameters, datatype, fetch_profile, metrics=metrics,
+                                           rowfactory=rowfactory)
+
                 try:
-                    with self.__connection as cnx:
-                        with cnx.cursor() as cursor:
-                            cursor.prefetchrows = 100000
-                            cursor.arraysize = 100000
-                            # Ejecutar la consulta
-                            cursor.execute(query, parameters)
-                            query = cursor.statement
-                            # Obtener las descripciones de las columnas.
-                            lob_columns = self.__find_lob_columns(cursor.description)
-                            data = []
-                            if len(lob_columns) > 0:
-                                for row in cursor:
-                                    new_row = list(row)
-                                    for i, column in enumerate(row):
-                                        if i in lob_columns:
-                                            new_row[i] = column.read()
-                                    data.append(tuple(new_row))
-                            else:
-                                data = cursor.fetchall()
-                            # Gets column_names
-                            columns = [column[0].upper() for column in cursor.description]
-                            # Validate the datatype to return
-                            if datatype == 'dict':
-                                dictionary = []
-                                for item in data:
-                                    dictionary.append(dict(zip(columns, item)))
-                                show_data = dictionary
-                            elif datatype == 'list':
-                                show_data = [columns, data]
-                        logger.info(DATA_OBTAINED, query)
-                except (cx_Oracle.DatabaseError, Exception) as exc:
+                    show_data = self.__run(sync_read_data)
+                    logger.info(DATA_OBTAINED, query)
+                except (oracle.DatabaseError, Exception) as exc:
                     logger.error(f"Error en query {query}: {str(exc)}", exc_info=True)
+                    if metrics is not None:
+                        metrics.error = str(exc)
             else:
                 logger.warning(INVALID_DATATYPE)
         else:
             logger.warning(NO_CONNECTION)
+            if metrics is not None:
+                metrics.error = NO_CONNECTION
+
+        return show_data
+
+    def read_multi(self, query: str, parameters: dict = {}, cursors: Sequence[str] = (),
+                   names: Optional[Sequence[str]] = None, datatype: str = "dict",
+                   fetch_profile: Optional[str] = None) -> Optional[Dict]:
+        """Obtener varios resultados con un solo execute: REF CURSORs de salida y resultados implícitos de un
+        bloque PL/SQL, cada uno con la misma forma y manejo de Lobs que read_data.
+
+        Args:
+            query (str): Bloque anónimo o llamada a un procedimiento, por ejemplo
+                'begin dashboard.load(:client_id, :sales, :alerts); end;'.
+            parameters (Dict, optional): Parámetros de entrada del bloque.
+            cursors (Sequence[str], optional): Parámetros de salida de tipo REF CURSOR; se enlazan
+                automáticamente y su resultado lleva el nombre del parámetro.
+            names (Sequence[str], optional): Nombres de los resultados implícitos (DBMS_SQL.RETURN_RESULT), en
+                orden; los que falten se llaman result_1, result_2, ...
+            datatype (str, optional): Tipo de datos de cada resultado: 'dict', 'list', 'tuple', 'namedtuple',
+                'columnar', 'numpy' o 'pandas'.
+            fetch_profile (str, optional): 'lookup', 'bulk' o 'auto'; por defecto el de la instancia.
+
+        Returns:
+            Dict: Datos de cada resultado por nombre, primero los REF CURSORs y luego los implícitos; None si
+                hay un error.
+        """
+        metrics = self.__start_metrics('read_multi', query)
+        show_data = None
+        datatype = datatype.lower()
+        with timed(metrics, 'acquire'):
+            connected = self.__get_connection()
+        if not connected:
+            logger.warning(NO_CONNECTION)
+            if metrics is not None:
+                metrics.error = NO_CONNECTION
+        elif datatype not in DATATYPES:
+            logger.warning(INVALID_DATATYPE)
+        else:
+
+            def sync_read_multi(cnx):
+                with cnx.cursor() as cursor:
+                    return read_multi(cursor, query, parameters, cursors, names, datatype,
+                                      fetch_profile or self.__fetch_profile, self.__lob_fetch, self.__memory_budget,
+                                      metrics)
 
+            try:
+                show_data = self.__run(sync_read_multi)
+                logger.info(DATA_OBTAINED, query)
+            except (oracle.DatabaseError, Exception) as exc:
+                logger.error(f"Error en query {query}: {str(exc)}", exc_info=True)
+                if metrics is not None:
+                    metrics.error = str(exc)
+        self.__report(metrics, parameters)
         return show_data
 
-    def execute_query(self, query: str, parameters: Dict = {}) -> bool:
+    def read_batches(self, query: str, parameters: dict = {}, batch_size: int = BATCH_SIZE,
+                     datatype: str = "dict") -> Iterator[List]:
+        """Obtener los datos de una consulta en bloques, sin cargar todo el resultado en memoria.
+
+        La conexión permanece abierta solo mientras se consume el iterador.
+
+        Args:
+            query (str): Consulta a ejecutar.
+            parameters (Dict, optional): Parámetros de la consulta.
+            batch_size (int, optional): Cantidad de filas por bloque.
+            datatype (str, optional): 'dict' para diccionarios, 'namedtuple' para registros, 'list' o 'tuple'
+                para tuplas.
+
+        Yields:
+            List: Bloque de filas.
+        """
+        datatype = datatype.lower()
+        if datatype not in ROW_DATATYPES:
+            logger.warning(INVALID_DATATYPE)
+            return
+        if not self.__get_connection():
+            logger.warning(NO_CONNECTION)
+            return
+        try:
+            with self.__use_connection() as cnx:
+                with cnx.cursor() as cursor:
+                    cursor.prefetchrows = batch_size
+                    cursor.arraysize = batch_size
+                    set_lob_fetch(cursor, self.__lob_fetch)
+                    cursor.execute(query, parameters)
+                    query = cursor.statement
+                    columns = get_columns(cursor.description)
+                    yield from fetch_batches(cursor, batch_size, row_factory(columns, datatype))
+                logger.info(DATA_OBTAINED, query)
+        except (oracle.DatabaseError, Exception) as exc:
+            logger.error(f"Error en query {query}: {str(exc)}", exc_info=True)
+            raise
+
+    def read_iter(self, query: str, parameters: dict = {}, batch_size: int = BATCH_SIZE,
+                  datatype: str = "dict") -> Iterator:
+        """Obtener los datos de una consulta fila por fila.
+
+        Args:
+            query (str): Consulta a ejecutar.
+            parameters (Dict, optional): Parámetros de la consulta.
+            batch_size (int, optional): Cantidad de filas por viaje a la base de datos.
+            datatype (str, optional): 'dict' para diccionarios, 'namedtuple' para registros, 'list' o 'tuple'
+                para tuplas.
+
+        Yields:
+            Fila con la forma solicitada.
+        """
+        for rows in self.read_batches(query, parameters, batch_size, datatype):
+            yield from rows
+
+    def export_query(self, query: str, parameters: dict = {}, path: str = "", file_format: str = 'csv',
+                     compression: Optional[str] = None, batch_size: int = BATCH_SIZE) -> ExportResult:
+        """Exportar el resultado de una consulta a un archivo por bloques, sin cargarlo todo en memoria.
+
+        Args:
+            query (str): Consulta a ejecutar.
+            parameters (Dict, optional): Parámetros de la consulta.
+            path (str): Ruta del archivo de salida.
+            file_format (str, optional): 'csv', 'jsonl' o 'parquet' (requiere pyarrow).
+            compression (str, optional): 'gzip', 'bz2' o 'xz' para CSV/JSONL, comprimido en un hilo aparte
+                mientras se obtienen los bloques; para Parquet un códec de pyarrow ('snappy', 'zstd', ...).
+            batch_size (int, optional): Filas por fetchmany y por grupo de filas en Parquet.
+
+        Returns:
+            ExportResult: Filas y bytes escritos, duración y velocidad; error si falló.
+        """
+        result = ExportResult(path, file_format)
+        result.error = validate_export(file_format, compression)
+        if result.error is not None:
+            logger.warning(result.error)
+            return result
+        if not self.__get_connection():
+            logger.warning(NO_CONNECTION)
+            result.error = NO_CONNECTION
+            return result
+
+        def sync_export_query(cnx):
+            with cnx.cursor() as cursor:
+                cursor.arraysize = batch_size
+                cursor.prefetchrows = batch_size
+                set_lob_fetch(cursor, self.__lob_fetch)
+                cursor.execute(query, parameters)
+                return export_cursor(cursor, path, file_format, compression, batch_size)
+
+        try:
+            result = self.__run(sync_export_query)
+            logger.info(DATA_EXPORTED, query)
+        except (oracle.DatabaseError, Exception) as exc:
+            logger.error(f"Error en query {query}: {str(exc)}", exc_info=True)
+            result.error = str(exc)
+        return result
+
+    def execute_query(self, query: str, parameters: Dict = {}, autocommit: bool = False) -> bool:
         """
         Ejecutar una consulta.
 
         Args:
             query (str): Consulta a ejecutar.
-            parameters (Dict, optional): Parámetros de la consulta.
+            parameters (Dict, optional): Parámetros de la consulta; las listas se enlazan como colecciones.
+            autocommit (bool, optional): Confirmar en el mismo viaje que la sentencia, sin un commit aparte.
 
         Returns:
             bool: True si se ejecuta correctamente, False en caso contrario.
         """
-        if self.__get_connection():
-            try:
-                with self.__connection as cnx:
+        result = False
+        metrics = self.__start_metrics('execute_query', query)
+        with timed(metrics, 'acquire'):
+            connected = self.__get_connection()
+        if connected:
+
+            def sync_execute_query(cnx):
+                try:
                     with cnx.cursor() as cursor:
-                        cursor.execute(query, parameters)
-                        query = cursor.statement
-                    cnx.commit()
-                    logger.info(EXECUTED_QUERY, query)
-                    return True
-            except (cx_Oracle.DatabaseError, Exception) as exc:
+                        values = bind_statement(cnx, query, parameters)
+                        with timed(metrics, 'execute'), commit_on_success(cnx, autocommit):
+                            cursor.execute(query, values)
+                            if metrics is not None:
+                                metrics.record_execute(cursor)
+                    if not autocommit:
+                        with timed(metrics, 'commit'):
+                            cnx.commit()
+                except oracle.DatabaseError as exc:
+                    if not is_disconnect_error(exc):
+                        cnx.rollback()
+                    raise
+
+            try:
+                self.__run(sync_execute_query, retry=False)
+                if self.__cache is not None:
+                    self.__cache.invalidate_query(query)
+                logger.info(EXECUTED_QUERY, query)
+                result = True
+            except (oracle.DatabaseError, Exception) as exc:
                 logger.error(f"Error en query {query}: {str(exc)}", exc_info=True)
-                cnx.rollback()
-                return False
+                if metrics is not None:
+                    metrics.error = str(exc)
         else:
             logger.warning(NO_CONNECTION)
-            return False
+            if metrics is not None:
+                metrics.error = NO_CONNECTION
+        self.__report(metrics, parameters)
+        return result
 
-    def execute_many(self, query: str, values: List) -> bool:
+    def execute_many(self, query: str, values: List, autocommit: bool = False) -> bool:
         """Ejecutar una consulta con varios valores.
 
         Args:
             query (str): Consulta a ejecutar.
             values (List): Valores de la consulta.
+            autocommit (bool, optional): Confirmar en el mismo viaje que la sentencia, sin un commit aparte.
 
         Returns:
             bool: True si se ejecuta correctamente, False en caso contrario.
         """
-        if self.__get_connection():
-            try:
-                with self.__get_connection() as cnx:
+        result = False
+        metrics = self.__start_metrics('execute_many', query)
+        with timed(metrics, 'acquire'):
+            connected = self.__get_connection()
+        if connected:
+
+            def sync_execute_many(cnx):
+                try:
                     with cnx.cursor() as cursor:
-                        cursor.prepare(query)
-                        cursor.executemany(None, values)
-                        query = cursor.statement
-                    cnx.commit()
-                    logger.info(EXECUTED_QUERY, query)
-                    return True
-            except (cx_Oracle.DatabaseError, Exception) as exc:
+                        with timed(metrics, 'execute'), commit_on_success(cnx, autocommit):
+                            cursor.prepare(query)
+                            cursor.executemany(None, values)
+                        if metrics is not None:
+                            metrics.record_execute(cursor)
+                    if not autocommit:
+                        with timed(metrics, 'commit'):
+                            cnx.commit()
+                except oracle.DatabaseError as exc:
+                    if not is_disconnect_error(exc):
+                        cnx.rollback()
+                    raise
+
+            try:
+                self.__run(sync_execute_many, retry=False)
+                if self.__cache is not None:
+                    self.__cache.invalidate_query(query)
+                logger.info(EXECUTED_QUERY, query)
+                result = True
+            except (oracle.DatabaseError, Exception) as exc:
                 logger.error(f"Error en query {query}: {str(exc)}", exc_info=True)
-                cnx.rollback()
+                if metrics is not None:
+                    metrics.error = str(exc)
+        else:
+            logger.warning(NO_CONNECTION)
+            if metrics is not None:
+                metrics.error = NO_CONNECTION
+        self.__report(metrics, values[0] if values else None)
+        return result
+
+    @contextmanager
+    def transaction(self) -> Iterator[Transaction]:
+        """Ejecutar varias sentencias en una misma conexión y cursor con un solo commit al final.
+
+        Si el bloque termina con un error se hace rollback y el error se propaga. Una conexión perdida
+        no se reintenta, porque las sentencias anteriores del bloque ya se habrían perdido.
+
+        Yields:
+            Transaction: Transacción con execute, execute_many, read, savepoint y rollback_to.
+        """
+        metrics = self.__start_metrics('transaction', '')
+        with timed(metrics, 'acquire'):
+            connected = self.__get_connection()
+        if not connected:
+            logger.warning(NO_CONNECTION)
+            if metrics is not None:
+                metrics.error = NO_CONNECTION
+            self.__report(metrics)
+            raise ConnectionError(NO_CONNECTION)
+        try:
+            with self.__use_connection() as cnx:
+                with Transaction(cnx, self.__read, self.__cache, metrics) as tx:
+                    yield tx
+        finally:
+            self.__report(metrics)
+
+    def bulk_load(self, query: str, rows: Iterable, batch_size: int = BATCH_SIZE,
+                  commit_every: int = 0) -> BulkLoadResult:
+        """Cargar filas por bloques de tamaño fijo, sin detenerse por filas con error.
+
+        Args:
+            query (str): Sentencia INSERT/UPDATE/MERGE con parámetros.
+            rows (Iterable): Filas a cargar (tuplas o diccionarios); puede ser un generador.
+            batch_size (int, optional): Filas por executemany.
+            commit_every (int, optional): Hacer commit cada vez que se carguen al menos esta cantidad de filas;
+                0 para hacer un solo commit al final.
+
+        Returns:
+            BulkLoadResult: Filas cargadas, filas rechazadas con su error ORA, tiempos por bloque y
+                arraydmlrowcounts.
+        """
+        if not self.__get_connection():
+            logger.warning(NO_CONNECTION)
+            result = BulkLoadResult()
+            result.error = NO_CONNECTION
+            return result
+        # Las filas pueden venir de un generador, así que no se reintenta tras una reconexión.
+        with self.__use_connection() as cnx:
+            result = bulk_load(cnx, query, rows, batch_size, commit_every)
+        if result.error is not None and is_disconnect_error(result.error):
+            # bulk_load reporta el error en el resultado; la conexión perdida no se vuelve a usar.
+            self.__close_connection()
+        if result.rows_loaded and self.__cache is not None:
+            self.__cache.invalidate_query(query)
+        if result.error is None:
+            logger.info(EXECUTED_QUERY, query)
+        return result
+
+    def upsert(self, table: str, rows: Iterable, key_columns: Sequence[str], batch_size: int = BATCH_SIZE,
+               columns: Optional[Sequence[str]] = None, commit_every: int = 0) -> UpsertResult:
+        """Insertar o actualizar filas por bloques: cada bloque se carga en una tabla temporal global de
+        staging (se crea la primera vez) y se aplica con un solo MERGE.
+
+        Args:
+            table (str): Tabla destino; va en el texto SQL, no debe venir de datos del usuario.
+            rows (Iterable): Filas (diccionarios o tuplas); puede ser un generador.
+            key_columns (Sequence[str]): Columnas que identifican una fila en la tabla destino.
+            batch_size (int, optional): Filas por bloque.
+            columns (Sequence[str], optional): Columnas de las filas; por defecto las keys de la primera fila.
+            commit_every (int, optional): Hacer commit cada vez que se apliquen al menos esta cantidad de filas;
+                0 para hacer un solo commit al final.
+
+        Returns:
+            UpsertResult: Filas insertadas y actualizadas y tiempos por bloque.
+        """
+        try:
+            plan, rows = plan_upsert(table, rows, key_columns, columns)
+        except ValueError as exc:
+            logger.error(str(exc))
+            result = UpsertResult()
+            result.error = str(exc)
+            return result
+        if plan is None:
+            return UpsertResult()
+        if not self.__get_connection():
+            logger.warning(NO_CONNECTION)
+            result = UpsertResult()
+            result.error = NO_CONNECTION
+            return result
+        with self.__use_connection() as cnx:
+            result = upsert_batches(cnx, plan, BatchSource(plan, rows, batch_size), commit_every)
+        if result.error is not None and is_disconnect_error(result.error):
+            # upsert_batches reporta el error en el resultado; la conexión perdida no se vuelve a usar.
+            self.__close_connection()
+        if result.rows and self.__cache is not None:
+            self.__cache.invalidate_query(plan.merge_sql)
+        if result.error is None:
+            logger.info(f"{UPSERTED_ROWS} {table} {result}")
+        return result
+
+    def register_statement(self, name: str, query: str) -> None:
+        """Registrar una sentencia frecuente para ejecutarla por nombre con un cursor ya preparado.
+
+        El cursor preparado se reutiliza mientras la conexión sea la misma, por lo que conviene usarlo
+        con persistent=True.
+
+        Args:
+            name (str): Nombre de la sentencia.
+            query (str): Texto SQL de la sentencia.
+        """
+        self.__statements.register(name, query)
+
+    def read_statement(self, name: str, parameters: dict = {}, datatype: str = "dict",
+                       fetch_profile: Optional[str] = None) -> [Dict, List]:
+        """Obtener los datos de una consulta registrada con register_statement.
+
+        Args:
+            name (str): Nombre de la sentencia.
+            parameters (Dict, optional): Parámetros de la consulta.
+            datatype (str, optional): Tipo de datos a retornar: 'dict', 'list', 'tuple', 'namedtuple',
+                'columnar', 'numpy' o 'pandas'.
+            fetch_profile (str, optional): 'lookup', 'bulk' o 'auto'; por defecto el de la instancia.
+
+        Returns:
+            show_data[Dict,List]: Datos obtenidos.
+        """
+        show_data = None
+        datatype = datatype.lower()
+        if datatype not in DATATYPES:
+            logger.warning(INVALID_DATATYPE)
+        elif self.__get_connection():
+
+            def sync_read_statement(cnx):
+                cursor = self.__statements.cursor(cnx, name)
+                try:
+                    return self.__read(cursor, self.__statements.query(name), parameters, datatype,
+                                       fetch_profile, prepared=True)
+                except Exception:
+                    self.__statements.discard(name)
+                    raise
+
+            try:
+                show_data = self.__run(sync_read_statement)
+                logger.info(DATA_OBTAINED, name)
+            except (oracle.DatabaseError, Exception) as exc:
+                logger.error(f"Error en statement {name}: {str(exc)}", exc_info=True)
+        else:
+            logger.warning(NO_CONNECTION)
+
+        return show_data
+
+    def execute_statement(self, name: str, parameters: Dict = {}) -> bool:
+        """Ejecutar una sentencia registrada con register_statement.
+
+        Args:
+            name (str): Nombre de la sentencia.
+            parameters (Dict, optional): Parámetros de la sentencia.
+
+        Returns:
+            bool: True si se ejecuta correctamente, False en caso contrario.
+        """
+        if self.__get_connection():
+
+            def sync_execute_statement(cnx):
+                try:
+                    cursor = self.__statements.cursor(cnx, name)
+                    cursor.execute(None, parameters)
+                    cnx.commit()
+                except oracle.DatabaseError as exc:
+                    self.__statements.discard(name)
+                    if not is_disconnect_error(exc):
+                        cnx.rollback()
+                    raise
+
+            try:
+                self.__run(sync_execute_statement, retry=False)
+                if self.__cache is not None:
+                    self.__cache.invalidate_query(self.__statements.query(name))
+                logger.info(EXECUTED_QUERY, name)
+                return True
+            except (oracle.DatabaseError, Exception) as exc:
+                logger.error(f"Error en statement {name}: {str(exc)}", exc_info=True)
                 return False
         else:
             logger.warning(NO_CONNECTION)
             return False
+
+    def statement_stats(self) -> Dict[str, int]:
+        """Obtener los aciertos, fallos y desalojos del caché de sentencias registradas.
+
+        Returns:
+            Dict[str, int]: hits, misses, evictions, size y capacity.
+        """
+        return self.__statements.stats()
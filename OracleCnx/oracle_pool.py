@@ -4,32 +4,78 @@ Created on Wed Nov 15 12:00:00 2023
 
 @author: Jhonatan Martínez
 """
+import inspect
+import queue
 import threading
+import time
+import weakref
 
-import cx_Oracle
-from typing import List, Dict
-from cx_Oracle import SessionPool
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Callable, List, Dict, Iterable, Iterator, Optional, Sequence, Tuple, Union
 from loguru import logger
 from OracleCnx.constants import *
+from OracleCnx.driver import create_pool, describe_setup, oracle, required_attributes, use_backend, warm_pool
+from OracleCnx.binds import bind_collections, bind_statement, has_collections, merge_results
+from OracleCnx.bulk import BulkLoadResult, bulk_load
+from OracleCnx.cache import ResultCache
+from OracleCnx.columnar import read_columnar
+from OracleCnx.metrics import QueryMetrics, emit, timed
+from OracleCnx.multi import read_multi
+from OracleCnx.export import ExportResult, export_cursor, validate_export
+from OracleCnx.parallel import partition_query
+from OracleCnx.routing import Endpoint, build_router, cluster_key, has_endpoints
+from OracleCnx.session import SessionCallback, carry_tag, current_tag, wrap_session_callback
+from OracleCnx.slowlog import SlowQueryLog
+from OracleCnx.statements import StatementCache
+from OracleCnx.transaction import Transaction, commit_on_success
+from OracleCnx.tuning import learn_row_width, tune_cursor
+from OracleCnx.upsert import BatchSource, UpsertResult, plan_upsert, upsert_batches
+from OracleCnx.utils import fetch_all, fetch_batches, get_columns, is_disconnect_error, row_factory, set_lob_fetch
 
 
 class PoolDB:
-    """ Permite realizar un pool de conexiones a una Base de Datos"""
-    _instance = None
+    """ Permite realizar un pool de conexiones a una Base de Datos.
+
+    Las instancias se comparten por identidad de conexión (user@host:port/sdi, sin la contraseña): crear
+    un PoolDB con la misma identidad retorna la instancia ya creada. El pool de sesiones se abre al
+    primer uso y se cierra si queda sin uso más de idle_eviction segundos; se vuelve a abrir en la
+    siguiente consulta. Los pools sin uso se revisan al crear una instancia y al tomar una sesión de
+    cualquier pool (como máximo cada POOL_EVICTION_INTERVAL segundos); un proceso que deja de consultar
+    debe llamar a evict_idle_pools() para cerrarlos.
+
+    Si el setup trae la key 'endpoints' (un primario y réplicas de lectura), PoolDB(setup) retorna un
+    PoolRouter con la misma interfaz (ver OracleCnx.routing).
+    """
+    _instances: Dict[str, "PoolDB"] = {}
+    # Instancias fuera del registro (pools de los endpoints de un PoolRouter), revisadas por evict_idle_pools.
+    _private: "weakref.WeakSet[PoolDB]" = weakref.WeakSet()
     _lock = threading.Lock()
+    _next_eviction = 0.0
 
     def __new__(cls, *args, **kwargs):
+        setup = kwargs.get('setup', args[0] if args else {})
+        if has_endpoints(setup):
+            # Varios endpoints: un pool por endpoint detrás de un PoolRouter.
+            return PoolRouter(*args, **kwargs)
+        setup_key = cls._get_setup_key(setup)
         with cls._lock:
-            # Combine setup parameters into a unique key
-            setup_key = cls._get_setup_key(kwargs.get('setup', {}))
-
             if setup_key not in cls._instances:
                 cls._instances[setup_key] = super(PoolDB, cls).__new__(cls)
                 cls._instances[setup_key]._initialized = False
-                return cls._instances[setup_key]
-            return cls._instance
+            instance = cls._instances[setup_key]
+        cls._evict_idle_pools_due()
+        return instance
 
-    def __init__(self, setup: Dict[str, str], pool_size: int = 10) -> None:
+    def __init__(self, setup: Dict[str, str], pool_size: int = POOL_SIZE, lob_fetch: str = 'inline',
+                 fetch_profile: str = 'auto', memory_budget: int = FETCH_MEMORY_BUDGET,
+                 stmtcachesize: int = STMT_CACHE_SIZE,
+                 cache: Optional[ResultCache] = None, metrics_hook: Optional[Callable] = None,
+                 pool_min: int = POOL_MIN, pool_increment: int = POOL_INCREMENT,
+                 wait_timeout: Optional[float] = POOL_WAIT_TIMEOUT, idle_timeout: int = POOL_IDLE_TIMEOUT,
+                 max_lifetime_session: int = POOL_MAX_LIFETIME,
+                 idle_eviction: float = POOL_IDLE_EVICTION, slow_log: Optional[SlowQueryLog] = None,
+                 session_callback: Optional[Union[Callable, str]] = None, tag: Optional[str] = None) -> None:
         """Constructor.
 
         Args:
@@ -41,138 +87,1144 @@ class PoolDB:
                 - user: Database user.
                 - password: Database password.
                 - driver: Database driver.
-        pool_size (int): tamaño del pool por defecto 10
+        pool_size (int): Cantidad máxima de sesiones del pool, por defecto 10.
+        lob_fetch (str): 'inline' obtiene los CLOB/NCLOB/BLOB como str/bytes en el mismo fetch;
+            'stream' obtiene localizadores y los lee por partes (para valores muy grandes).
+        fetch_profile (str): Ajuste por defecto de arraysize/prefetchrows: 'lookup', 'bulk' o 'auto'.
+        memory_budget (int): Bytes máximos por bloque de filas en los perfiles 'bulk' y 'auto'.
+        stmtcachesize (int): Tamaño del caché de sentencias del cliente Oracle para cada sesión del pool.
+        cache (ResultCache): Caché de resultados para read_data; None para no usar caché.
+        metrics_hook (Callable): Función que recibe un QueryMetrics después de cada read_data, execute_query
+            y execute_many, por ejemplo un MetricsAggregator; None para no medir.
+        pool_min (int): Sesiones que se abren al crear el pool; crece hasta pool_size según la demanda.
+        pool_increment (int): Sesiones que se abren cada vez que el pool necesita crecer.
+        wait_timeout (float): Segundos que una consulta espera una sesión libre cuando el pool está lleno;
+            None espera sin límite y 0 falla de inmediato.
+        idle_timeout (int): Segundos tras los cuales el pool cierra las sesiones libres que sobran sobre
+            pool_min; 0 las conserva.
+        max_lifetime_session (int): Segundos máximos de vida de una sesión; 0 sin límite.
+        idle_eviction (float): Segundos sin uso tras los cuales se cierra el pool completo; 0 nunca.
+        slow_log (SlowQueryLog): Registro de las consultas lentas; None para no registrarlas.
+        session_callback (Callable, str): Función (sesión, etiqueta pedida) que configura una sesión cuando es
+            nueva o su etiqueta no coincide, o el nombre de un procedimiento PL/SQL; None para no configurar.
+        tag (str): Etiqueta por defecto de las sesiones, por ejemplo 'nls=iso;schema=APP'; un bloque
+            session_tag la reemplaza.
 
         Returns:
             None.
         """
-        if self._initialized:
-            # Check if setup parameters have changed
-            new_setup_key = self._get_setup_key(setup)
-            if self._setup_key != new_setup_key:
-                # Setup parameters have changed, create a new instance
-                self.__class__._instances.pop(self._setup_key, None)
-                return self.__class__(setup, pool_size)
-            return
-        self._initialized = True
-        self.__attributes = ['host', 'port', 'sdi', 'user', 'password', 'driver']
-        self.__setup: Dict = setup
-        self.__pool_size = pool_size
-        self.__pool: SessionPool = None
+        with self._lock:
+            if self._initialized:
+                return
+            self._setup_key = self._get_setup_key(setup)
+            self.__setup: Dict = setup
+            self.__pool_max = max(pool_size, pool_min, 1)
+            self.__pool_min = max(pool_min, 0)
+            self.__pool_increment = max(pool_increment, 1)
+            self.__wait_timeout = wait_timeout
+            self.__idle_timeout = idle_timeout
+            self.__max_lifetime_session = max_lifetime_session
+            self.__idle_eviction = idle_eviction
+            self.__lob_fetch = lob_fetch
+            self.__fetch_profile = fetch_profile
+            self.__memory_budget = memory_budget
+            self.__stmtcachesize = stmtcachesize
+            self.__cache = cache
+            self.__metrics_hook = metrics_hook
+            self.__slow_log = slow_log
+            self.__session_callback = wrap_session_callback(session_callback)
+            self.__tag = tag
+            self.__waiters = 0
+            self.__waiters_lock = threading.Lock()
+            self.__statements = StatementCache()
+            self.__pinned = None
+            self.__pinned_lock = threading.Lock()
+            self.__pool = None
+            self.__pool_lock = threading.Lock()
+            self.__last_used = time.monotonic()
+            self._initialized = True
         self.__main()
 
     @staticmethod
     def _get_setup_key(setup: Dict[str, str]) -> str:
-        return "|".join(f"{key}:{value}" for key, value in setup.items())
+        """Identidad de la conexión (user@host:port/sdi), sin la contraseña."""
+        return f"{setup.get('user', '')}@{setup.get('host', '')}:{setup.get('port', '')}/{setup.get('sdi', '')}"
+
+    @classmethod
+    def _create_private(cls, **options) -> "PoolDB":
+        """Crear un PoolDB que no se comparte por identidad de conexión, con su propio metrics_hook.
+
+        Args:
+            **options: Parámetros de PoolDB.
 
-    @staticmethod
-    def __find_lob_columns(column_descriptions) -> List:
-        """Iterar sobre las descripciones de las columnas y mostrar información sobre los tipos de datos.
         Returns:
-            List: Lista con los índices de las columnas Lobs.
+            PoolDB: Instancia nueva, fuera del registro de instancias.
         """
-        lob_columns = []
-        for index, column in enumerate(column_descriptions):
-            # column_name, type_code, display_size, internal_size, precision, scale, null_ok = column
-            type_code: int = column[1]
-            if type_code == cx_Oracle.CLOB:
-                lob_columns.append(index)
-        return lob_columns
+        instance = super(PoolDB, cls).__new__(cls)
+        instance._initialized = False
+        instance.__init__(**options)
+        with cls._lock:
+            cls._private.add(instance)
+        return instance
+
+    @classmethod
+    def evict_idle_pools(cls, max_idle: Optional[float] = None) -> int:
+        """Cerrar los pools de sesiones que llevan tiempo sin uso y no tienen sesiones ocupadas.
+
+        Las instancias siguen registradas y vuelven a abrir su pool en la siguiente consulta.
+
+        Args:
+            max_idle (float, optional): Segundos sin uso; por defecto el idle_eviction de cada instancia.
+
+        Returns:
+            int: Cantidad de pools cerrados.
+        """
+        with cls._lock:
+            instances = [instance for instance in list(cls._instances.values()) + list(cls._private)
+                         if instance._initialized]
+        return sum(1 for instance in instances if instance.__evict(max_idle))
+
+    @classmethod
+    def _evict_idle_pools_due(cls) -> None:
+        """Llamar a evict_idle_pools si pasaron POOL_EVICTION_INTERVAL segundos desde la última revisión."""
+        now = time.monotonic()
+        with cls._lock:
+            if now < PoolDB._next_eviction:
+                return
+            PoolDB._next_eviction = now + POOL_EVICTION_INTERVAL
+        cls.evict_idle_pools()
 
     def __main(self) -> None:
         """Válida que el diccionario contenga los atributos necesarios para que la clase funcione e inicia la conexión."""
-        logger.debug(self.__setup)
-        missing = [key for key in self.__attributes if str(key).lower() not in self.__setup.keys()]
+        logger.debug(describe_setup(self.__setup))
+        backend = use_backend(self.__setup)
+        missing = [key for key in required_attributes(backend) if str(key).lower() not in self.__setup.keys()]
         if len(missing) > 0:
             logger.error(MISSING_ATTRIBUTES)
             logger.error(missing)
+        if self.__lob_fetch not in LOB_FETCH_MODES:
+            logger.warning(f"{INVALID_LOB_FETCH} {self.__lob_fetch}")
+        if self.__fetch_profile not in FETCH_PROFILES:
+            logger.warning(f"{INVALID_FETCH_PROFILE} {self.__fetch_profile}")
         try:
-            cx_Oracle.init_oracle_client(lib_dir=self.__setup["driver"])
-        except (cx_Oracle.DatabaseError, cx_Oracle.IntegrityError, Exception) as exc:
+            self.__get_pool()
+        except (oracle.DatabaseError, oracle.IntegrityError, Exception) as exc:
             logger.warning(str(exc))
+
+    def __get_pool(self):
+        """Obtener el pool de sesiones, abriéndolo si aún no existe o si fue cerrado por inactividad.
+
+        Returns:
+            Pool de sesiones del backend activo.
+        """
+        # Este pool no se cierra aquí: quien lo pide está en __waiters o tiene __pinned_lock.
+        self._evict_idle_pools_due()
+        with self.__pool_lock:
+            self.__last_used = time.monotonic()
+            if self.__pool is None:
+                if self.__wait_timeout is None:
+                    getmode, wait_timeout = oracle.SPOOL_ATTRVAL_WAIT, 0
+                elif self.__wait_timeout <= 0:
+                    getmode, wait_timeout = oracle.SPOOL_ATTRVAL_NOWAIT, 0
+                else:
+                    getmode, wait_timeout = oracle.SPOOL_ATTRVAL_TIMEDWAIT, int(self.__wait_timeout * 1000)
+                self.__pool = create_pool(
+                    self.__setup,
+                    min=min(self.__pool_min, self.__pool_max),
+                    max=self.__pool_max,
+                    increment=self.__pool_increment,
+                    threaded=True,
+                    getmode=getmode,
+                    wait_timeout=wait_timeout,
+                    timeout=self.__idle_timeout,
+                    max_lifetime_session=self.__max_lifetime_session,
+                    stmtcachesize=self.__stmtcachesize,
+                    **({'session_callback': self.__session_callback} if self.__session_callback is not None else {})
+                )
+                logger.debug(f"{POOL_OPENED} {self._setup_key}")
+            return self.__pool
+
+    def __close_pool(self) -> None:
+        """Liberar la sesión fija, olvidar las sentencias preparadas y cerrar el pool de sesiones.
+
+        Debe llamarse con __pinned_lock y __pool_lock tomados.
+        """
+        self.__statements.clear()
         try:
-            dsn = self.__setup["host"] + ":" + self.__setup["port"] + '/' + self.__setup["sdi"]
-            self.__pool = cx_Oracle.SessionPool(
-                user=self.__setup["user"],
-                password=self.__setup["password"],
-                dsn=dsn,
-                min=self.__pool_size,
-                max=self.__pool_size,
-                increment=0,
-                threaded=True
-            )
-        except (cx_Oracle.DatabaseError, cx_Oracle.IntegrityError, Exception) as exc:
-            logger.warning(str(exc))
+            if self.__pinned is not None:
+                self.__pool.release(self.__pinned)
+            if self.__pool is not None:
+                self.__pool.close()
+                logger.debug(CLOSE_CONNECTION)
+        except (oracle.DatabaseError, Exception) as exc:
+            logger.error(str(exc), exc_info=True)
+        finally:
+            self.__pinned = None
+            self.__pool = None
+
+    def __evict(self, max_idle: Optional[float]) -> bool:
+        """Cerrar el pool de sesiones si lleva más de max_idle segundos sin uso y no tiene sesiones ocupadas.
+
+        Returns:
+            bool: True si el pool fue cerrado.
+        """
+        max_idle = self.__idle_eviction if max_idle is None else max_idle
+        if not max_idle or self.__pool is None or time.monotonic() - self.__last_used < max_idle:
+            return False
+        # Si otra llamada usa la sesión fija no se espera: el pool está en uso.
+        if not self.__pinned_lock.acquire(blocking=False):
+            return False
+        try:
+            with self.__pool_lock:
+                # Los hilos en __acquire se cuentan en __waiters antes de pedir el pool y en busy
+                # después de obtener la sesión, así que aquí no puede haber una sesión en camino.
+                if self.__pool is None or time.monotonic() - self.__last_used < max_idle or self.__waiters:
+                    return False
+                if self.__pool.busy > (1 if self.__pinned is not None else 0):
+                    return False
+                self.__close_pool()
+            logger.info(f"{POOL_EVICTED} {self._setup_key}")
+            return True
+        finally:
+            self.__pinned_lock.release()
+
+    @contextmanager
+    def __acquire(self, metrics: Optional[QueryMetrics] = None) -> Iterator:
+        """Tomar una sesión del pool contando los hilos que esperan y midiendo la espera.
+
+        Args:
+            metrics (QueryMetrics, optional): Métricas donde se registra la fase 'acquire'.
+
+        Yields:
+            cx_Oracle.Connection: Sesión del pool, que se libera al terminar.
+        """
+        with self.__waiters_lock:
+            self.__waiters += 1
+        try:
+            with timed(metrics, 'acquire'):
+                cnx = self.__get_pool().acquire(**self.__tag_options(current_tag(self.__tag)))
+        finally:
+            with self.__waiters_lock:
+                self.__waiters -= 1
+        with cnx:
+            yield cnx
+
+    @staticmethod
+    def __tag_options(tag: Optional[str]) -> Dict:
+        """Parámetros de acquire para pedir una sesión con una etiqueta; vacío si no hay etiqueta."""
+        return {'tag': tag} if tag else {}
+
+    def __start_metrics(self, operation: str, query: str) -> Optional[QueryMetrics]:
+        """Crear las métricas de una llamada si hay un metrics_hook o un slow_log configurado."""
+        if self.__metrics_hook is None and self.__slow_log is None:
+            return None
+        return QueryMetrics(operation, query)
+
+    def __report(self, metrics: Optional[QueryMetrics], parameters=None) -> None:
+        """Cerrar las métricas de una llamada, registrarla en el slow_log si fue lenta y entregarlas al
+        metrics_hook."""
+        if metrics is None:
+            return
+        metrics.finish()
+        if self.__slow_log is not None:
+            self.__slow_log.observe(metrics, parameters, self.__plan_session)
+        emit(self.__metrics_hook, metrics)
+
+    def __plan_session(self):
+        """Sesión donde el slow_log consulta el plan de una consulta lenta; se cierra o libera al terminar."""
+        return self.__get_pool().acquire()
+
+    def __read(self, cursor, query: str, parameters: Dict, datatype: str, fetch_profile: Optional[str],
+               prepared: bool = False, metrics: Optional[QueryMetrics] = None,
+               rowfactory: Optional[Callable] = None) -> [Dict, List]:
+        """Ejecutar una consulta en un cursor y obtener los datos con la forma solicitada.
+
+        Args:
+            cursor: Cursor donde se ejecuta la consulta.
+            query (str): Consulta a ejecutar.
+            parameters (Dict): Parámetros de la consulta; las listas se enlazan como colecciones.
+            datatype (str): Tipo de datos a retornar.
+            fetch_profile (str, optional): Perfil de fetch; por defecto el de la instancia.
+            prepared (bool, optional): True si el cursor ya tiene la consulta preparada.
+            metrics (QueryMetrics, optional): Métricas donde se registran las fases de la lectura.
+            rowfactory (Callable, optional): Función propia que construye cada fila a partir de sus valores.
+
+        Returns:
+            Datos obtenidos.
+        """
+        if rowfactory is not None and datatype not in ROW_DATATYPES:
+            raise ValueError(f"{INVALID_ROWFACTORY} {datatype}")
+        if has_collections(query, parameters):
+            chunks = bind_collections(cursor.connection, query, parameters)
+            return merge_results([self.__read(cursor, query, chunk, datatype, fetch_profile, prepared, metrics,
+                                              rowfactory) for chunk in chunks], datatype)
+        tune_cursor(cursor, query, fetch_profile or self.__fetch_profile, self.__memory_budget)
+        set_lob_fetch(cursor, self.__lob_fetch)
+        with timed(metrics, 'execute'):
+            cursor.execute(None if prepared else query, parameters)
+        learn_row_width(query, cursor.description)
+        if datatype in COLUMNAR_DATATYPES:
+            return read_columnar(cursor, datatype, cursor.arraysize, metrics)
+        # Gets column_names
+        columns = get_columns(cursor.description)
+        # El driver arma cada fila durante el fetch, sin una segunda pasada sobre los datos.
+        data = fetch_all(cursor, metrics, row_factory(columns, datatype, rowfactory))
+        if datatype == 'list':
+            return [columns, data]
+        return data
+
+    def __run_pinned(self, operation):
+        """Ejecutar una operación en la sesión fija donde viven los cursores preparados.
+
+        La sesión se toma del pool la primera vez y se conserva hasta close(). Las llamadas
+        concurrentes se serializan porque una sesión no admite operaciones simultáneas.
+
+        Args:
+            operation (Callable): Función que recibe la conexión.
+
+        Returns:
+            Resultado de la operación.
+        """
+        with self.__pinned_lock:
+            pool = self.__get_pool()
+            if self.__pinned is None:
+                # La sesión fija se comparte entre hilos, así que usa la etiqueta de la instancia.
+                self.__pinned = pool.acquire(**self.__tag_options(self.__tag))
+            try:
+                return operation(self.__pinned)
+            except oracle.DatabaseError as exc:
+                if is_disconnect_error(exc):
+                    self.__statements.clear()
+                    pool.drop(self.__pinned)
+                    self.__pinned = None
+                raise
+
+    def read_data(self, query: str, parameters: dict = {}, datatype: str = "dict",
+                  fetch_profile: Optional[str] = None, cache_ttl: Optional[float] = None,
+                  cache_tags: List[str] = (), rowfactory: Optional[Callable] = None) -> [Dict, List]:
+        """Obtener los datos de una consulta.
+
+        Args:
+            query (str): Consulta a ejecutar.
+            parameters (Dict, optional): Parámetros de la consulta.
+            datatype (str, optional): Tipo de datos a retornar: 'dict', 'list', 'tuple', 'namedtuple',
+                'columnar', 'numpy' o 'pandas'.
+            fetch_profile (str, optional): 'lookup', 'bulk' o 'auto'; por defecto el de la instancia.
+            cache_ttl (float, optional): Segundos de vida del resultado en el caché; 0 para no usar el caché.
+            cache_tags (List[str], optional): Etiquetas para invalidar el resultado con cache.invalidate.
+            rowfactory (Callable, optional): Función que recibe los valores de cada fila como argumentos y
+                construye la fila; el driver la aplica durante el fetch. Solo para 'dict', 'list', 'tuple' y
+                'namedtuple'.
+
+        Returns:
+            show_data[Dict,List]: Datos obtenidos.
+        """
+        metrics = self.__start_metrics('read_data', query)
+        if self.__cache is None or cache_ttl == 0 or datatype.lower() not in DATATYPES:
+            show_data = self.__read_data(query, parameters, datatype, fetch_profile, metrics, rowfactory)
+        else:
+
+            def load():
+                if metrics is not None:
+                    metrics.cached = False
+                return self.__read_data(query, parameters, datatype, fetch_profile, metrics, rowfactory)
+
+            if metrics is not None:
+                metrics.cached = True
+            key = ResultCache.make_key(query, parameters, datatype.lower(), rowfactory)
+            show_data = self.__cache.get_or_load(key, load, cache_ttl, cache_tags)
+        self.__report(metrics, parameters)
+        return show_data
+
+    def __read_data(self, query: str, parameters: Dict, datatype: str, fetch_profile: Optional[str],
+                    metrics: Optional[QueryMetrics] = None, rowfactory: Optional[Callable] = None) -> [Dict, List]:
+        """Obtener los datos de una consulta sin pasar por el caché.
+
+        Args:
+            query (str): Consulta a ejecutar.
+            parameters (Dict, optional): Parámetros de la consulta.
+            datatype (str, optional): Tipo de datos a retornar: 'dict', 'list', 'tuple', 'namedtuple',
+                'columnar', 'numpy' o 'pandas'.
+            fetch_profile (str, optional): 'lookup', 'bulk' o 'auto'; por defecto el de la instancia.
+            metrics (QueryMetrics, optional): Métricas de la llamada.
+            rowfactory (Callable, optional): Función propia que construye cada fila.
 
-    def read_data(self, query: str, parameters: dict = {}, datatype: str = "dict") -> [Dict, List]:
+        Returns:
+            show_data[Dict,List]: Datos obtenidos.
+        """
         show_data = None
         datatype = datatype.lower()
-        if datatype in ['dict', 'list']:
+        if datatype in DATATYPES:
             try:
-                with self.__pool.acquire() as cnx:
+                with self.__acquire(metrics) as cnx:
                     with cnx.cursor() as cursor:
-                        cursor.prefetchrows = 100000
-                        cursor.arraysize = 100000
-                        cursor.execute(query, parameters)
-                        query = cursor.statement
-                        lob_columns = self.__find_lob_columns(cursor.description)
-                        data = []
-                        if len(lob_columns) > 0:
-                            for row in cursor:
-                                new_row = list(row)
-                                for i, column in enumerate(row):
-                                    if i in lob_columns:
-                                        new_row[i] = column.read()
-                                data.append(tuple(new_row))
-                        else:
-                            data = cursor.fetchall()
-                        columns = [column[0].upper() for column in cursor.description]
-                        if datatype == 'dict':
-                            dictionary = []
-                            for item in data:
-                                dictionary.append(dict(zip(columns, item)))
-                            show_data = dictionary
-                        elif datatype == 'list':
-                            show_data = [columns, data]
+                        show_data = self.__read(cursor, query, parameters, datatype, fetch_profile, metrics=metrics,
+                                                rowfactory=rowfactory)
                     logger.info(f"{DATA_OBTAINED} {query}")
-            except (cx_Oracle.DatabaseError, Exception) as exc:
+            except (oracle.DatabaseError, Exception) as exc:
                 logger.error(f"Error in query {query}: {str(exc)}", exc_info=True)
+                if metrics is not None:
+                    metrics.error = str(exc)
         else:
             logger.warning(INVALID_DATATYPE)
 
         return show_data
 
-    def execute_query(self, query: str, parameters: Dict = {}) -> bool:
-        result = False
+    def read_multi(self, query: str, parameters: dict = {}, cursors: Sequence[str] = (),
+                   names: Optional[Sequence[str]] = None, datatype: str = "dict",
+                   fetch_profile: Optional[str] = None) -> Optional[Dict]:
+        """Obtener varios resultados con un solo execute: REF CURSORs de salida y resultados implícitos de un
+        bloque PL/SQL, cada uno con la misma forma y manejo de Lobs que read_data.
+
+        Args:
+            query (str): Bloque anónimo o llamada a un procedimiento, por ejemplo
+                'begin dashboard.load(:client_id, :sales, :alerts); end;'.
+            parameters (Dict, optional): Parámetros de entrada del bloque.
+            cursors (Sequence[str], optional): Parámetros de salida de tipo REF CURSOR; se enlazan
+                automáticamente y su resultado lleva el nombre del parámetro.
+            names (Sequence[str], optional): Nombres de los resultados implícitos (DBMS_SQL.RETURN_RESULT), en
+                orden; los que falten se llaman result_1, result_2, ...
+            datatype (str, optional): Tipo de datos de cada resultado: 'dict', 'list', 'tuple', 'namedtuple',
+                'columnar', 'numpy' o 'pandas'.
+            fetch_profile (str, optional): 'lookup', 'bulk' o 'auto'; por defecto el de la instancia.
+
+        Returns:
+            Dict: Datos de cada resultado por nombre, primero los REF CURSORs y luego los implícitos; None si
+                hay un error.
+        """
+        metrics = self.__start_metrics('read_multi', query)
+        show_data = None
+        datatype = datatype.lower()
+        if datatype in DATATYPES:
+            try:
+                with self.__acquire(metrics) as cnx:
+                    with cnx.cursor() as cursor:
+                        show_data = read_multi(cursor, query, parameters, cursors, names, datatype,
+                                               fetch_profile or self.__fetch_profile, self.__lob_fetch,
+                                               self.__memory_budget, metrics)
+                logger.info(f"{DATA_OBTAINED} {query}")
+            except (oracle.DatabaseError, Exception) as exc:
+                logger.error(f"Error in query {query}: {str(exc)}", exc_info=True)
+                if metrics is not None:
+                    metrics.error = str(exc)
+        else:
+            logger.warning(INVALID_DATATYPE)
+        self.__report(metrics, parameters)
+        return show_data
+
+    def read_batches(self, query: str, parameters: dict = {}, batch_size: int = BATCH_SIZE,
+                     datatype: str = "dict") -> Iterator[List]:
+        """Obtener los datos de una consulta en bloques, sin cargar todo el resultado en memoria.
+
+        La sesión del pool permanece ocupada solo mientras se consume el iterador.
 
+        Args:
+            query (str): Consulta a ejecutar.
+            parameters (Dict, optional): Parámetros de la consulta.
+            batch_size (int, optional): Cantidad de filas por bloque.
+            datatype (str, optional): 'dict' para diccionarios, 'namedtuple' para registros, 'list' o 'tuple'
+                para tuplas.
+
+        Yields:
+            List: Bloque de filas.
+        """
+        datatype = datatype.lower()
+        if datatype not in ROW_DATATYPES:
+            logger.warning(INVALID_DATATYPE)
+            return
         try:
-            with self.__pool.acquire() as cnx:
+            with self.__acquire() as cnx:
                 with cnx.cursor() as cursor:
+                    cursor.prefetchrows = batch_size
+                    cursor.arraysize = batch_size
+                    set_lob_fetch(cursor, self.__lob_fetch)
                     cursor.execute(query, parameters)
                     query = cursor.statement
-                cnx.commit()
+                    columns = get_columns(cursor.description)
+                    yield from fetch_batches(cursor, batch_size, row_factory(columns, datatype))
+                logger.info(f"{DATA_OBTAINED} {query}")
+        except (oracle.DatabaseError, Exception) as exc:
+            logger.error(f"Error in query {query}: {str(exc)}", exc_info=True)
+            raise
+
+    def read_iter(self, query: str, parameters: dict = {}, batch_size: int = BATCH_SIZE,
+                  datatype: str = "dict") -> Iterator:
+        """Obtener los datos de una consulta fila por fila.
+
+        Args:
+            query (str): Consulta a ejecutar.
+            parameters (Dict, optional): Parámetros de la consulta.
+            batch_size (int, optional): Cantidad de filas por viaje a la base de datos.
+            datatype (str, optional): 'dict' para diccionarios, 'namedtuple' para registros, 'list' o 'tuple'
+                para tuplas.
+
+        Yields:
+            Fila con la forma solicitada.
+        """
+        for rows in self.read_batches(query, parameters, batch_size, datatype):
+            yield from rows
+
+    def read_parallel(self, query: str, partition_by: str, parameters: dict = {},
+                      partitions: Optional[int] = None, ranges: Optional[Sequence[Tuple]] = None,
+                      datatype: str = "dict", stream: bool = False, batch_size: int = BATCH_SIZE,
+                      max_workers: Optional[int] = None) -> [List, Iterator[List]]:
+        """Obtener los datos de una consulta dividiéndola en porciones disjuntas que se leen en paralelo,
+        cada una en una sesión distinta del pool.
+
+        Args:
+            query (str): Consulta a ejecutar.
+            partition_by (str): Columna o expresión de la consulta para dividir las filas con ORA_HASH o
+                con rangos; se inserta en el SQL, no debe venir de datos del usuario.
+            parameters (Dict, optional): Parámetros con nombre de la consulta.
+            partitions (int, optional): Cantidad de porciones por ORA_HASH; por defecto pool_size.
+            ranges (Sequence[Tuple], optional): Rangos (inicio, fin) numéricos o de fechas en lugar de ORA_HASH.
+            datatype (str, optional): 'dict' para diccionarios, 'namedtuple' para registros, 'tuple' para tuplas,
+                'list' para [columnas, filas].
+            stream (bool, optional): True para retornar un iterador de bloques en el orden en que llegan.
+            batch_size (int, optional): Filas por bloque y por viaje a la base de datos.
+            max_workers (int, optional): Porciones leídas a la vez; por defecto pool_size.
+
+        Returns:
+            [List, Iterator[List]]: Datos de todas las porciones unidos, o un iterador de bloques si stream.
+        """
+        datatype = datatype.lower()
+        if datatype not in ROW_DATATYPES:
+            logger.warning(INVALID_DATATYPE)
+            return None
+        try:
+            slices = partition_query(query, parameters, partition_by, partitions or self.__pool_max, ranges)
+        except ValueError as exc:
+            logger.error(str(exc))
+            return None
+        workers = max(1, min(len(slices), max_workers or self.__pool_max))
+        if stream:
+            return self.__stream_slices(query, slices, datatype, batch_size, workers)
+
+        def read_slice(sliced_query: str, values: Dict) -> List:
+            with self.__acquire() as cnx:
+                with cnx.cursor() as cursor:
+                    cursor.arraysize = batch_size
+                    cursor.prefetchrows = batch_size
+                    set_lob_fetch(cursor, self.__lob_fetch)
+                    cursor.execute(sliced_query, values)
+                    columns = get_columns(cursor.description)
+                    return [columns, fetch_all(cursor, factory=row_factory(columns, datatype))]
+
+        show_data = None
+        executor = ThreadPoolExecutor(max_workers=workers)
+        futures = [executor.submit(carry_tag(read_slice), sliced_query, values) for sliced_query, values in slices]
+        try:
+            columns, rows = None, []
+            for future in as_completed(futures):
+                columns, data = future.result()
+                rows.extend(data)
+            show_data = [columns, rows] if datatype == 'list' else rows
+            logger.info(f"{DATA_OBTAINED} {query}")
+        except (oracle.DatabaseError, Exception) as exc:
+            logger.error(f"Error in query {query}: {str(exc)}", exc_info=True)
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+        return show_data
+
+    def __stream_slices(self, query: str, slices: List[Tuple[str, Dict]], datatype: str, batch_size: int,
+                        workers: int) -> Iterator[List]:
+        """Leer las porciones en paralelo y entregar sus bloques a medida que llegan.
+
+        Una cola acotada limita los bloques en memoria; si el consumidor deja de iterar, las lecturas
+        pendientes se detienen y sus sesiones vuelven al pool.
+
+        Args:
+            query (str): Consulta original, para el log.
+            slices (List[Tuple[str, Dict]]): Consulta y parámetros de cada porción.
+            datatype (str): 'dict' para diccionarios, 'namedtuple' para registros, 'list' o 'tuple' para tuplas.
+            batch_size (int): Filas por bloque.
+            workers (int): Porciones leídas a la vez.
+
+        Yields:
+            List: Bloque de filas de alguna de las porciones.
+        """
+        blocks = queue.Queue(maxsize=QUEUE_SIZE * workers)
+        stop = threading.Event()
+        done = object()
+
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    blocks.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce(sliced_query: str, values: Dict) -> None:
+            batches = self.read_batches(sliced_query, values, batch_size, datatype)
+            try:
+                for rows in batches:
+                    if not put(rows):
+                        return
+            except Exception as exc:
+                put(exc)
+            finally:
+                batches.close()
+                put(done)
+
+        executor = ThreadPoolExecutor(max_workers=workers)
+        futures = [executor.submit(carry_tag(produce), sliced_query, values) for sliced_query, values in slices]
+        pending = len(futures)
+        try:
+            while pending:
+                item = blocks.get()
+                if item is done:
+                    pending -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield item
+            logger.info(f"{DATA_OBTAINED} {query}")
+        finally:
+            stop.set()
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def export_query(self, query: str, parameters: dict = {}, path: str = "", file_format: str = 'csv',
+                     compression: Optional[str] = None, batch_size: int = BATCH_SIZE) -> ExportResult:
+        """Exportar el resultado de una consulta a un archivo por bloques, sin cargarlo todo en memoria.
+
+        Args:
+            query (str): Consulta a ejecutar.
+            parameters (Dict, optional): Parámetros de la consulta.
+            path (str): Ruta del archivo de salida.
+            file_format (str, optional): 'csv', 'jsonl' o 'parquet' (requiere pyarrow).
+            compression (str, optional): 'gzip', 'bz2' o 'xz' para CSV/JSONL, comprimido en un hilo aparte
+                mientras se obtienen los bloques; para Parquet un códec de pyarrow ('snappy', 'zstd', ...).
+            batch_size (int, optional): Filas por fetchmany y por grupo de filas en Parquet.
+
+        Returns:
+            ExportResult: Filas y bytes escritos, duración y velocidad; error si falló.
+        """
+        result = ExportResult(path, file_format)
+        result.error = validate_export(file_format, compression)
+        if result.error is not None:
+            logger.warning(result.error)
+            return result
+        try:
+            with self.__acquire() as cnx:
+                with cnx.cursor() as cursor:
+                    cursor.arraysize = batch_size
+                    cursor.prefetchrows = batch_size
+                    set_lob_fetch(cursor, self.__lob_fetch)
+                    cursor.execute(query, parameters)
+                    result = export_cursor(cursor, path, file_format, compression, batch_size)
+            logger.info(f"{DATA_EXPORTED} {query}")
+        except (oracle.DatabaseError, Exception) as exc:
+            logger.error(f"Error in query {query}: {str(exc)}", exc_info=True)
+            result.error = str(exc)
+        return result
+
+    def execute_query(self, query: str, parameters: Dict = {}, autocommit: bool = False) -> bool:
+        """
+        Ejecutar una consulta.
+
+        Args:
+            query (str): Consulta a ejecutar.
+            parameters (Dict, optional): Parámetros de la consulta; las listas se enlazan como colecciones.
+            autocommit (bool, optional): Confirmar en el mismo viaje que la sentencia, sin un commit aparte.
+
+        Returns:
+            bool: True si se ejecuta correctamente, False en caso contrario.
+        """
+        result = False
+
+        metrics = self.__start_metrics('execute_query', query)
+        try:
+            with self.__acquire(metrics) as cnx:
+                try:
+                    with cnx.cursor() as cursor:
+                        values = bind_statement(cnx, query, parameters)
+                        with timed(metrics, 'execute'), commit_on_success(cnx, autocommit):
+                            cursor.execute(query, values)
+                            if metrics is not None:
+                                metrics.record_execute(cursor)
+                        query = cursor.statement
+                    if not autocommit:
+                        with timed(metrics, 'commit'):
+                            cnx.commit()
+                except oracle.DatabaseError as exc:
+                    if not is_disconnect_error(exc):
+                        cnx.rollback()
+                    raise
+                if self.__cache is not None:
+                    self.__cache.invalidate_query(query)
                 logger.info(f"{EXECUTED_QUERY} {query}")
                 result = True
-        except (cx_Oracle.DatabaseError, Exception) as exc:
+        except (oracle.DatabaseError, Exception) as exc:
             logger.error(f"Error in query {query}: {str(exc)}", exc_info=True)
-            cnx.rollback()
+            if metrics is not None:
+                metrics.error = str(exc)
+        self.__report(metrics, parameters)
         return result
 
-    def execute_many(self, query: str, values: List) -> bool:
+    def execute_many(self, query: str, values: List, autocommit: bool = False) -> bool:
+        """Ejecutar una consulta con varios valores.
+
+        Args:
+            query (str): Consulta a ejecutar.
+            values (List): Valores de la consulta.
+            autocommit (bool, optional): Confirmar en el mismo viaje que la sentencia, sin un commit aparte.
+
+        Returns:
+            bool: True si se ejecuta correctamente, False en caso contrario.
+        """
         result = False
+        metrics = self.__start_metrics('execute_many', query)
         try:
-            with self.__pool.acquire() as cnx:
-                with cnx.cursor() as cursor:
-                    cursor.prepare(query)
-                    cursor.executemany(None, values)
-                    query = cursor.statement
-                cnx.commit()
+            with self.__acquire(metrics) as cnx:
+                try:
+                    with cnx.cursor() as cursor:
+                        with timed(metrics, 'execute'), commit_on_success(cnx, autocommit):
+                            cursor.prepare(query)
+                            cursor.executemany(None, values)
+                        if metrics is not None:
+                            metrics.record_execute(cursor)
+                        query = cursor.statement
+                    if not autocommit:
+                        with timed(metrics, 'commit'):
+                            cnx.commit()
+                except oracle.DatabaseError as exc:
+                    if not is_disconnect_error(exc):
+                        cnx.rollback()
+                    raise
+                if self.__cache is not None:
+                    self.__cache.invalidate_query(query)
                 logger.info(f"{EXECUTED_QUERY} {query}")
                 result = True
-        except (cx_Oracle.DatabaseError, Exception) as exc:
+        except (oracle.DatabaseError, Exception) as exc:
             logger.error(f"Error in query {query}: {str(exc)}", exc_info=True)
-            cnx.rollback()
+            if metrics is not None:
+                metrics.error = str(exc)
+        self.__report(metrics, values[0] if values else None)
+
+        return result
+
+    @contextmanager
+    def transaction(self) -> Iterator[Transaction]:
+        """Ejecutar varias sentencias en una misma sesión del pool y cursor con un solo commit al final.
+
+        Si el bloque termina con un error se hace rollback y el error se propaga.
+
+        Yields:
+            Transaction: Transacción con execute, execute_many, read, savepoint y rollback_to.
+        """
+        metrics = self.__start_metrics('transaction', '')
+        try:
+            with self.__acquire(metrics) as cnx:
+                with Transaction(cnx, self.__read, self.__cache, metrics) as tx:
+                    yield tx
         finally:
-            self.__pool.release(self.__connection)
+            self.__report(metrics)
 
+    def bulk_load(self, query: str, rows: Iterable, batch_size: int = BATCH_SIZE,
+                  commit_every: int = 0) -> BulkLoadResult:
+        """Cargar filas por bloques de tamaño fijo en una sesión del pool, sin detenerse por filas con error.
+
+        Args:
+            query (str): Sentencia INSERT/UPDATE/MERGE con parámetros.
+            rows (Iterable): Filas a cargar (tuplas o diccionarios); puede ser un generador.
+            batch_size (int, optional): Filas por executemany.
+            commit_every (int, optional): Hacer commit cada vez que se carguen al menos esta cantidad de filas;
+                0 para hacer un solo commit al final.
+
+        Returns:
+            BulkLoadResult: Filas cargadas, filas rechazadas con su error ORA, tiempos por bloque y
+                arraydmlrowcounts.
+        """
+        try:
+            with self.__acquire() as cnx:
+                result = bulk_load(cnx, query, rows, batch_size, commit_every)
+        except (oracle.DatabaseError, Exception) as exc:
+            logger.error(f"Error in query {query}: {str(exc)}", exc_info=True)
+            result = BulkLoadResult()
+            result.error = str(exc)
+        if result.rows_loaded and self.__cache is not None:
+            self.__cache.invalidate_query(query)
+        if result.error is None:
+            logger.info(f"{EXECUTED_QUERY} {query} {result}")
         return result
+
+    def upsert(self, table: str, rows: Iterable, key_columns: Sequence[str], batch_size: int = BATCH_SIZE,
+               columns: Optional[Sequence[str]] = None, commit_every: int = 0,
+               max_workers: int = 1) -> UpsertResult:
+        """Insertar o actualizar filas por bloques: cada bloque se carga en una tabla temporal global de
+        staging (privada de cada sesión; se crea la primera vez) y se aplica con un solo MERGE.
+
+        Con max_workers mayor a 1 las filas se reparten entre varias sesiones del pool por hash de la key,
+        cada una con su propio commit; una key siempre la aplica la misma sesión, en el orden de entrada.
+
+        Args:
+            table (str): Tabla destino; va en el texto SQL, no debe venir de datos del usuario.
+            rows (Iterable): Filas (diccionarios o tuplas); puede ser un generador.
+            key_columns (Sequence[str]): Columnas que identifican una fila en la tabla destino.
+            batch_size (int, optional): Filas por bloque.
+            columns (Sequence[str], optional): Columnas de las filas; por defecto las keys de la primera fila.
+            commit_every (int, optional): Hacer commit cada vez que una sesión aplique al menos esta cantidad
+                de filas; 0 para hacer un solo commit al final en cada sesión.
+            max_workers (int, optional): Sesiones del pool que aplican bloques a la vez.
+
+        Returns:
+            UpsertResult: Filas insertadas y actualizadas y tiempos por bloque.
+        """
+        start = time.perf_counter()
+        try:
+            plan, rows = plan_upsert(table, rows, key_columns, columns)
+        except ValueError as exc:
+            logger.error(str(exc))
+            result = UpsertResult()
+            result.error = str(exc)
+            return result
+        if plan is None:
+            return UpsertResult()
+        workers = max(1, min(max_workers, self.__pool_max))
+        source = BatchSource(plan, rows, batch_size, workers)
+
+        def apply_batches(partition: int) -> UpsertResult:
+            try:
+                with self.__acquire() as cnx:
+                    return upsert_batches(cnx, plan, source, commit_every, partition)
+            except (oracle.DatabaseError, Exception) as exc:
+                source.failed.set()
+                logger.error(f"Error in upsert {table}: {str(exc)}", exc_info=True)
+                failed = UpsertResult()
+                failed.error = str(exc)
+                return failed
+
+        if workers == 1:
+            result = apply_batches(0)
+        else:
+            result = UpsertResult()
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for partial in executor.map(carry_tag(apply_batches), range(workers)):
+                    result.merge(partial)
+        result.seconds = time.perf_counter() - start
+        if result.rows and self.__cache is not None:
+            self.__cache.invalidate_query(plan.merge_sql)
+        if result.error is None:
+            logger.info(f"{UPSERTED_ROWS} {table} {result}")
+        return result
+
+    def register_statement(self, name: str, query: str) -> None:
+        """Registrar una sentencia frecuente para ejecutarla por nombre con un cursor ya preparado
+        sobre una sesión fija del pool.
+
+        Args:
+            name (str): Nombre de la sentencia.
+            query (str): Texto SQL de la sentencia.
+        """
+        self.__statements.register(name, query)
+
+    def read_statement(self, name: str, parameters: dict = {}, datatype: str = "dict",
+                       fetch_profile: Optional[str] = None) -> [Dict, List]:
+        """Obtener los datos de una consulta registrada con register_statement.
+
+        Args:
+            name (str): Nombre de la sentencia.
+            parameters (Dict, optional): Parámetros de la consulta.
+            datatype (str, optional): Tipo de datos a retornar: 'dict', 'list', 'tuple', 'namedtuple',
+                'columnar', 'numpy' o 'pandas'.
+            fetch_profile (str, optional): 'lookup', 'bulk' o 'auto'; por defecto el de la instancia.
+
+        Returns:
+            show_data[Dict,List]: Datos obtenidos.
+        """
+        show_data = None
+        datatype = datatype.lower()
+        if datatype in DATATYPES:
+
+            def sync_read_statement(cnx):
+                cursor = self.__statements.cursor(cnx, name)
+                try:
+                    return self.__read(cursor, self.__statements.query(name), parameters, datatype,
+                                       fetch_profile, prepared=True)
+                except Exception:
+                    self.__statements.discard(name)
+                    raise
+
+            try:
+                show_data = self.__run_pinned(sync_read_statement)
+                logger.info(f"{DATA_OBTAINED} {name}")
+            except (oracle.DatabaseError, Exception) as exc:
+                logger.error(f"Error in statement {name}: {str(exc)}", exc_info=True)
+        else:
+            logger.warning(INVALID_DATATYPE)
+
+        return show_data
+
+    def execute_statement(self, name: str, parameters: Dict = {}) -> bool:
+        """Ejecutar una sentencia registrada con register_statement.
+
+        Args:
+            name (str): Nombre de la sentencia.
+            parameters (Dict, optional): Parámetros de la sentencia.
+
+        Returns:
+            bool: True si se ejecuta correctamente, False en caso contrario.
+        """
+
+        def sync_execute_statement(cnx):
+            try:
+                cursor = self.__statements.cursor(cnx, name)
+                cursor.execute(None, parameters)
+                cnx.commit()
+            except oracle.DatabaseError as exc:
+                self.__statements.discard(name)
+                if not is_disconnect_error(exc):
+                    cnx.rollback()
+                raise
+
+        try:
+            self.__run_pinned(sync_execute_statement)
+            if self.__cache is not None:
+                self.__cache.invalidate_query(self.__statements.query(name))
+            logger.info(f"{EXECUTED_QUERY} {name}")
+            return True
+        except (oracle.DatabaseError, Exception) as exc:
+            logger.error(f"Error in statement {name}: {str(exc)}", exc_info=True)
+            return False
+
+    def statement_stats(self) -> Dict[str, int]:
+        """Obtener los aciertos, fallos y desalojos del caché de sentencias registradas.
+
+        Returns:
+            Dict[str, int]: hits, misses, evictions, size y capacity.
+        """
+        return self.__statements.stats()
+
+    def warmup(self, sessions: Optional[int] = None) -> int:
+        """Abrir sesiones del pool por adelantado para que las primeras consultas no esperen la conexión.
+
+        Las sesiones por encima de pool_min se cierran de nuevo si quedan libres más de idle_timeout.
+
+        Args:
+            sessions (int, optional): Sesiones abiertas que se buscan; por defecto pool_size.
+
+        Returns:
+            int: Sesiones abiertas en el pool.
+        """
+        try:
+            return warm_pool(self.__get_pool(), min(sessions or self.__pool_max, self.__pool_max))
+        except (oracle.DatabaseError, Exception) as exc:
+            logger.error(str(exc), exc_info=True)
+            return self.pool_stats()['open']
+
+    def pool_stats(self) -> Dict[str, int]:
+        """Obtener los indicadores del pool de sesiones.
+
+        Returns:
+            Dict[str, int]: busy (sesiones en uso), open (sesiones abiertas), min y max (tamaño configurado),
+                waiters (hilos esperando una sesión), idle_seconds (segundos desde el último uso) y
+                session_setups (sesiones configuradas por el session_callback).
+        """
+        with self.__waiters_lock:
+            waiters = self.__waiters
+        pool = self.__pool
+        callback = self.__session_callback
+        return {'busy': pool.busy if pool is not None else 0, 'open': pool.opened if pool is not None else 0,
+                'min': self.__pool_min, 'max': self.__pool_max, 'waiters': waiters,
+                'idle_seconds': int(time.monotonic() - self.__last_used),
+                'session_setups': callback.calls if isinstance(callback, SessionCallback) else 0}
+
+    def close(self) -> None:
+        """Liberar la sesión fija de las sentencias registradas, cerrar el pool y quitar la instancia del
+        registro, de modo que un nuevo PoolDB con el mismo setup cree un pool nuevo."""
+        with self.__pinned_lock:
+            with self.__pool_lock:
+                self.__close_pool()
+        with self._lock:
+            if self._instances.get(self._setup_key) is self:
+                del self._instances[self._setup_key]
+            self._private.discard(self)
+
+
+class PoolRouter:
+    """ PoolDB sobre varios endpoints (setup con la key 'endpoints', ver OracleCnx.routing): un pool por
+    endpoint, las lecturas repartidas entre las réplicas y las escrituras en el primario.
+
+    PoolDB(setup) retorna un PoolRouter cuando el setup trae 'endpoints'. Los métodos que no están aquí
+    (export_query, read_parallel, register_statement, ...) se ejecutan en el primario. Las instancias se
+    comparten por identidad del conjunto de endpoints, como las de PoolDB.
+    """
+    _instances: Dict[str, "PoolRouter"] = {}
+    _lock = threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        setup_key = cluster_key(kwargs.get('setup', args[0] if args else {}))
+        with cls._lock:
+            if setup_key not in cls._instances:
+                cls._instances[setup_key] = super(PoolRouter, cls).__new__(cls)
+                cls._instances[setup_key]._initialized = False
+            return cls._instances[setup_key]
+
+    def __init__(self, setup: Dict, *args, **kwargs) -> None:
+        """Constructor.
+
+        Args:
+            setup (Dict): Setup con la key 'endpoints' y las keys opcionales de enrutamiento.
+            *args, **kwargs: Parámetros de PoolDB que se usan en el pool de cada endpoint (pool_size, cache,
+                ...); el metrics_hook recibe las métricas de todos los endpoints.
+        """
+        with self._lock:
+            if self._initialized:
+                return
+            options = inspect.signature(PoolDB.__init__).bind(None, setup, *args, **kwargs).arguments
+            self._setup_key = cluster_key(setup)
+            self.__router, endpoints = build_router(setup)
+            self.__probe_query = setup.get('probe_query', ROUTING_PROBE_QUERY)
+            self.__metrics_hook = options.pop('metrics_hook', None)
+            self.__pools: Dict[str, PoolDB] = {}
+            self.__endpoints: Dict[str, Endpoint] = {}
+            # Cada endpoint tiene un PoolDB propio: uno compartido conservaría el metrics_hook con que se creó
+            # y el router no vería la latencia ni los errores de sus consultas.
+            for endpoint, endpoint_setup in endpoints:
+                self.__endpoints[endpoint.name] = endpoint
+                options.update(setup=endpoint_setup,
+                               metrics_hook=lambda metrics, endpoint=endpoint: self.__observe(endpoint, metrics))
+                self.__pools[endpoint.name] = PoolDB._create_private(
+                    **{key: value for key, value in options.items() if key != 'self'})
+            # Otro hilo que crea el mismo router solo lo usa cuando ya tiene todos sus pools.
+            self._initialized = True
+
+    def __getattr__(self, name: str):
+        # Solo se llama para los atributos que PoolRouter no define.
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.__pools[self.__router.primary.name], name)
+
+    def __observe(self, endpoint: Endpoint, metrics: QueryMetrics) -> None:
+        """Registrar en el router la latencia y el error de una consulta y entregar las métricas al hook."""
+        self.__router.record(endpoint, metrics.seconds, metrics.error)
+        emit(self.__metrics_hook, metrics)
+
+    def __read_pool(self) -> Tuple[Endpoint, PoolDB]:
+        """Elegir el endpoint de una lectura y lanzar las pruebas de las réplicas pendientes."""
+        for endpoint in self.__router.due_probes():
+            threading.Thread(target=self.__probe, args=(endpoint,), daemon=True,
+                             name=f"OracleCnx-probe-{endpoint.name}").start()
+        endpoint = self.__router.acquire_read()
+        return endpoint, self.__pools[endpoint.name]
+
+    def __probe(self, endpoint: Endpoint) -> None:
+        """Probar una réplica fuera de la rotación con probe_query antes de volver a admitirla."""
+        healthy = False
+        try:
+            data = self.__pools[endpoint.name].read_data(self.__probe_query, datatype='list', cache_ttl=0)
+            healthy = data is not None
+        finally:
+            self.__router.readmit(endpoint, healthy)
+
+    def read_data(self, query: str, *args, **kwargs) -> [Dict, List]:
+        """Obtener los datos de una consulta en la réplica con menos carga (ver PoolDB.read_data)."""
+        endpoint, pool = self.__read_pool()
+        try:
+            return pool.read_data(query, *args, **kwargs)
+        finally:
+            self.__router.release(endpoint)
+
+    def read_multi(self, query: str, *args, **kwargs) -> Optional[Dict]:
+        """Obtener varios resultados de un bloque PL/SQL en la réplica con menos carga (ver PoolDB.read_multi)."""
+        endpoint, pool = self.__read_pool()
+        try:
+            return pool.read_multi(query, *args, **kwargs)
+        finally:
+            self.__router.release(endpoint)
+
+    def read_batches(self, query: str, *args, **kwargs) -> Iterator[List]:
+        """Obtener los datos de una consulta en bloques desde una réplica (ver PoolDB.read_batches)."""
+        endpoint, pool = self.__read_pool()
+        try:
+            yield from pool.read_batches(query, *args, **kwargs)
+        finally:
+            self.__router.release(endpoint)
+
+    def read_iter(self, query: str, *args, **kwargs) -> Iterator:
+        """Obtener los datos de una consulta fila por fila desde una réplica (ver PoolDB.read_iter)."""
+        endpoint, pool = self.__read_pool()
+        try:
+            yield from pool.read_iter(query, *args, **kwargs)
+        finally:
+            self.__router.release(endpoint)
+
+    def __write(self, method: str, *args, **kwargs):
+        """Ejecutar una escritura en el primario."""
+        endpoint = self.__router.acquire_write()
+        try:
+            return getattr(self.__pools[endpoint.name], method)(*args, **kwargs)
+        finally:
+            self.__router.release(endpoint)
+
+    def execute_query(self, query: str, *args, **kwargs) -> bool:
+        """Ejecutar una sentencia en el primario (ver PoolDB.execute_query)."""
+        return self.__write('execute_query', query, *args, **kwargs)
+
+    def execute_many(self, query: str, *args, **kwargs) -> bool:
+        """Ejecutar una sentencia con varios valores en el primario (ver PoolDB.execute_many)."""
+        return self.__write('execute_many', query, *args, **kwargs)
+
+    def bulk_load(self, query: str, *args, **kwargs) -> BulkLoadResult:
+        """Cargar filas por bloques en el primario (ver PoolDB.bulk_load)."""
+        return self.__write('bulk_load', query, *args, **kwargs)
+
+    def upsert(self, table: str, *args, **kwargs) -> UpsertResult:
+        """Insertar o actualizar filas por bloques en el primario (ver PoolDB.upsert)."""
+        return self.__write('upsert', table, *args, **kwargs)
+
+    def execute_statement(self, name: str, *args, **kwargs) -> bool:
+        """Ejecutar una sentencia registrada en el primario (ver PoolDB.execute_statement)."""
+        return self.__write('execute_statement', name, *args, **kwargs)
+
+    @contextmanager
+    def transaction(self) -> Iterator[Transaction]:
+        """Ejecutar varias sentencias en el primario con un solo commit al final (ver PoolDB.transaction)."""
+        endpoint = self.__router.acquire_write()
+        try:
+            with self.__pools[endpoint.name].transaction() as tx:
+                yield tx
+        finally:
+            self.__router.release(endpoint)
+
+    def endpoint_stats(self) -> Dict[str, Dict]:
+        """Obtener los indicadores del router por endpoint (ver Router.stats)."""
+        return self.__router.stats()
+
+    def pool_stats(self) -> Dict[str, int]:
+        """Obtener los indicadores del pool de sesiones sumados en todos los endpoints (ver PoolDB.pool_stats);
+        idle_seconds es el del endpoint usado más recientemente."""
+        stats: Dict[str, int] = {}
+        for values in self.endpoint_pool_stats().values():
+            for name, value in values.items():
+                if name == 'idle_seconds':
+                    stats[name] = min(stats.get(name, value), value)
+                else:
+                    stats[name] = stats.get(name, 0) + value
+        return stats
+
+    def endpoint_pool_stats(self) -> Dict[str, Dict[str, int]]:
+        """Obtener los indicadores del pool de sesiones de cada endpoint (ver PoolDB.pool_stats)."""
+        return {name: pool.pool_stats() for name, pool in self.__pools.items()}
+
+    def warmup(self, sessions: Optional[int] = None) -> int:
+        """Abrir por adelantado las sesiones del pool de cada endpoint.
+
+        Returns:
+            int: Sesiones abiertas en todos los endpoints.
+        """
+        return sum(pool.warmup(sessions) for pool in self.__pools.values())
+
+    def close(self) -> None:
+        """Cerrar el pool de cada endpoint y quitar la instancia del registro."""
+        for pool in self.__pools.values():
+            pool.close()
+        with self._lock:
+            if self._instances.get(self._setup_key) is self:
+                del self._instances[self._setup_key]
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+División de una consulta en porciones disjuntas para leerlas en paralelo en varias sesiones del pool.
+
+@author: Jhonatan Martínez
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+from OracleCnx.constants import *
+
+
+def hash_slices(query: str, parameters: Dict, partition_by: str, partitions: int) -> List[Tuple[str, Dict]]:
+    """Dividir una consulta con ORA_HASH sobre una columna o expresión.
+
+    Args:
+        query (str): Consulta original.
+        parameters (Dict): Parámetros con nombre de la consulta.
+        partition_by (str): Columna o expresión de la consulta usada para repartir las filas.
+        partitions (int): Cantidad de porciones.
+
+    Returns:
+        List[Tuple[str, Dict]]: Consulta y parámetros de cada porción.
+    """
+    # ORA_HASH(NULL) es NULL: las filas con NULL van a la porción 0 para no perderlas.
+    sliced = f"select * from ({query}) where nvl(ora_hash({partition_by}, {partitions - 1}), 0) = :{SLICE_BIND}"
+    return [(sliced, dict(parameters, **{SLICE_BIND: number})) for number in range(partitions)]
+
+
+def range_slices(query: str, parameters: Dict, partition_by: str,
+                 ranges: Sequence[Tuple]) -> List[Tuple[str, Dict]]:
+    """Dividir una consulta en rangos numéricos o de fechas [inicio, fin) sobre una columna. Las filas con
+    NULL en la columna se leen en la primera porción.
+
+    Args:
+        query (str): Consulta original.
+        parameters (Dict): Parámetros con nombre de la consulta.
+        partition_by (str): Columna o expresión de la consulta usada para los rangos.
+        ranges (Sequence[Tuple]): Pares (inicio, fin); None en un extremo deja el rango abierto.
+
+    Returns:
+        List[Tuple[str, Dict]]: Consulta y parámetros de cada porción.
+    """
+    slices = []
+    for number, (low, high) in enumerate(ranges):
+        conditions = []
+        values = dict(parameters)
+        if low is not None:
+            conditions.append(f"{partition_by} >= :{SLICE_BIND}_low")
+            values[f"{SLICE_BIND}_low"] = low
+        if high is not None:
+            conditions.append(f"{partition_by} < :{SLICE_BIND}_high")
+            values[f"{SLICE_BIND}_high"] = high
+        where = " and ".join(conditions) or "1 = 1"
+        if number == 0:
+            where = f"({where}) or {partition_by} is null"
+        slices.append((f"select * from ({query}) where {where}", values))
+    return slices
+
+
+def partition_query(query: str, parameters: Optional[Dict], partition_by: str, partitions: int = 0,
+                    ranges: Optional[Sequence[Tuple]] = None) -> List[Tuple[str, Dict]]:
+    """Dividir una consulta en porciones disjuntas.
+
+    Args:
+        query (str): Consulta original.
+        parameters (Dict, optional): Parámetros con nombre de la consulta.
+        partition_by (str): Columna o expresión usada para dividir; se inserta en el SQL, no debe venir
+            de datos del usuario.
+        partitions (int, optional): Cantidad de porciones por ORA_HASH si no se indican rangos.
+        ranges (Sequence[Tuple], optional): Rangos (inicio, fin) explícitos.
+
+    Returns:
+        List[Tuple[str, Dict]]: Consulta y parámetros de cada porción.
+    """
+    if not isinstance(parameters or {}, dict):
+        raise ValueError(INVALID_PARALLEL_PARAMETERS)
+    query = query.strip().rstrip(";")
+    if ranges:
+        return range_slices(query, parameters or {}, partition_by, ranges)
+    if partitions < 1:
+        raise ValueError(INVALID_PARTITIONS)
+    return hash_slices(query, parameters or {}, partition_by, partitions)
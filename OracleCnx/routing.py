@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""
+Enrutamiento entre varios endpoints de una misma base de datos: un primario, que recibe las escrituras, y
+réplicas de lectura (por ejemplo standbys de Active Data Guard), que reciben las lecturas.
+
+El setup lleva la key 'endpoints' con una lista de diccionarios con host, port, sdi y role ('primary' o
+'replica'); las demás keys (user, password, driver, backend, ...) se toman del setup principal si el
+endpoint no las trae. Keys opcionales del setup:
+    - balance: 'least_outstanding' (réplica con menos consultas en curso) o 'ewma' (menor latencia
+      promedio ponderada por las consultas en curso).
+    - read_your_writes: segundos después de una escritura en los que las lecturas van al primario; la
+      ventana vale solo para el hilo o la tarea de asyncio que escribió, como session_tag.
+    - eject_after: errores de conexión seguidos que sacan a una réplica de la rotación.
+    - eject_seconds: segundos que una réplica queda fuera antes de probarla de nuevo.
+    - probe_query: consulta con la que se prueba una réplica antes de volver a admitirla.
+
+@author: Jhonatan Martínez
+"""
+
+import re
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from loguru import logger
+from OracleCnx.constants import *
+from OracleCnx.utils import is_disconnect_error
+
+# Errores que indican que el endpoint no está disponible (listener, instancia caída o montada, pool sin
+# sesiones), además de las conexiones perdidas.
+ENDPOINT_ERRORS = re.compile(r"ORA-(01033|01034|01089|12514|12528|12541|12543|24457|24459)|DPY-(4005|6005)")
+
+
+def is_endpoint_error(error: Optional[str]) -> bool:
+    """Validar si el error de una consulta indica que el endpoint no está disponible.
+
+    Args:
+        error (str, optional): Error registrado en las métricas de la consulta.
+
+    Returns:
+        bool: True si el error cuenta para sacar al endpoint de la rotación.
+    """
+    if not error:
+        return False
+    return error == NO_CONNECTION or ENDPOINT_ERRORS.search(error) is not None or is_disconnect_error(error)
+
+
+def has_endpoints(setup: Dict) -> bool:
+    """True si el setup describe varios endpoints con la key 'endpoints'."""
+    return isinstance(setup, dict) and bool(setup.get('endpoints'))
+
+
+def cluster_key(setup: Dict) -> str:
+    """Identidad de un setup con varios endpoints (user@host:port/sdi de cada uno), sin la contraseña."""
+    return ",".join(f"{role}:{endpoint_setup.get('user', '')}@{name}"
+                    for role, name, endpoint_setup in split_endpoints(setup, log=False))
+
+
+def split_endpoints(setup: Dict, log: bool = True) -> List:
+    """Construir el setup de cada endpoint a partir del setup principal.
+
+    Args:
+        setup (Dict): Setup con la key 'endpoints'.
+        log (bool, optional): False para no registrar los avisos de roles.
+
+    Returns:
+        List: Tuplas (role, nombre host:port/sdi, setup del endpoint); el primario queda primero.
+    """
+    base = {key: value for key, value in setup.items() if key not in ROUTING_KEYS}
+    endpoints = []
+    for endpoint in setup['endpoints']:
+        role = str(endpoint.get('role', 'replica')).lower()
+        if role not in ENDPOINT_ROLES:
+            if log:
+                logger.warning(f"{INVALID_ENDPOINT_ROLE} {role}")
+            role = 'replica'
+        endpoint_setup = dict(base, **{key: value for key, value in endpoint.items() if key != 'role'})
+        name = f"{endpoint_setup.get('host', '')}:{endpoint_setup.get('port', '')}/{endpoint_setup.get('sdi', '')}"
+        endpoints.append([role, name, endpoint_setup])
+    primaries = [endpoint for endpoint in endpoints if endpoint[0] == 'primary']
+    if len(primaries) != 1:
+        if log:
+            logger.warning(f"{INVALID_PRIMARY} {len(primaries)}")
+        for endpoint in endpoints:
+            endpoint[0] = 'replica'
+        endpoints[0][0] = 'primary'
+    endpoints.sort(key=lambda endpoint: endpoint[0] != 'primary')
+    return [tuple(endpoint) for endpoint in endpoints]
+
+
+class Endpoint:
+    """ Estado de un endpoint en el router."""
+
+    def __init__(self, name: str, role: str) -> None:
+        self.name: str = name
+        self.role: str = role
+        self.outstanding: int = 0
+        self.ewma: Optional[float] = None
+        self.requests: int = 0
+        self.errors: int = 0
+        self.failures: int = 0
+        self.ejected_until: float = 0.0
+        self.probing: bool = False
+
+    def stats(self, now: float) -> Dict:
+        """Indicadores del endpoint para Router.stats."""
+        return {'role': self.role, 'outstanding': self.outstanding, 'requests': self.requests,
+                'errors': self.errors, 'ewma_ms': round(self.ewma * 1000, 3) if self.ewma is not None else None,
+                'ejected': self.ejected_until > 0, 'ejected_seconds': max(self.ejected_until - now, 0.0)}
+
+    def __repr__(self) -> str:
+        return f"Endpoint({self.name!r}, role={self.role!r}, outstanding={self.outstanding}, ewma={self.ewma})"
+
+
+class Router:
+    """ Elige el endpoint de cada consulta: las escrituras van al primario y las lecturas a la réplica
+    disponible con menos carga; si no hay réplicas disponibles, las lecturas van al primario.
+
+    Una réplica sale de la rotación tras eject_after errores de conexión seguidos. Pasados eject_seconds
+    queda pendiente de prueba (due_probes) y solo vuelve a recibir lecturas si la prueba tiene éxito.
+    """
+
+    def __init__(self, endpoints: List[Endpoint], balance: str = 'least_outstanding',
+                 read_your_writes: float = 0.0, eject_after: int = ROUTING_EJECT_AFTER,
+                 eject_seconds: float = ROUTING_EJECT_SECONDS) -> None:
+        """Constructor.
+
+        Args:
+            endpoints (List[Endpoint]): Endpoints; el primero con role 'primary' recibe las escrituras.
+            balance (str, optional): 'least_outstanding' o 'ewma'.
+            read_your_writes (float, optional): Segundos después de una escritura en los que las lecturas
+                del mismo hilo o tarea van al primario; 0 para no esperar.
+            eject_after (int, optional): Errores de conexión seguidos que sacan a una réplica de la rotación.
+            eject_seconds (float, optional): Segundos fuera de la rotación antes de probar la réplica.
+        """
+        if balance not in BALANCE_MODES:
+            logger.warning(f"{INVALID_BALANCE} {balance}")
+            balance = 'least_outstanding'
+        self.endpoints: List[Endpoint] = endpoints
+        self.primary: Endpoint = next(endpoint for endpoint in endpoints if endpoint.role == 'primary')
+        self.__replicas = [endpoint for endpoint in endpoints if endpoint.role == 'replica']
+        self.__balance = balance
+        self.__read_your_writes = read_your_writes
+        self.__eject_after = max(eject_after, 1)
+        self.__eject_seconds = eject_seconds
+        # Momento de la última escritura de cada hilo o tarea: las escrituras de otros no desvían sus lecturas.
+        self.__last_write: ContextVar = ContextVar(f"last_write_{id(self)}", default=float('-inf'))
+        self.__lock = threading.Lock()
+
+    def acquire_read(self) -> Endpoint:
+        """Elegir el endpoint de una lectura y contarla como consulta en curso.
+
+        Returns:
+            Endpoint: Réplica elegida, o el primario.
+        """
+        with self.__lock:
+            now = time.monotonic()
+            endpoint = self.primary
+            if now - self.__last_write.get() >= self.__read_your_writes:
+                replicas = [replica for replica in self.__replicas if replica.ejected_until == 0]
+                if replicas:
+                    endpoint = min(replicas, key=self.__load)
+            endpoint.outstanding += 1
+            return endpoint
+
+    def acquire_write(self) -> Endpoint:
+        """Elegir el primario para una escritura y abrir la ventana de read_your_writes del hilo o tarea actual.
+
+        Returns:
+            Endpoint: Primario.
+        """
+        self.__last_write.set(time.monotonic())
+        with self.__lock:
+            self.primary.outstanding += 1
+            return self.primary
+
+    def release(self, endpoint: Endpoint) -> None:
+        """Descontar una consulta en curso de un endpoint."""
+        with self.__lock:
+            endpoint.outstanding -= 1
+
+    def record(self, endpoint: Endpoint, seconds: float, error: Optional[str] = None) -> None:
+        """Registrar la latencia y el resultado de una consulta de un endpoint.
+
+        Args:
+            endpoint (Endpoint): Endpoint donde corrió la consulta.
+            seconds (float): Duración de la consulta.
+            error (str, optional): Error de la consulta, si falló.
+        """
+        with self.__lock:
+            endpoint.requests += 1
+            if not is_endpoint_error(error):
+                # Los errores del SQL (tabla inexistente, datos inválidos) no dicen nada del endpoint.
+                endpoint.failures = 0
+                if endpoint.ewma is None:
+                    endpoint.ewma = seconds
+                else:
+                    endpoint.ewma += ROUTING_EWMA_ALPHA * (seconds - endpoint.ewma)
+                return
+            endpoint.errors += 1
+            endpoint.failures += 1
+            if endpoint.role == 'replica' and endpoint.ejected_until == 0 and endpoint.failures >= self.__eject_after:
+                endpoint.ejected_until = time.monotonic() + self.__eject_seconds
+                logger.warning(f"{ENDPOINT_EJECTED} {endpoint.name}: {error}")
+
+    def due_probes(self) -> List[Endpoint]:
+        """Obtener las réplicas fuera de la rotación cuyo tiempo ya pasó y marcarlas en prueba, de modo
+        que cada una se pruebe una sola vez.
+
+        Returns:
+            List[Endpoint]: Réplicas a probar.
+        """
+        with self.__lock:
+            now = time.monotonic()
+            due = [replica for replica in self.__replicas
+                   if 0 < replica.ejected_until <= now and not replica.probing]
+            for replica in due:
+                replica.probing = True
+            return due
+
+    def readmit(self, endpoint: Endpoint, healthy: bool) -> None:
+        """Registrar el resultado de la prueba de una réplica.
+
+        Args:
+            endpoint (Endpoint): Réplica probada.
+            healthy (bool): True si la prueba tuvo éxito; la réplica vuelve a recibir lecturas.
+        """
+        with self.__lock:
+            endpoint.probing = False
+            if healthy:
+                endpoint.failures = 0
+                endpoint.ejected_until = 0.0
+                logger.info(f"{ENDPOINT_READMITTED} {endpoint.name}")
+            else:
+                endpoint.ejected_until = time.monotonic() + self.__eject_seconds
+
+    def stats(self) -> Dict[str, Dict]:
+        """Obtener los indicadores de cada endpoint.
+
+        Returns:
+            Dict[str, Dict]: role, outstanding, requests, errors, ewma_ms, ejected y ejected_seconds por
+                endpoint (host:port/sdi).
+        """
+        with self.__lock:
+            now = time.monotonic()
+            return {endpoint.name: endpoint.stats(now) for endpoint in self.endpoints}
+
+    def __load(self, endpoint: Endpoint):
+        """Carga de una réplica según el balance: menor es mejor. Las réplicas sin latencia medida van primero."""
+        ewma = endpoint.ewma or 0.0
+        if self.__balance == 'ewma':
+            return ewma * (endpoint.outstanding + 1), endpoint.outstanding
+        return endpoint.outstanding, ewma
+
+
+def build_router(setup: Dict) -> tuple:
+    """Crear el router y el setup de cada endpoint a partir de un setup con la key 'endpoints'.
+
+    Args:
+        setup (Dict): Setup con varios endpoints.
+
+    Returns:
+        tuple: (Router, lista de tuplas (Endpoint, setup del endpoint)).
+    """
+    endpoints = [(Endpoint(name, role), endpoint_setup) for role, name, endpoint_setup in split_endpoints(setup)]
+    router = Router([endpoint for endpoint, _ in endpoints],
+                    balance=str(setup.get('balance', 'least_outstanding')).lower(),
+                    read_your_writes=float(setup.get('read_your_writes', 0)),
+                    eject_after=int(setup.get('eject_after', ROUTING_EJECT_AFTER)),
+                    eject_seconds=float(setup.get('eject_seconds', ROUTING_EJECT_SECONDS)))
+    return router, endpoints
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Inicialización de las sesiones del pool por etiqueta: el session_callback configura una sesión (ALTER
+SESSION de NLS, zona horaria, esquema, ...) solo cuando es nueva o su etiqueta no coincide con la pedida;
+las sesiones que ya tienen la etiqueta se reutilizan sin viajes adicionales.
+
+La etiqueta pedida se toma del bloque session_tag activo o, si no hay uno, de la etiqueta por defecto de
+la instancia (parámetro tag de PoolDB y AsyncDB). El bloque vale para el hilo o la tarea de asyncio
+donde se abre.
+
+@author: Jhonatan Martínez
+"""
+
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, Optional, Union
+
+_session_tag: ContextVar = ContextVar('session_tag', default=None)
+
+
+@contextmanager
+def session_tag(tag: Optional[str]) -> Iterator[None]:
+    """Pedir las sesiones del pool con una etiqueta dentro de un bloque.
+
+    Args:
+        tag (str, optional): Etiqueta, por ejemplo 'nls=iso;schema=APP'; None para usar la de la instancia.
+    """
+    token = _session_tag.set(tag)
+    try:
+        yield
+    finally:
+        _session_tag.reset(token)
+
+
+def current_tag(default: Optional[str] = None) -> Optional[str]:
+    """Obtener la etiqueta del bloque session_tag activo, o default si no hay uno."""
+    tag = _session_tag.get()
+    return default if tag is None else tag
+
+
+def carry_tag(function: Callable) -> Callable:
+    """Envolver una función que corre en otro hilo para que use la etiqueta del hilo que la envía.
+
+    Args:
+        function (Callable): Función a ejecutar en un executor.
+
+    Returns:
+        Callable: Función que corre dentro de un bloque session_tag con la etiqueta actual.
+    """
+    tag = _session_tag.get()
+
+    def run(*args, **kwargs):
+        with session_tag(tag):
+            return function(*args, **kwargs)
+    return run
+
+
+def parse_tag(tag: Optional[str]) -> Dict[str, str]:
+    """Separar una etiqueta 'clave=valor;clave=valor' en sus propiedades.
+
+    Args:
+        tag (str, optional): Etiqueta pedida al pool.
+
+    Returns:
+        Dict[str, str]: Propiedades de la etiqueta; vacío si no hay etiqueta.
+    """
+    properties = {}
+    for part in (tag or '').split(';'):
+        name, _, value = part.partition('=')
+        if name.strip():
+            properties[name.strip()] = value.strip()
+    return properties
+
+
+class SessionCallback:
+    """ session_callback del pool: ejecuta la función del usuario y deja la sesión con la etiqueta pedida,
+    que se conserva al devolverla al pool. Un nombre de procedimiento PL/SQL se entrega tal cual al driver.
+    """
+
+    def __init__(self, callback: Callable) -> None:
+        """Constructor.
+
+        Args:
+            callback (Callable): Función que recibe la sesión y la etiqueta pedida (o None) y la configura.
+        """
+        self.__callback = callback
+        self.__calls = 0
+        self.__lock = threading.Lock()
+
+    def __call__(self, cnx, requested_tag: Optional[str]) -> None:
+        self.__callback(cnx, requested_tag)
+        if requested_tag:
+            cnx.tag = requested_tag
+        with self.__lock:
+            self.__calls += 1
+
+    @property
+    def calls(self) -> int:
+        """Sesiones configuradas por el callback."""
+        return self.__calls
+
+
+def wrap_session_callback(callback: Optional[Union[Callable, str]]) -> Optional[Union[SessionCallback, str]]:
+    """Preparar el session_callback de un pool.
+
+    Args:
+        callback (Callable, str, optional): Función (sesión, etiqueta) o nombre de un procedimiento PL/SQL.
+
+    Returns:
+        SessionCallback, str: Callback para create_pool; None si no hay callback.
+    """
+    if callback is None or isinstance(callback, str):
+        return callback
+    return SessionCallback(callback)
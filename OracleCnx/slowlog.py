@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Registro de consultas lentas: las llamadas que superan un umbral se guardan con su SQL_ID, el SQL sin
+valores, los tiempos de execute y fetch, las filas y la huella de los parámetros; para una fracción de
+ellas se obtiene en segundo plano el plan de ejecución con DBMS_XPLAN.DISPLAY_CURSOR.
+
+@author: Jhonatan Martínez
+"""
+
+import datetime
+import hashlib
+import json
+import random
+import struct
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from loguru import logger
+from OracleCnx.constants import *
+from OracleCnx.cache import normalize_sql
+from OracleCnx.metrics import QueryMetrics
+
+_SQL_ID_ALPHABET = '0123456789abcdfghjkmnpqrstuvwxyz'
+
+
+def sql_id(statement: str) -> str:
+    """Calcular el SQL_ID que Oracle asigna al texto de una sentencia, sin consultar la base de datos.
+
+    Es la parte baja del MD5 del texto (con el 0 final) en base 32, igual que V$SQL.SQL_ID; el texto
+    debe ser exactamente el enviado al servidor.
+
+    Args:
+        statement (str): Texto SQL tal como se ejecutó.
+
+    Returns:
+        str: SQL_ID de 13 caracteres.
+    """
+    digest = hashlib.md5(statement.encode('utf-8') + b'\x00').digest()
+    high, low = struct.unpack('<II', digest[8:16])
+    value = (high << 32) | low
+    chars = []
+    for _ in range(13):
+        chars.append(_SQL_ID_ALPHABET[value & 31])
+        value >>= 5
+    return ''.join(reversed(chars))
+
+
+def parameter_fingerprint(parameters) -> str:
+    """Huella de los parámetros de una consulta: nombres y tipos, sin los valores.
+
+    Args:
+        parameters: Parámetros de la consulta (dict, secuencia o None).
+
+    Returns:
+        str: Huella de 12 caracteres; consultas con la misma forma de parámetros comparten huella.
+    """
+    if isinstance(parameters, dict):
+        shape = sorted((str(name), type(value).__name__) for name, value in parameters.items())
+    elif isinstance(parameters, (list, tuple)):
+        shape = [type(value).__name__ for value in parameters]
+    else:
+        shape = []
+    return hashlib.sha1(repr(shape).encode('utf-8')).hexdigest()[:12]
+
+
+class SlowQueryLog:
+    """ Registro de consultas lentas en un buffer circular en memoria y, opcionalmente, en un archivo JSONL.
+
+    Se pasa como slow_log a ConnectionDB, PoolDB o AsyncDB; una misma instancia puede compartirse entre
+    varias conexiones.
+    """
+
+    def __init__(self, threshold: float = SLOW_QUERY_THRESHOLD, sample_rate: float = SLOW_QUERY_SAMPLE_RATE,
+                 capacity: int = SLOW_QUERY_CAPACITY, path: Optional[str] = None,
+                 plan_format: str = SLOW_QUERY_PLAN_FORMAT) -> None:
+        """Constructor.
+
+        Args:
+            threshold (float, optional): Segundos desde los que una llamada se considera lenta.
+            sample_rate (float, optional): Fracción de las consultas lentas para las que se obtiene el plan;
+                0 para no obtener planes.
+            capacity (int, optional): Registros que se conservan en memoria; los más antiguos se descartan.
+            path (str, optional): Archivo JSONL donde se agrega cada registro; None para no escribir archivo.
+            plan_format (str, optional): Formato de DBMS_XPLAN.DISPLAY_CURSOR ('BASIC', 'TYPICAL', 'ALL', ...).
+        """
+        self.__threshold = threshold
+        self.__sample_rate = sample_rate
+        self.__path = path
+        self.__plan_format = plan_format
+        self.__records = deque(maxlen=capacity)
+        self.__lock = threading.Lock()
+        self.__file_lock = threading.Lock()
+        self.__executor: Optional[ThreadPoolExecutor] = None
+        self.__pending = 0
+
+    def observe(self, metrics: QueryMetrics, parameters=None, connect: Optional[Callable] = None) -> Optional[Dict]:
+        """Registrar una llamada terminada si superó el umbral.
+
+        Args:
+            metrics (QueryMetrics): Métricas cerradas de la llamada.
+            parameters: Parámetros de la llamada, para la huella.
+            connect (Callable, optional): Función sin argumentos que retorna una conexión (se usa con `with`)
+                para obtener el plan en segundo plano; None para no obtener el plan.
+
+        Returns:
+            Dict: Registro guardado, o None si la llamada no fue lenta.
+        """
+        if not metrics.query or metrics.cached or metrics.seconds < self.__threshold:
+            return None
+        phases = metrics.phases
+        record = {
+            'time': datetime.datetime.now().isoformat(timespec='milliseconds'),
+            'operation': metrics.operation,
+            'sql_id': sql_id(metrics.query),
+            'sql': normalize_sql(metrics.query),
+            'seconds': round(metrics.seconds, 6),
+            'acquire_seconds': round(phases.get('acquire', 0.0), 6),
+            'execute_seconds': round(phases.get('execute', 0.0), 6),
+            'fetch_seconds': round(phases.get('fetch', 0.0) + phases.get('lob', 0.0), 6),
+            'rows': metrics.rows,
+            'parameters': parameter_fingerprint(parameters),
+            'error': metrics.error,
+            'plan': None,
+        }
+        with self.__lock:
+            self.__records.append(record)
+            sampled = (connect is not None and random.random() < self.__sample_rate
+                       and self.__pending < SLOW_QUERY_PLAN_BACKLOG)
+            if sampled:
+                self.__pending += 1
+                if self.__executor is None:
+                    self.__executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="OracleCnx-slowlog")
+        logger.warning(f"{SLOW_QUERY} {record['seconds']}s sql_id={record['sql_id']} {record['sql']}")
+        if sampled:
+            self.__executor.submit(self.__load_plan, record, connect)
+        else:
+            self.__write(record)
+        return record
+
+    def __load_plan(self, record: Dict, connect: Callable) -> None:
+        """Obtener el plan de la consulta del shared pool por su SQL_ID y escribir el registro."""
+        try:
+            with connect() as cnx:
+                with cnx.cursor() as cursor:
+                    cursor.execute(SLOW_QUERY_PLAN_SQL, {'sql_id': record['sql_id'], 'format': self.__plan_format})
+                    record['plan'] = "\n".join(row[0] or '' for row in cursor.fetchall())
+        except Exception as exc:
+            # Sin privilegios sobre V$SQL_PLAN o con la sentencia ya fuera del shared pool no hay plan.
+            logger.debug(f"{SLOW_QUERY_NO_PLAN} {record['sql_id']}: {str(exc)}")
+        finally:
+            with self.__lock:
+                self.__pending -= 1
+            self.__write(record)
+
+    def __write(self, record: Dict) -> None:
+        """Agregar un registro al archivo JSONL."""
+        if self.__path is None:
+            return
+        try:
+            with self.__file_lock:
+                with open(self.__path, 'a', encoding='utf-8') as file:
+                    file.write(json.dumps(record, default=str) + "\n")
+        except OSError as exc:
+            logger.error(str(exc), exc_info=True)
+
+    def records(self) -> List[Dict]:
+        """Obtener los registros en memoria, del más antiguo al más reciente."""
+        with self.__lock:
+            return list(self.__records)
+
+    def summary(self) -> List[Dict]:
+        """Agrupar los registros en memoria por SQL_ID, de la consulta con más tiempo total a la de menos.
+
+        Returns:
+            List[Dict]: sql_id, sql, count, total_seconds, max_seconds y last (hora del último registro).
+        """
+        groups: Dict[str, Dict] = {}
+        for record in self.records():
+            group = groups.setdefault(record['sql_id'], {'sql_id': record['sql_id'], 'sql': record['sql'],
+                                                         'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0})
+            group['count'] += 1
+            group['total_seconds'] += record['seconds']
+            group['max_seconds'] = max(group['max_seconds'], record['seconds'])
+            group['last'] = record['time']
+        return sorted(groups.values(), key=lambda group: group['total_seconds'], reverse=True)
+
+    def clear(self) -> None:
+        """Eliminar los registros en memoria."""
+        with self.__lock:
+            self.__records.clear()
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Caché de cursores preparados para sentencias registradas por nombre.
+
+@author: Jhonatan Martínez
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict
+from loguru import logger
+from OracleCnx.constants import *
+
+
+class StatementCache:
+    """ Guarda cursores ya preparados sobre una conexión fija para reutilizarlos por nombre.
+
+    Cuando se supera la capacidad se cierra el cursor usado hace más tiempo. Si cambia la conexión
+    (reconexión o conexión nueva) los cursores anteriores se descartan.
+    """
+
+    def __init__(self, capacity: int = STATEMENT_CACHE_SIZE) -> None:
+        """Constructor.
+
+        Args:
+            capacity (int, optional): Cantidad máxima de cursores preparados.
+
+        Returns:
+            None.
+        """
+        self.__capacity = capacity
+        self.__statements: Dict[str, str] = {}
+        self.__cursors: "OrderedDict[str, object]" = OrderedDict()
+        self.__connection = None
+        self.__lock = threading.Lock()
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+
+    def register(self, name: str, query: str) -> None:
+        """Registrar una sentencia para ejecutarla luego por nombre.
+
+        Args:
+            name (str): Nombre de la sentencia.
+            query (str): Texto SQL de la sentencia.
+        """
+        with self.__lock:
+            if self.__statements.get(name) != query:
+                self.__statements[name] = query
+                self.__close_cursor(name)
+
+    def query(self, name: str) -> str:
+        """Obtener el texto SQL de una sentencia registrada.
+
+        Args:
+            name (str): Nombre de la sentencia.
+
+        Returns:
+            str: Texto SQL.
+        """
+        if name not in self.__statements:
+            raise KeyError(f"{UNKNOWN_STATEMENT} {name}")
+        return self.__statements[name]
+
+    def cursor(self, cnx, name: str):
+        """Obtener el cursor preparado de una sentencia registrada, preparándolo si no existe.
+
+        Args:
+            cnx: Conexión sobre la que se ejecuta la sentencia.
+            name (str): Nombre de la sentencia.
+
+        Returns:
+            cx_Oracle.Cursor: Cursor preparado.
+        """
+        query = self.query(name)
+        with self.__lock:
+            if cnx is not self.__connection:
+                self.__clear()
+                self.__connection = cnx
+            cursor = self.__cursors.get(name)
+            if cursor is not None:
+                self.__hits += 1
+                self.__cursors.move_to_end(name)
+                return cursor
+            self.__misses += 1
+            cursor = cnx.cursor()
+            cursor.prepare(query)
+            self.__cursors[name] = cursor
+            while len(self.__cursors) > self.__capacity:
+                evicted, _ = self.__cursors.popitem(last=False)
+                self.__close_cursor(evicted, _)
+                self.__evictions += 1
+            return cursor
+
+    def discard(self, name: str) -> None:
+        """Descartar el cursor de una sentencia, por ejemplo después de un error.
+
+        Args:
+            name (str): Nombre de la sentencia.
+        """
+        with self.__lock:
+            self.__close_cursor(name)
+
+    def clear(self) -> None:
+        """Cerrar todos los cursores preparados."""
+        with self.__lock:
+            self.__clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Obtener las estadísticas del caché.
+
+        Returns:
+            Dict[str, int]: hits, misses, evictions, size y capacity.
+        """
+        with self.__lock:
+            return {
+                'hits': self.__hits,
+                'misses': self.__misses,
+                'evictions': self.__evictions,
+                'size': len(self.__cursors),
+                'capacity': self.__capacity,
+            }
+
+    def __clear(self) -> None:
+        for name in list(self.__cursors):
+            self.__close_cursor(name)
+        self.__connection = None
+
+    def __close_cursor(self, name: str, cursor=None) -> None:
+        cursor = cursor or self.__cursors.pop(name, None)
+        if cursor is None:
+            return
+        try:
+            cursor.close()
+        except Exception as exc:
+            logger.debug(str(exc))
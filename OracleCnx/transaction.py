@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+Transacciones: varias sentencias en una misma sesión y cursor con un solo commit al final.
+
+@author: Jhonatan Martínez
+"""
+
+import re
+from concurrent.futures import Executor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+from loguru import logger
+from OracleCnx.constants import *
+from OracleCnx.driver import oracle
+from OracleCnx.binds import bind_statement
+from OracleCnx.cache import ResultCache
+from OracleCnx.metrics import QueryMetrics, timed
+from OracleCnx.utils import is_disconnect_error
+
+_SAVEPOINT_NAME = re.compile(r"[A-Za-z][A-Za-z0-9_$#]{0,127}")
+
+
+@contextmanager
+def commit_on_success(cnx, enabled: bool) -> Iterator:
+    """Activar autocommit mientras dura el bloque, para que el commit viaje con la sentencia y no
+    necesite un viaje aparte a la base de datos.
+
+    Args:
+        cnx: Conexión a la base de datos.
+        enabled (bool): False para no cambiar la conexión.
+    """
+    if not enabled:
+        yield
+        return
+    cnx.autocommit = True
+    try:
+        yield
+    finally:
+        cnx.autocommit = False
+
+
+class Transaction:
+    """ Unidad de trabajo sobre una conexión: las sentencias comparten un cursor y se confirman juntas
+    con un solo commit al terminar el bloque, o se deshacen todas si hay un error.
+
+    Los métodos lanzan los errores de cx_Oracle para que el bloque termine con rollback.
+    """
+
+    def __init__(self, cnx, reader: Callable, cache: Optional[ResultCache] = None,
+                 metrics: Optional[QueryMetrics] = None) -> None:
+        """Constructor.
+
+        Args:
+            cnx: Conexión a la base de datos, sin autocommit.
+            reader (Callable): Función (cursor, query, parameters, datatype, fetch_profile, metrics=...,
+                rowfactory=...) que ejecuta una consulta y obtiene los datos con la forma solicitada.
+            cache (ResultCache, optional): Caché de resultados que se invalida después del commit.
+            metrics (QueryMetrics, optional): Métricas de la transacción.
+        """
+        self.__cnx = cnx
+        self.__cursor = cnx.cursor()
+        self.__reader = reader
+        self.__cache = cache
+        self.__metrics = metrics
+        self.__written: List[str] = []
+        self.statements: int = 0
+
+    def __enter__(self) -> "Transaction":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.end(exc_value)
+
+    def execute(self, query: str, parameters: Dict = {}) -> int:
+        """Ejecutar una sentencia dentro de la transacción.
+
+        Args:
+            query (str): Sentencia a ejecutar.
+            parameters (Dict, optional): Parámetros de la sentencia; las listas se enlazan como colecciones.
+
+        Returns:
+            int: Filas afectadas.
+        """
+        with timed(self.__metrics, 'execute'):
+            self.__cursor.execute(query, bind_statement(self.__cnx, query, parameters))
+            return self.__record(query)
+
+    def execute_many(self, query: str, values: List) -> int:
+        """Ejecutar una sentencia con varios valores dentro de la transacción.
+
+        Args:
+            query (str): Sentencia a ejecutar.
+            values (List): Valores de la sentencia.
+
+        Returns:
+            int: Filas afectadas.
+        """
+        with timed(self.__metrics, 'execute'):
+            self.__cursor.executemany(query, values)
+        return self.__record(query)
+
+    def read(self, query: str, parameters: Dict = {}, datatype: str = "dict",
+             fetch_profile: Optional[str] = None, rowfactory: Optional[Callable] = None) -> [Dict, List]:
+        """Obtener los datos de una consulta dentro de la transacción; ve los cambios aún sin confirmar.
+
+        Args:
+            query (str): Consulta a ejecutar.
+            parameters (Dict, optional): Parámetros de la consulta.
+            datatype (str, optional): Tipo de datos a retornar: 'dict', 'list', 'tuple', 'namedtuple',
+                'columnar', 'numpy' o 'pandas'.
+            fetch_profile (str, optional): 'lookup', 'bulk' o 'auto'; por defecto el de la instancia.
+            rowfactory (Callable, optional): Función que construye cada fila a partir de sus valores.
+
+        Returns:
+            Datos obtenidos.
+        """
+        datatype = datatype.lower()
+        if datatype not in DATATYPES:
+            raise ValueError(f"{INVALID_DATATYPE}: {datatype}")
+        self.statements += 1
+        return self.__reader(self.__cursor, query, parameters, datatype, fetch_profile, metrics=self.__metrics,
+                             rowfactory=rowfactory)
+
+    def savepoint(self, name: str) -> None:
+        """Crear un punto de guardado para deshacer solo lo ejecutado después de él.
+
+        Args:
+            name (str): Nombre del punto de guardado.
+        """
+        self.__cursor.execute(f"savepoint {self.__savepoint_name(name)}")
+
+    def rollback_to(self, name: str) -> None:
+        """Deshacer lo ejecutado después de un punto de guardado; la transacción sigue abierta.
+
+        Args:
+            name (str): Nombre del punto de guardado.
+        """
+        self.__cursor.execute(f"rollback to savepoint {self.__savepoint_name(name)}")
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        """Terminar la transacción: commit si no hubo error, rollback en caso contrario, y cerrar el cursor.
+
+        Args:
+            error (BaseException, optional): Error con el que terminó el bloque.
+        """
+        try:
+            if error is None:
+                with timed(self.__metrics, 'commit'):
+                    self.__cnx.commit()
+                if self.__cache is not None:
+                    for query in dict.fromkeys(self.__written):
+                        self.__cache.invalidate_query(query)
+                logger.info(f"{TRANSACTION_COMMITTED} {self.statements}")
+            else:
+                if self.__metrics is not None:
+                    self.__metrics.error = str(error)
+                logger.error(f"{TRANSACTION_ROLLED_BACK} {str(error)}")
+                if not (isinstance(error, oracle.DatabaseError) and is_disconnect_error(error)):
+                    try:
+                        with timed(self.__metrics, 'rollback'):
+                            self.__cnx.rollback()
+                    except (oracle.DatabaseError, Exception) as exc:
+                        # El error original es el que se propaga.
+                        logger.error(str(exc), exc_info=True)
+        finally:
+            try:
+                self.__cursor.close()
+            except (oracle.DatabaseError, Exception):
+                pass
+
+    def __record(self, query: str) -> int:
+        """Contar una sentencia ejecutada y registrarla para invalidar el caché después del commit."""
+        self.statements += 1
+        self.__written.append(query)
+        if self.__metrics is not None:
+            self.__metrics.record_execute(self.__cursor)
+        return max(self.__cursor.rowcount or 0, 0)
+
+    @staticmethod
+    def __savepoint_name(name: str) -> str:
+        """Validar el nombre de un punto de guardado, que no admite parámetros y va en el texto SQL."""
+        if not _SAVEPOINT_NAME.fullmatch(name):
+            raise ValueError(f"{INVALID_SAVEPOINT} {name}")
+        return name
+
+
+class AsyncTransaction:
+    """ Versión asíncrona de Transaction: cada sentencia se ejecuta en el executor de AsyncDB sobre la
+    sesión tomada al abrir la transacción."""
+
+    def __init__(self, transaction: Transaction, executor: Executor) -> None:
+        self.__transaction = transaction
+        self.__executor = executor
+
+    @property
+    def statements(self) -> int:
+        """Sentencias ejecutadas en la transacción."""
+        return self.__transaction.statements
+
+    async def __call(self, method: Callable, *args):
+        import asyncio
+
+        return await asyncio.get_running_loop().run_in_executor(self.__executor, method, *args)
+
+    async def execute(self, query: str, parameters: Optional[Dict] = None) -> int:
+        """Ejecutar una sentencia dentro de la transacción (ver Transaction.execute)."""
+        return await self.__call(self.__transaction.execute, query, parameters or {})
+
+    async def execute_many(self, query: str, values: List) -> int:
+        """Ejecutar una sentencia con varios valores dentro de la transacción (ver Transaction.execute_many)."""
+        return await self.__call(self.__transaction.execute_many, query, values)
+
+    async def read(self, query: str, parameters: Optional[Dict] = None, datatype: str = "dict",
+                   fetch_profile: Optional[str] = None, rowfactory: Optional[Callable] = None) -> [Dict, List]:
+        """Obtener los datos de una consulta dentro de la transacción (ver Transaction.read)."""
+        return await self.__call(self.__transaction.read, query, parameters or {}, datatype, fetch_profile,
+                                 rowfactory)
+
+    async def savepoint(self, name: str) -> None:
+        """Crear un punto de guardado (ver Transaction.savepoint)."""
+        await self.__call(self.__transaction.savepoint, name)
+
+    async def rollback_to(self, name: str) -> None:
+        """Deshacer lo ejecutado después de un punto de guardado (ver Transaction.rollback_to)."""
+        await self.__call(self.__transaction.rollback_to, name)
+
+    async def end(self, error: Optional[BaseException] = None) -> None:
+        """Terminar la transacción con commit o rollback (ver Transaction.end)."""
+        await self.__call(self.__transaction.end, error)
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Ajuste de arraysize y prefetchrows según el tipo de consulta y el tamaño de las filas.
+
+El tamaño de una fila solo se conoce después del execute, pero arraysize se debe fijar antes. Por eso
+el ancho de fila de cada consulta se recuerda en un caché acotado y se usa en las siguientes ejecuciones.
+
+@author: Jhonatan Martínez
+"""
+
+import threading
+from collections import OrderedDict
+from OracleCnx.constants import *
+from OracleCnx.utils import find_lob_columns
+
+_row_widths: "OrderedDict[str, int]" = OrderedDict()
+_row_widths_lock = threading.Lock()
+
+
+def row_width(column_descriptions) -> int:
+    """Estimar el tamaño en bytes de una fila a partir de cursor.description.
+
+    Args:
+        column_descriptions: Descripción de las columnas (cursor.description).
+
+    Returns:
+        int: Bytes estimados por fila.
+    """
+    lob_columns = set(find_lob_columns(column_descriptions))
+    width = 0
+    for index, column in enumerate(column_descriptions):
+        # column_name, type_code, display_size, internal_size, precision, scale, null_ok = column
+        if index in lob_columns:
+            width += LOB_COLUMN_SIZE
+        else:
+            width += max(column[3] or 0, MIN_COLUMN_SIZE)
+    return width
+
+
+def learn_row_width(query: str, column_descriptions) -> None:
+    """Recordar el ancho de fila de una consulta para ajustar sus próximas ejecuciones.
+
+    Args:
+        query (str): Consulta ejecutada.
+        column_descriptions: Descripción de las columnas (cursor.description).
+    """
+    if not column_descriptions:
+        return
+    width = row_width(column_descriptions)
+    with _row_widths_lock:
+        _row_widths[query] = width
+        _row_widths.move_to_end(query)
+        while len(_row_widths) > ROW_WIDTH_CACHE_SIZE:
+            _row_widths.popitem(last=False)
+
+
+def budget_arraysize(query: str, memory_budget: int, default: int) -> int:
+    """Calcular arraysize para que un bloque de filas no supere el presupuesto de memoria.
+
+    Args:
+        query (str): Consulta a ejecutar.
+        memory_budget (int): Bytes máximos por bloque de filas.
+        default (int): Valor a usar si todavía no se conoce el ancho de fila.
+
+    Returns:
+        int: Filas por viaje a la base de datos.
+    """
+    with _row_widths_lock:
+        width = _row_widths.get(query)
+    if width is None:
+        return default
+    return max(1, min(memory_budget // width, MAX_ARRAYSIZE))
+
+
+def tune_cursor(cursor, query: str, fetch_profile: str, memory_budget: int = FETCH_MEMORY_BUDGET) -> None:
+    """Configurar arraysize y prefetchrows de un cursor antes del execute.
+
+    Args:
+        cursor: Cursor a configurar.
+        query (str): Consulta a ejecutar.
+        fetch_profile (str): 'lookup' para consultas de pocas filas, 'bulk' para extracciones grandes
+            o 'auto' para que las consultas pequeñas terminen en un solo viaje y las grandes usen
+            bloques calculados con el presupuesto de memoria.
+        memory_budget (int, optional): Bytes máximos por bloque de filas.
+    """
+    if fetch_profile == 'lookup':
+        # Con prefetchrows = arraysize + 1 el execute trae las filas y detecta el fin en un viaje.
+        cursor.arraysize = LOOKUP_ROWS
+        cursor.prefetchrows = LOOKUP_ROWS + 1
+    elif fetch_profile == 'bulk':
+        cursor.arraysize = budget_arraysize(query, memory_budget, BULK_ARRAYSIZE)
+        cursor.prefetchrows = cursor.arraysize
+    else:
+        cursor.arraysize = budget_arraysize(query, memory_budget, AUTO_ARRAYSIZE)
+        cursor.prefetchrows = LOOKUP_ROWS + 1
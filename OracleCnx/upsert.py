@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""
+Upsert masivo: cada bloque de filas se inserta con executemany en una tabla temporal global (privada de
+cada sesión) y se aplica a la tabla destino con un solo MERGE basado en conjuntos.
+
+@author: Jhonatan Martínez
+"""
+
+import hashlib
+import re
+import threading
+import time
+from itertools import chain, islice
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from loguru import logger
+from OracleCnx.constants import *
+from OracleCnx.bulk import set_input_sizes
+from OracleCnx.driver import oracle
+
+_TABLE_NAME = re.compile(r"[A-Za-z][A-Za-z0-9_$#]{0,127}(\.[A-Za-z][A-Za-z0-9_$#]{0,127})?")
+_COLUMN_NAME = re.compile(r"[A-Za-z][A-Za-z0-9_$#]{0,127}")
+
+# Tablas de staging ya verificadas en el proceso, por usuario, base de datos y nombre.
+_staging_tables = set()
+_staging_lock = threading.Lock()
+
+
+class UpsertResult:
+    """ Resultado de un upsert masivo."""
+
+    def __init__(self) -> None:
+        self.inserted: int = 0
+        self.updated: int = 0
+        self.batches: List[Dict] = []
+        self.seconds: float = 0.0
+        self.error: Optional[str] = None
+
+    @property
+    def rows(self) -> int:
+        """Cantidad de filas insertadas o actualizadas."""
+        return self.inserted + self.updated
+
+    @property
+    def ok(self) -> bool:
+        """True si el upsert terminó sin errores."""
+        return self.error is None
+
+    def merge(self, other: 'UpsertResult') -> None:
+        """Sumar el resultado de otra sesión del mismo upsert."""
+        self.inserted += other.inserted
+        self.updated += other.updated
+        self.batches.extend(other.batches)
+        self.batches.sort(key=lambda batch: batch['batch'])
+        # El error de la sesión que falló tiene prioridad sobre el aviso de las sesiones que se detuvieron.
+        if self.error is None or (self.error == UPSERT_ABORTED and other.error is not None):
+            self.error = other.error
+
+    def __repr__(self) -> str:
+        return (f"UpsertResult(inserted={self.inserted}, updated={self.updated}, batches={len(self.batches)}, "
+                f"seconds={self.seconds:.3f}, error={self.error!r})")
+
+
+class UpsertPlan:
+    """ Sentencias de un upsert: creación de la tabla de staging, carga, conteo de filas existentes, MERGE y
+    limpieza. Los nombres de tabla y columnas van en el texto SQL, así que se validan como identificadores.
+    """
+
+    def __init__(self, table: str, columns: Sequence[str], key_columns: Sequence[str]) -> None:
+        """Constructor.
+
+        Args:
+            table (str): Tabla destino, opcionalmente con esquema (esquema.tabla).
+            columns (Sequence[str]): Columnas de las filas, en el orden de sus valores.
+            key_columns (Sequence[str]): Columnas que identifican una fila en la tabla destino.
+        """
+        if not _TABLE_NAME.fullmatch(table or ''):
+            raise ValueError(f"{INVALID_IDENTIFIER} {table}")
+        for column in list(columns) + list(key_columns):
+            if not isinstance(column, str) or not _COLUMN_NAME.fullmatch(column):
+                raise ValueError(f"{INVALID_IDENTIFIER} {column}")
+        upper = [column.upper() for column in columns]
+        if not key_columns or any(key.upper() not in upper for key in key_columns):
+            raise ValueError(f"{INVALID_UPSERT_KEYS} {list(key_columns)}")
+        self.table: str = table
+        self.columns: List[str] = list(columns)
+        self.key_columns: List[str] = list(key_columns)
+        self.key_positions: List[int] = [upper.index(key.upper()) for key in key_columns]
+        keys = {key.upper() for key in key_columns}
+        updates = [column for column in self.columns if column.upper() not in keys]
+        self.updates: bool = bool(updates)
+        # Un nombre por tabla y columnas: cambiar las columnas del upsert crea otra tabla de staging.
+        digest = hashlib.sha1(f"{table.upper()}({','.join(upper)})".encode('utf-8')).hexdigest()
+        self.staging: str = f"{UPSERT_STAGING_PREFIX}{digest[:16].upper()}"
+        names = ", ".join(self.columns)
+        on = " and ".join(f"t.{key} = s.{key}" for key in self.key_columns)
+        self.create_sql: str = (f"create global temporary table {self.staging} on commit delete rows "
+                                f"as select {names} from {table} where 1 = 0")
+        self.insert_sql: str = (f"insert into {self.staging} ({names}) "
+                                f"values ({', '.join(f':{number}' for number in range(1, len(self.columns) + 1))})")
+        self.count_sql: str = f"select count(*) from {self.staging} s where exists (select 1 from {table} t where {on})"
+        matched = (f" when matched then update set {', '.join(f't.{column} = s.{column}' for column in updates)}"
+                   if updates else "")
+        self.merge_sql: str = (f"merge into {table} t using {self.staging} s on ({on}){matched}"
+                               f" when not matched then insert ({names})"
+                               f" values ({', '.join(f's.{column}' for column in self.columns)})")
+        self.clear_sql: str = f"delete from {self.staging}"
+
+    def row_values(self, row) -> Tuple:
+        """Valores de una fila en el orden de las columnas del plan."""
+        if isinstance(row, dict):
+            return tuple(row.get(column) for column in self.columns)
+        return tuple(row)
+
+    def __repr__(self) -> str:
+        return f"UpsertPlan(table={self.table!r}, staging={self.staging!r}, keys={self.key_columns!r})"
+
+
+def plan_upsert(table: str, rows: Iterable, key_columns: Sequence[str],
+                columns: Optional[Sequence[str]] = None) -> Tuple[Optional[UpsertPlan], Iterator]:
+    """Crear el plan de un upsert; sin columns se toman de las keys de la primera fila (diccionario).
+
+    Args:
+        table (str): Tabla destino.
+        rows (Iterable): Filas (diccionarios o tuplas); puede ser un generador.
+        key_columns (Sequence[str]): Columnas que identifican una fila.
+        columns (Sequence[str], optional): Columnas de las filas; obligatorio si las filas son tuplas.
+
+    Returns:
+        Tuple[UpsertPlan, Iterator]: Plan y un iterador con todas las filas, incluida la primera; el plan
+            es None si no hay filas.
+    """
+    iterator = iter(rows)
+    first = next(iterator, None)
+    if first is None:
+        return None, iterator
+    if columns is None:
+        if not isinstance(first, dict):
+            raise ValueError(UPSERT_COLUMNS_REQUIRED)
+        columns = list(first)
+    return UpsertPlan(table, columns, key_columns), chain([first], iterator)
+
+
+class BatchSource:
+    """ Bloques de un upsert, compartidos entre las sesiones que los aplican.
+
+    Con varias particiones las filas se reparten por hash de la key: una key siempre la aplica la misma
+    sesión y en el orden de entrada, así dos sesiones no insertan la misma key a la vez (ORA-00001 u
+    ORA-00060) y la última fila de cada key es la que queda.
+
+    Las filas repetidas por key dentro de un bloque se reducen a la última, porque MERGE no admite dos
+    filas de origen para la misma fila destino (ORA-30926).
+    """
+
+    def __init__(self, plan: UpsertPlan, rows: Iterator, batch_size: int, partitions: int = 1) -> None:
+        self.__plan = plan
+        self.__rows = rows
+        self.__batch_size = max(batch_size, 1)
+        self.__partitions = max(partitions, 1)
+        # Filas ya leídas de cada partición que aún no forman un bloque.
+        self.__pending: List[List[Tuple]] = [[] for _ in range(self.__partitions)]
+        self.__exhausted = False
+        self.__number = 0
+        self.__lock = threading.Lock()
+        self.failed = threading.Event()
+
+    def next(self, partition: int = 0) -> Optional[Tuple[int, List[Tuple]]]:
+        """Tomar el siguiente bloque de una partición.
+
+        Args:
+            partition (int, optional): Partición de la sesión que pide el bloque.
+
+        Returns:
+            Tuple[int, List[Tuple]]: Número del bloque y sus filas, o None si no quedan filas o otra sesión falló.
+        """
+        positions = self.__plan.key_positions
+        with self.__lock:
+            if self.failed.is_set():
+                return None
+            if self.__partitions == 1:
+                batch = [self.__plan.row_values(row) for row in islice(self.__rows, self.__batch_size)]
+            else:
+                pending = self.__pending[partition]
+                while len(pending) < self.__batch_size and not self.__exhausted:
+                    rows = list(islice(self.__rows, self.__batch_size))
+                    self.__exhausted = len(rows) < self.__batch_size
+                    for row in rows:
+                        values = self.__plan.row_values(row)
+                        key = tuple(values[position] for position in positions)
+                        self.__pending[hash(key) % self.__partitions].append(values)
+                batch = pending[:self.__batch_size]
+                del pending[:self.__batch_size]
+            if not batch:
+                return None
+            number = self.__number
+            self.__number += 1
+        unique: Dict[Tuple, Tuple] = {}
+        for values in batch:
+            unique[tuple(values[position] for position in positions)] = values
+        return number, list(unique.values())
+
+
+def ensure_staging(cnx, plan: UpsertPlan) -> None:
+    """Crear la tabla temporal global de staging si no existe.
+
+    La verificación se hace una vez por proceso; el CREATE es DDL (hace commit), así que se ejecuta antes
+    de cualquier DML del upsert.
+
+    Args:
+        cnx: Conexión a la base de datos.
+        plan (UpsertPlan): Plan del upsert.
+    """
+    key = (getattr(cnx, 'username', None), getattr(cnx, 'dsn', None), plan.staging)
+    with _staging_lock:
+        if key in _staging_tables:
+            return
+    with cnx.cursor() as cursor:
+        cursor.execute(UPSERT_STAGING_EXISTS, {'name': plan.staging})
+        if cursor.fetchone() is None:
+            try:
+                cursor.execute(plan.create_sql)
+                logger.info(f"{UPSERT_STAGING_CREATED} {plan.staging} ({plan.table})")
+            except oracle.DatabaseError as exc:
+                # Otra sesión la creó entre la verificación y el CREATE.
+                if 'ORA-00955' not in str(exc):
+                    raise
+    with _staging_lock:
+        _staging_tables.add(key)
+
+
+def upsert_batches(cnx, plan: UpsertPlan, source: BatchSource, commit_every: int = 0,
+                   partition: int = 0) -> UpsertResult:
+    """Aplicar bloques de un upsert en una sesión hasta que no queden bloques.
+
+    Cada bloque se inserta en la tabla de staging, se cuentan las filas que ya existen en la tabla destino
+    (las que el MERGE actualiza) y se ejecuta el MERGE. Si la sesión falla, las demás dejan de tomar
+    bloques y revierten lo que no confirmaron.
+
+    Args:
+        cnx: Conexión a la base de datos.
+        plan (UpsertPlan): Plan del upsert.
+        source (BatchSource): Bloques a aplicar.
+        commit_every (int, optional): Hacer commit cada vez que se apliquen al menos esta cantidad de filas;
+            0 para hacer un solo commit al final.
+        partition (int, optional): Partición de source que aplica esta sesión.
+
+    Returns:
+        UpsertResult: Filas insertadas y actualizadas y tiempos por bloque de esta sesión.
+    """
+    result = UpsertResult()
+    start = time.perf_counter()
+    pending_inserted = pending_updated = 0
+    try:
+        ensure_staging(cnx, plan)
+        with cnx.cursor() as loader, cnx.cursor() as cursor:
+            loader.prepare(plan.insert_sql)
+            first = True
+            while True:
+                item = source.next(partition)
+                if item is None:
+                    break
+                number, batch = item
+                if first:
+                    set_input_sizes(loader, batch)
+                    first = False
+                batch_start = time.perf_counter()
+                loader.executemany(None, batch)
+                load_seconds = time.perf_counter() - batch_start
+                updated = 0
+                if plan.updates:
+                    cursor.execute(plan.count_sql)
+                    updated = cursor.fetchone()[0]
+                cursor.execute(plan.merge_sql)
+                inserted = cursor.rowcount - updated
+                pending_inserted += inserted
+                pending_updated += updated
+                if commit_every and pending_inserted + pending_updated >= commit_every:
+                    # El commit vacía la tabla de staging (on commit delete rows).
+                    cnx.commit()
+                    result.inserted += pending_inserted
+                    result.updated += pending_updated
+                    pending_inserted = pending_updated = 0
+                else:
+                    cursor.execute(plan.clear_sql)
+                result.batches.append({
+                    'batch': number,
+                    'rows': len(batch),
+                    'inserted': inserted,
+                    'updated': updated,
+                    'load_seconds': load_seconds,
+                    'seconds': time.perf_counter() - batch_start,
+                })
+        if source.failed.is_set():
+            raise RuntimeError(UPSERT_ABORTED)
+        cnx.commit()
+        result.inserted += pending_inserted
+        result.updated += pending_updated
+    except (oracle.DatabaseError, Exception) as exc:
+        # Lo ya confirmado con commit_every se conserva; lo pendiente se revierte.
+        source.failed.set()
+        result.error = str(exc)
+        logger.error(f"Error in upsert {plan.table}: {str(exc)}", exc_info=True)
+        try:
+            cnx.rollback()
+        except (oracle.DatabaseError, Exception) as rollback_exc:
+            logger.error(str(rollback_exc), exc_info=True)
+    result.seconds = time.perf_counter() - start
+    return result
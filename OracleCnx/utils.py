@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""
+Funciones compartidas por ConnectionDB, PoolDB y AsyncDB para leer y dar forma a los resultados.
+
+@author: Jhonatan Martínez
+"""
+
+import re
+from collections import namedtuple
+from functools import lru_cache
+from typing import Callable, Iterator, List, Optional, Tuple
+from OracleCnx.constants import LOB_CHUNK_SIZE, RECORD_CLASS_CACHE_SIZE
+from OracleCnx.driver import oracle
+from OracleCnx.metrics import QueryMetrics, timed
+
+
+# Errores que indican que la sesión o la red se perdieron y la conexión debe recrearse.
+DISCONNECT_ERRORS = re.compile(r"ORA-(00028|01012|02396|03113|03114|03135|12153|12537|12547|12570)|DPI-(1010|1080)|DPY-(1001|4011)")
+
+
+def find_lob_columns(column_descriptions) -> List:
+    """Iterar sobre las descripciones de las columnas y obtener las columnas Lobs.
+
+    Args:
+        column_descriptions: Descripción de las columnas (cursor.description).
+
+    Returns:
+        List: Lista con los índices de las columnas Lobs.
+    """
+    lob_columns = []
+    for index, column in enumerate(column_descriptions):
+        # column_name, type_code, display_size, internal_size, precision, scale, null_ok = column
+        type_code: int = column[1]
+        # Tipos Lob que se pueden leer en línea como LONG / LONG RAW.
+        if type_code in (oracle.DB_TYPE_CLOB, oracle.DB_TYPE_NCLOB, oracle.DB_TYPE_BLOB):
+            lob_columns.append(index)
+    return lob_columns
+
+
+def lob_output_type_handler(cursor, name, default_type, size, precision, scale):
+    """Output type handler que obtiene los CLOB/NCLOB como str y los BLOB como bytes en el mismo
+    viaje del fetch, en lugar de un localizador que requiere un viaje adicional por valor.
+
+    Returns:
+        Variable del cursor para la columna, o None para usar el tipo por defecto.
+    """
+    if default_type in (oracle.DB_TYPE_CLOB, oracle.DB_TYPE_NCLOB):
+        return cursor.var(oracle.DB_TYPE_LONG, arraysize=cursor.arraysize)
+    if default_type == oracle.DB_TYPE_BLOB:
+        return cursor.var(oracle.DB_TYPE_LONG_RAW, arraysize=cursor.arraysize)
+    return None
+
+
+def stream_lob_columns(cursor) -> List:
+    """Obtener las columnas Lobs que llegan como localizadores y hay que leer después del fetch.
+
+    Con lob_fetch 'inline' los valores ya llegan como str/bytes, así que no hay columnas que leer y el
+    driver puede aplicar el rowfactory directamente.
+
+    Args:
+        cursor: Cursor con la consulta ejecutada.
+
+    Returns:
+        List: Índices de las columnas Lobs por leer.
+    """
+    if getattr(cursor, 'outputtypehandler', None) is lob_output_type_handler:
+        return []
+    return find_lob_columns(cursor.description)
+
+
+def set_lob_fetch(cursor, lob_fetch: str) -> None:
+    """Configurar cómo se obtienen las columnas Lobs de un cursor antes de ejecutarlo.
+
+    Args:
+        cursor: Cursor a configurar.
+        lob_fetch (str): 'inline' para obtener los Lobs como str/bytes en el fetch (hasta 1 GB por valor),
+            'stream' para obtener localizadores y leerlos por partes de LOB_CHUNK_SIZE.
+    """
+    if lob_fetch == 'inline':
+        cursor.outputtypehandler = lob_output_type_handler
+
+
+def read_lob(lob, chunk_size: int = LOB_CHUNK_SIZE):
+    """Leer un Lob por partes para no reservar un solo buffer del tamaño del valor completo.
+
+    Args:
+        lob: Localizador del Lob.
+        chunk_size (int, optional): Cantidad de caracteres o bytes por lectura.
+
+    Returns:
+        str o bytes: Contenido del Lob.
+    """
+    parts = []
+    offset = 1
+    while True:
+        part = lob.read(offset, chunk_size)
+        if not part:
+            break
+        parts.append(part)
+        offset += len(part)
+    if lob.type == oracle.DB_TYPE_BLOB:
+        return b"".join(parts)
+    return "".join(parts)
+
+
+def get_columns(column_descriptions) -> List[str]:
+    """Obtener los nombres de las columnas en mayúscula.
+
+    Args:
+        column_descriptions: Descripción de las columnas (cursor.description).
+
+    Returns:
+        List[str]: Nombres de las columnas.
+    """
+    return [column[0].upper() for column in column_descriptions]
+
+
+def read_lob_columns(rows: List, lob_columns: List, factory: Optional[Callable] = None) -> List:
+    """Leer el contenido de las columnas Lobs de un bloque de filas.
+
+    Args:
+        rows (List): Filas obtenidas del cursor.
+        lob_columns (List): Índices de las columnas Lobs.
+        factory (Callable, optional): Función que recibe los valores de la fila y construye la fila final;
+            por defecto una tupla.
+
+    Returns:
+        List: Filas con el contenido de los Lobs leído.
+    """
+    data = []
+    for row in rows:
+        new_row = list(row)
+        for i in lob_columns:
+            # Los valores obtenidos en línea ya son str/bytes.
+            if new_row[i] is not None and not isinstance(new_row[i], (str, bytes)):
+                new_row[i] = read_lob(new_row[i])
+        data.append(factory(*new_row) if factory is not None else tuple(new_row))
+    return data
+
+
+def fetch_all(cursor, metrics: Optional[QueryMetrics] = None, factory: Optional[Callable] = None) -> List:
+    """Obtener todas las filas de un cursor ya ejecutado, leyendo las columnas Lobs.
+
+    Args:
+        cursor: Cursor con la consulta ejecutada.
+        metrics (QueryMetrics, optional): Métricas donde se registran las fases 'fetch' y 'lob'.
+        factory (Callable, optional): Función que construye cada fila (ver row_factory); el driver la
+            aplica durante el fetch, o al leer los Lobs si la consulta tiene Lobs como localizadores.
+
+    Returns:
+        List: Filas obtenidas.
+    """
+    lob_columns = stream_lob_columns(cursor)
+    # Se asigna también cuando es None, porque los cursores preparados se reutilizan entre consultas.
+    cursor.rowfactory = None if lob_columns else factory
+    with timed(metrics, 'fetch'):
+        rows = cursor.fetchall()
+    if lob_columns:
+        with timed(metrics, 'lob'):
+            rows = read_lob_columns(rows, lob_columns, factory)
+    if metrics is not None:
+        metrics.record_fetch(cursor, len(rows))
+    return rows
+
+
+def fetch_batches(cursor, batch_size: int, factory: Optional[Callable] = None) -> Iterator[List]:
+    """Obtener las filas de un cursor ya ejecutado en bloques usando fetchmany.
+
+    Args:
+        cursor: Cursor con la consulta ejecutada.
+        batch_size (int): Cantidad de filas por bloque.
+        factory (Callable, optional): Función que construye cada fila (ver row_factory).
+
+    Yields:
+        List: Bloque de filas.
+    """
+    lob_columns = stream_lob_columns(cursor)
+    cursor.rowfactory = None if lob_columns else factory
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        if lob_columns:
+            rows = read_lob_columns(rows, lob_columns, factory)
+        yield rows
+
+
+@lru_cache(maxsize=RECORD_CLASS_CACHE_SIZE)
+def record_class(columns: Tuple[str, ...]) -> type:
+    """Clase namedtuple de las filas de una consulta, creada una sola vez por cada lista de columnas.
+
+    Las filas son tuplas sin __dict__, así que ocupan lo mismo que una tupla y se leen por nombre
+    (row.ID) o por posición. Los nombres que no son identificadores válidos (por ejemplo COUNT(*)) se
+    renombran por su posición (_0, _1, ...).
+
+    Args:
+        columns (Tuple[str, ...]): Nombres de las columnas.
+
+    Returns:
+        type: Clase de las filas.
+    """
+    return namedtuple('Row', columns, rename=True)
+
+
+def row_factory(columns: List[str], datatype: str, rowfactory: Optional[Callable] = None) -> Optional[Callable]:
+    """Obtener la función que construye cada fila a partir de sus valores.
+
+    Args:
+        columns (List[str]): Nombres de las columnas.
+        datatype (str): 'dict', 'list', 'tuple' o 'namedtuple'.
+        rowfactory (Callable, optional): Función propia que recibe los valores de la fila como argumentos;
+            tiene prioridad sobre el datatype.
+
+    Returns:
+        Callable: Función de la fila, o None para dejar las tuplas del driver.
+    """
+    if rowfactory is not None:
+        return rowfactory
+    if datatype == 'dict':
+        return lambda *values: dict(zip(columns, values))
+    if datatype == 'namedtuple':
+        return record_class(tuple(columns))
+    return None
+
+
+def shape_rows(rows: List, columns: List[str], datatype: str) -> List:
+    """Dar forma a un bloque de filas según el tipo de datos solicitado.
+
+    Args:
+        rows (List): Filas obtenidas del cursor.
+        columns (List[str]): Nombres de las columnas.
+        datatype (str): 'dict' para diccionarios, 'namedtuple' para registros, 'list' o 'tuple' para tuplas.
+
+    Returns:
+        List: Filas con la forma solicitada.
+    """
+    factory = row_factory(columns, datatype)
+    if factory is None:
+        return rows
+    return [factory(*item) for item in rows]
+
+
+def is_disconnect_error(exc: Exception) -> bool:
+    """Validar si una excepción corresponde a una conexión perdida.
+
+    Args:
+        exc (Exception): Excepción lanzada por el driver.
+
+    Returns:
+        bool: True si la conexión debe recrearse, False en caso contrario.
+    """
+    return DISCONNECT_ERRORS.search(str(exc)) is not None
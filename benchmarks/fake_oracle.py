@@ -0,0 +1,618 @@
+# -*- coding: utf-8 -*-
+"""
+Driver cx_Oracle falso en memoria para medir la librería sin una base de datos.
+
+Imita connect, SessionPool, cursores (description, arraysize, prefetchrows, fetchmany/fetchall,
+outputtypehandler, executemany con batcherrors, REF CURSORs y resultados implícitos), Lobs y una
+latencia configurable por viaje a la base de datos. Se instala como el módulo cx_Oracle antes de importar
+OracleCnx:
+
+    from benchmarks import fake_oracle
+    fake_oracle.install()
+    from OracleCnx.oracle_pool import PoolDB
+
+@author: Jhonatan Martínez
+"""
+
+import datetime
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+
+class DbType:
+    """ Tipo de datos de Oracle, comparable por identidad como en cx_Oracle."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __repr__(self) -> str:
+        return f"<DbType {self.name}>"
+
+
+DB_TYPE_NUMBER = DbType("DB_TYPE_NUMBER")
+DB_TYPE_VARCHAR = DbType("DB_TYPE_VARCHAR")
+DB_TYPE_NVARCHAR = DbType("DB_TYPE_NVARCHAR")
+DB_TYPE_CHAR = DbType("DB_TYPE_CHAR")
+DB_TYPE_DATE = DbType("DB_TYPE_DATE")
+DB_TYPE_TIMESTAMP = DbType("DB_TYPE_TIMESTAMP")
+DB_TYPE_TIMESTAMP_LTZ = DbType("DB_TYPE_TIMESTAMP_LTZ")
+DB_TYPE_TIMESTAMP_TZ = DbType("DB_TYPE_TIMESTAMP_TZ")
+DB_TYPE_BINARY_FLOAT = DbType("DB_TYPE_BINARY_FLOAT")
+DB_TYPE_BINARY_DOUBLE = DbType("DB_TYPE_BINARY_DOUBLE")
+DB_TYPE_RAW = DbType("DB_TYPE_RAW")
+DB_TYPE_LONG = DbType("DB_TYPE_LONG")
+DB_TYPE_LONG_RAW = DbType("DB_TYPE_LONG_RAW")
+DB_TYPE_CLOB = DbType("DB_TYPE_CLOB")
+DB_TYPE_NCLOB = DbType("DB_TYPE_NCLOB")
+DB_TYPE_BLOB = DbType("DB_TYPE_BLOB")
+DB_TYPE_CURSOR = DbType("DB_TYPE_CURSOR")
+DB_TYPE_OBJECT = DbType("DB_TYPE_OBJECT")
+NUMBER, STRING, DATETIME, TIMESTAMP = DB_TYPE_NUMBER, DB_TYPE_VARCHAR, DB_TYPE_DATE, DB_TYPE_TIMESTAMP
+CLOB, NCLOB, BLOB, BINARY, CURSOR = DB_TYPE_CLOB, DB_TYPE_NCLOB, DB_TYPE_BLOB, DB_TYPE_RAW, DB_TYPE_CURSOR
+
+SPOOL_ATTRVAL_NOWAIT = 0
+SPOOL_ATTRVAL_WAIT = 1
+SPOOL_ATTRVAL_FORCEGET = 2
+SPOOL_ATTRVAL_TIMEDWAIT = 3
+
+LOB_TYPES = (DB_TYPE_CLOB, DB_TYPE_NCLOB, DB_TYPE_BLOB)
+
+
+class Error(Exception):
+    pass
+
+
+class DatabaseError(Error):
+    pass
+
+
+class IntegrityError(DatabaseError):
+    pass
+
+
+class OperationalError(DatabaseError):
+    pass
+
+
+class InterfaceError(Error):
+    pass
+
+
+class _Config:
+    """ Latencias simuladas en segundos."""
+
+    def __init__(self) -> None:
+        self.round_trip = 0.0
+        self.connect = 0.0
+
+
+CONFIG = _Config()
+STATS: Counter = Counter()
+_stats_lock = threading.Lock()
+
+
+def configure(round_trip: Optional[float] = None, connect: Optional[float] = None) -> None:
+    """Configurar las latencias simuladas.
+
+    Args:
+        round_trip (float, optional): Segundos por viaje a la base de datos (execute, fetch, lectura de
+            Lob, commit, ping).
+        connect (float, optional): Segundos para abrir una conexión o sesión.
+    """
+    if round_trip is not None:
+        CONFIG.round_trip = round_trip
+    if connect is not None:
+        CONFIG.connect = connect
+
+
+def reset_stats() -> None:
+    """Reiniciar los contadores de viajes, conexiones y sentencias."""
+    with _stats_lock:
+        STATS.clear()
+
+
+def _count(name: str, amount: int = 1) -> None:
+    with _stats_lock:
+        STATS[name] += amount
+
+
+def _round_trip() -> None:
+    _count('round_trips')
+    if CONFIG.round_trip:
+        time.sleep(CONFIG.round_trip)
+
+
+class Table:
+    """ Resultado que entrega la base de datos falsa para las consultas que empiezan con un prefijo.
+
+    rows puede ser una lista de tuplas o una función que recibe los parámetros de la consulta y retorna
+    las filas, para simular filtros o porciones.
+    """
+
+    def __init__(self, description: Sequence[Tuple], rows: Union[List[Tuple], Callable]) -> None:
+        self.description = [tuple(column) for column in description]
+        self.rows = rows
+
+    def select(self, parameters) -> List[Tuple]:
+        return list(self.rows(parameters) if callable(self.rows) else self.rows)
+
+
+_tables: Dict[str, Table] = {}
+
+
+def register_table(prefix: str, description: Sequence[Tuple], rows: Union[List[Tuple], Callable]) -> None:
+    """Registrar el resultado de las consultas que empiezan con prefix (sin distinguir mayúsculas).
+
+    Args:
+        prefix (str): Inicio del texto SQL.
+        description (Sequence[Tuple]): cursor.description del resultado.
+        rows (Union[List[Tuple], Callable]): Filas o función que recibe los parámetros y las retorna.
+    """
+    _tables[" ".join(prefix.split()).lower()] = Table(description, rows)
+
+
+def clear_tables() -> None:
+    """Eliminar los resultados registrados."""
+    _tables.clear()
+    _blocks.clear()
+
+
+class Block:
+    """ Bloque PL/SQL que abre REF CURSORs de salida y retorna resultados implícitos."""
+
+    def __init__(self, cursors: Dict[str, str], implicit: Sequence[str]) -> None:
+        self.cursors = dict(cursors)
+        self.implicit = list(implicit)
+
+
+_blocks: Dict[str, Block] = {}
+
+
+def register_block(prefix: str, cursors: Optional[Dict[str, str]] = None, implicit: Sequence[str] = ()) -> None:
+    """Registrar un bloque PL/SQL cuyos resultados son consultas registradas con register_table.
+
+    Args:
+        prefix (str): Inicio del texto del bloque.
+        cursors (Dict[str, str], optional): Parámetro de salida REF CURSOR y la consulta que abre.
+        implicit (Sequence[str], optional): Consultas retornadas con DBMS_SQL.RETURN_RESULT, en orden.
+    """
+    _blocks[" ".join(prefix.split()).lower()] = Block(cursors or {}, implicit)
+
+
+def _find_block(statement: str) -> Optional[Block]:
+    normalized = " ".join(statement.split()).lower()
+    matches = [prefix for prefix in _blocks if normalized.startswith(prefix)]
+    return _blocks[max(matches, key=len)] if matches else None
+
+
+def _find_table(statement: str) -> Optional[Table]:
+    normalized = " ".join(statement.split()).lower()
+    matches = [prefix for prefix in _tables if normalized.startswith(prefix)]
+    return _tables[max(matches, key=len)] if matches else None
+
+
+def column(name: str, type_code: DbType, size: int = 0, precision: int = 0, scale: int = 0,
+           nullable: bool = True) -> Tuple:
+    """Construir la descripción de una columna como en cursor.description.
+
+    Returns:
+        Tuple: (name, type_code, display_size, internal_size, precision, scale, null_ok).
+    """
+    return name.upper(), type_code, size, size, precision, scale, nullable
+
+
+def sample_table(rows: int, lob_size: int = 0, text_size: int = 20) -> Tuple[List[Tuple], List[Tuple]]:
+    """Generar una tabla representativa: ID, NAME, AMOUNT, CREATED y opcionalmente NOTES (CLOB).
+
+    Args:
+        rows (int): Cantidad de filas.
+        lob_size (int, optional): Caracteres del CLOB NOTES; 0 para no incluir la columna.
+        text_size (int, optional): Caracteres de NAME.
+
+    Returns:
+        Tuple[List[Tuple], List[Tuple]]: Descripción y filas.
+    """
+    description = [column('ID', DB_TYPE_NUMBER, 22, 10, 0, False),
+                   column('NAME', DB_TYPE_VARCHAR, text_size),
+                   column('AMOUNT', DB_TYPE_NUMBER, 22, 12, 2),
+                   column('CREATED', DB_TYPE_DATE, 7)]
+    if lob_size:
+        description.append(column('NOTES', DB_TYPE_CLOB, 4000))
+    start = datetime.datetime(2024, 1, 1)
+    notes = "x" * lob_size
+    data = []
+    for number in range(rows):
+        row = (number, f"name {number}".ljust(text_size)[:text_size], number * 1.25,
+               start + datetime.timedelta(minutes=number))
+        data.append(row + (notes,) if lob_size else row)
+    return description, data
+
+
+def init_oracle_client(lib_dir: Optional[str] = None, **kwargs) -> None:
+    """No hace nada; el driver falso no usa el cliente de Oracle."""
+
+
+def clientversion() -> Tuple[int, ...]:
+    return 19, 0, 0, 0, 0
+
+
+class LOB:
+    """ Localizador de un Lob; cada lectura cuesta un viaje."""
+
+    def __init__(self, value: Union[str, bytes], type_code: DbType) -> None:
+        self.__value = value
+        self.type = type_code
+
+    def read(self, offset: int = 1, amount: Optional[int] = None):
+        _round_trip()
+        if amount is None:
+            return self.__value[offset - 1:]
+        return self.__value[offset - 1:offset - 1 + amount]
+
+    def size(self) -> int:
+        _round_trip()
+        return len(self.__value)
+
+    def getchunksize(self) -> int:
+        return 8132
+
+    def __str__(self) -> str:
+        return str(self.read())
+
+
+class Var:
+    """ Variable de enlace o de salida."""
+
+    def __init__(self, type_code, size: int = 0, arraysize: int = 1, outconverter=None, **kwargs) -> None:
+        self.type = type_code
+        self.size = size
+        self.outconverter = outconverter
+        self.__values = [None] * max(arraysize, 1)
+
+    def getvalue(self, pos: int = 0):
+        return self.__values[pos]
+
+    def setvalue(self, pos: int, value) -> None:
+        self.__values[pos] = value
+
+
+class BatchError:
+    """ Error de una fila en executemany(batcherrors=True)."""
+
+    def __init__(self, offset: int, message: str) -> None:
+        self.offset = offset
+        self.message = message
+        self.code = int(message[4:9]) if message.startswith("ORA-") else 0
+
+
+class Cursor:
+    """ Cursor con buffer de prefetch y fetch por bloques de arraysize."""
+
+    def __init__(self, connection: "Connection") -> None:
+        self.connection = connection
+        self.arraysize = 100
+        self.prefetchrows = 2
+        self.description = None
+        self.statement: Optional[str] = None
+        self.rowcount = 0
+        self.rowfactory = None
+        self.outputtypehandler = None
+        self.bindvars = None
+        self.__opened: Optional[Tuple] = None
+        self.__implicit: List["Cursor"] = []
+        self.__pending: List[Tuple] = []
+        self.__buffer: List[Tuple] = []
+        self.__batch_errors: List[BatchError] = []
+        self.__row_counts: List[int] = []
+
+    def __enter__(self) -> "Cursor":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def close(self) -> None:
+        self.__pending, self.__buffer = [], []
+
+    def prepare(self, statement: str) -> None:
+        self.statement = statement
+
+    def setinputsizes(self, *args, **kwargs) -> None:
+        pass
+
+    def var(self, type_code, size: int = 0, arraysize: int = 1, outconverter=None, **kwargs) -> Var:
+        return Var(type_code, size, arraysize, outconverter, **kwargs)
+
+    def __handler_types(self, description) -> List:
+        """Consultar el outputtypehandler por cada columna como lo hace el driver."""
+        handler = self.outputtypehandler or self.connection.outputtypehandler
+        if handler is None:
+            return [None] * len(description)
+        return [handler(self, name, type_code, size, precision, scale)
+                for name, type_code, _, size, precision, scale, _ in description]
+
+    def execute(self, statement: Optional[str], parameters=None, **kwargs):
+        self.connection._check()
+        if statement is not None:
+            self.statement = statement
+        _count('executes')
+        _round_trip()
+        parameters = parameters if parameters is not None else kwargs
+        self.__implicit = []
+        block = _find_block(self.statement)
+        if block is not None:
+            # Los resultados del bloque quedan abiertos en el servidor; sus filas llegan con el primer fetch.
+            for name, query in block.cursors.items():
+                if isinstance(parameters[name], Cursor):
+                    # Un cursor enlazado como REF CURSOR trae sus primeras filas en este mismo viaje.
+                    parameters[name]._open(_find_table(query), parameters, prefetch=True)
+                else:
+                    parameters[name].setvalue(0, self.__child(query, parameters))
+            self.__implicit = [self.__child(query, parameters) for query in block.implicit]
+        table = _find_table(self.statement) if block is None else None
+        if table is None:
+            self.description = None
+            self.__pending, self.__buffer = [], []
+            self.rowcount = 1
+            return None
+        self.description = table.description
+        self.__load(table, parameters, self.prefetchrows)
+        return self
+
+    def __child(self, query: str, parameters) -> "Cursor":
+        child = Cursor(self.connection)
+        child._open(_find_table(query), parameters)
+        return child
+
+    def _open(self, table: "Table", parameters, prefetch: bool = False) -> None:
+        """Abrir el cursor como REF CURSOR o resultado implícito de un bloque."""
+        self.description = table.description
+        if prefetch:
+            self.__load(table, parameters, self.prefetchrows)
+        else:
+            self.__opened = (table, parameters)
+
+    def __load(self, table: "Table", parameters, prefetch: int) -> None:
+        """Obtener las filas del resultado, definiendo las columnas con el outputtypehandler actual."""
+        rows = table.select(parameters)
+        variables = self.__handler_types(table.description)
+        lob_columns = [index for index, item in enumerate(table.description) if item[1] in LOB_TYPES]
+        if lob_columns:
+            rows = [self.__lob_row(row, lob_columns, variables) for row in rows]
+        self.rowcount = 0
+        # El execute trae hasta prefetchrows filas en el mismo viaje.
+        self.__buffer = rows[:prefetch]
+        self.__pending = rows[prefetch:]
+
+    def getimplicitresults(self) -> List["Cursor"]:
+        return list(self.__implicit)
+
+    def __lob_row(self, row: Tuple, lob_columns: List[int], variables: List) -> Tuple:
+        values = list(row)
+        for index in lob_columns:
+            inline = variables[index] is not None and variables[index].type in (DB_TYPE_LONG, DB_TYPE_LONG_RAW)
+            if values[index] is not None and not inline:
+                values[index] = LOB(values[index], self.description[index][1])
+        return tuple(values)
+
+    def executemany(self, statement: Optional[str], parameters, batcherrors: bool = False,
+                    arraydmlrowcounts: bool = False, **kwargs) -> None:
+        self.connection._check()
+        if statement is not None:
+            self.statement = statement
+        rows = list(parameters) if not isinstance(parameters, int) else [()] * parameters
+        _count('executes')
+        _round_trip()
+        self.__batch_errors = []
+        failed = {index for index, row in enumerate(rows) if self.connection._rejects(row)}
+        if failed and not batcherrors:
+            raise IntegrityError("ORA-00001: unique constraint violated")
+        self.__batch_errors = [BatchError(index, "ORA-00001: unique constraint violated") for index in sorted(failed)]
+        self.__row_counts = [0 if index in failed else 1 for index in range(len(rows))]
+        self.rowcount = len(rows) - len(failed)
+
+    def getbatcherrors(self) -> List[BatchError]:
+        return self.__batch_errors
+
+    def getarraydmlrowcounts(self) -> List[int]:
+        return self.__row_counts
+
+    def __shape(self, row: Tuple):
+        return self.rowfactory(*row) if self.rowfactory is not None else row
+
+    def __fill(self) -> bool:
+        """Traer el siguiente bloque de arraysize filas en un viaje."""
+        if self.__opened is not None:
+            # Las columnas de un REF CURSOR se definen en el primer fetch.
+            table, parameters = self.__opened
+            self.__opened = None
+            self.__load(table, parameters, 0)
+        if not self.__pending:
+            return False
+        _round_trip()
+        self.__buffer.extend(self.__pending[:self.arraysize])
+        self.__pending = self.__pending[self.arraysize:]
+        return True
+
+    def fetchone(self):
+        if not self.__buffer and not self.__fill():
+            return None
+        self.rowcount += 1
+        return self.__shape(self.__buffer.pop(0))
+
+    def fetchmany(self, size: Optional[int] = None) -> List:
+        size = size or self.arraysize
+        while len(self.__buffer) < size and self.__fill():
+            pass
+        rows, self.__buffer = self.__buffer[:size], self.__buffer[size:]
+        self.rowcount += len(rows)
+        return [self.__shape(row) for row in rows]
+
+    def fetchall(self) -> List:
+        while self.__fill():
+            pass
+        rows, self.__buffer = self.__buffer, []
+        self.rowcount += len(rows)
+        return [self.__shape(row) for row in rows]
+
+
+class Connection:
+    """ Conexión independiente o sesión de un SessionPool."""
+
+    def __init__(self, user: Optional[str] = None, password: Optional[str] = None, dsn: Optional[str] = None,
+                 pool: Optional["SessionPool"] = None, **kwargs) -> None:
+        if CONFIG.connect:
+            time.sleep(CONFIG.connect)
+        _count('connects')
+        self.username = user
+        self.dsn = dsn
+        self.stmtcachesize = 20
+        self.autocommit = False
+        self.outputtypehandler = None
+        self.tag = None
+        self.broken = False
+        self.reject: Optional[Callable] = None
+        self._pool = pool
+
+    def __enter__(self) -> "Connection":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def _check(self) -> None:
+        if self.broken:
+            raise DatabaseError("ORA-03113: end-of-file on communication channel")
+
+    def _rejects(self, row) -> bool:
+        return self.reject is not None and bool(self.reject(row))
+
+    def cursor(self) -> Cursor:
+        self._check()
+        return Cursor(self)
+
+    def commit(self) -> None:
+        self._check()
+        _count('commits')
+        _round_trip()
+
+    def rollback(self) -> None:
+        self._check()
+        _count('rollbacks')
+        _round_trip()
+
+    def ping(self) -> None:
+        self._check()
+        _round_trip()
+
+    def cancel(self) -> None:
+        _count('cancels')
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.release(self)
+
+
+def connect(user: Optional[str] = None, password: Optional[str] = None, dsn: Optional[str] = None,
+            **kwargs) -> Connection:
+    """Abrir una conexión independiente."""
+    return Connection(user, password, dsn, **kwargs)
+
+
+class SessionPool:
+    """ Pool de sesiones con min, max, increment y getmode como el de cx_Oracle."""
+
+    def __init__(self, user: Optional[str] = None, password: Optional[str] = None, dsn: Optional[str] = None,
+                 min: int = 1, max: int = 2, increment: int = 1, threaded: bool = True,
+                 getmode: int = SPOOL_ATTRVAL_NOWAIT, stmtcachesize: int = 20, timeout: int = 0,
+                 wait_timeout: int = 0, max_lifetime_session: int = 0, session_callback=None, **kwargs) -> None:
+        self.username = user
+        self.dsn = dsn
+        self.min = min
+        self.max = max
+        self.increment = increment
+        self.getmode = getmode
+        self.stmtcachesize = stmtcachesize
+        self.timeout = timeout
+        self.wait_timeout = wait_timeout
+        self.max_lifetime_session = max_lifetime_session
+        self.session_callback = session_callback
+        self.__password = password
+        self.__condition = threading.Condition()
+        self.__idle: List[Connection] = [Connection(user, password, dsn, pool=self) for _ in range(min)]
+        self.__opened = min
+        self.__busy = 0
+
+    @property
+    def opened(self) -> int:
+        return self.__opened
+
+    @property
+    def busy(self) -> int:
+        return self.__busy
+
+    def acquire(self, user: Optional[str] = None, password: Optional[str] = None, cclass: Optional[str] = None,
+                purity: int = 0, tag: Optional[str] = None, matchanytag: bool = False, **kwargs) -> Connection:
+        with self.__condition:
+            deadline = time.monotonic() + self.wait_timeout / 1000 if self.getmode == SPOOL_ATTRVAL_TIMEDWAIT else None
+            while not self.__idle and self.__opened >= self.max and self.getmode != SPOOL_ATTRVAL_FORCEGET:
+                if self.getmode == SPOOL_ATTRVAL_NOWAIT:
+                    raise DatabaseError("ORA-24418: Cannot open further sessions.")
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise DatabaseError("ORA-24459: OCISessionGet() timed out waiting for pool to create new connections")
+                self.__condition.wait(remaining)
+            new = not self.__idle
+            if new:
+                cnx = Connection(self.username, self.__password, self.dsn, pool=self)
+                self.__opened += 1
+            else:
+                # Con etiqueta se prefiere una sesión que ya la tenga, como el pool de Oracle.
+                tagged = [index for index, idle in enumerate(self.__idle) if tag is not None and idle.tag == tag]
+                cnx = self.__idle.pop(tagged[-1] if tagged else -1)
+            self.__busy += 1
+            _count('acquires')
+        if callable(self.session_callback) and (new or (tag is not None and cnx.tag != tag and not matchanytag)):
+            _count('session_callbacks')
+            self.session_callback(cnx, tag)
+        return cnx
+
+    def release(self, connection: Connection, tag: Optional[str] = None) -> None:
+        with self.__condition:
+            self.__busy -= 1
+            if tag is not None:
+                connection.tag = tag
+            self.__idle.append(connection)
+            self.__condition.notify()
+
+    def drop(self, connection: Connection) -> None:
+        with self.__condition:
+            self.__busy -= 1
+            self.__opened -= 1
+            self.__condition.notify()
+
+    def close(self, force: bool = False) -> None:
+        with self.__condition:
+            self.__idle.clear()
+            self.__opened = self.__busy
+
+
+def install():
+    """Registrar este módulo como cx_Oracle; se debe llamar antes de importar OracleCnx.
+
+    Returns:
+        module: El driver falso.
+    """
+    module = sys.modules[__name__]
+    sys.modules['cx_Oracle'] = module
+    return module
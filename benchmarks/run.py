@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks de OracleCnx contra el driver falso de benchmarks/fake_oracle.py.
+
+Reporta filas por segundo, memoria máxima y latencia p50/p99 por escenario, y compara contra una línea
+base guardada para detectar regresiones:
+
+    python benchmarks/run.py --save-baseline benchmarks/baseline.json
+    python benchmarks/run.py --compare benchmarks/baseline.json --tolerance 0.15
+
+@author: Jhonatan Martínez
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fake_oracle  # noqa: E402
+
+fake_oracle.install()
+
+from loguru import logger  # noqa: E402
+from OracleCnx.oracle_async import AsyncDB  # noqa: E402
+from OracleCnx.oracle_cnx import ConnectionDB  # noqa: E402
+from OracleCnx.oracle_pool import PoolDB  # noqa: E402
+
+SETUP = {'host': 'localhost', 'port': '1521', 'sdi': 'BENCH', 'user': 'bench', 'password': 'bench',
+         'driver': ''}
+QUERY = "select id, name, amount, created from bench_rows"
+LOB_QUERY = "select id, name, amount, created, notes from bench_lobs"
+LOOKUP_QUERY = "select id, name, amount, created from bench_lookup where id = :id"
+PAGE_QUERIES = [f"select id, name, amount, created from bench_page_{number}" for number in range(5)]
+PAGE_BLOCK = "begin bench.page(:summary, :detail); end;"
+ALTER_SESSION = "alter session set nls_date_format = 'YYYY-MM-DD HH24:MI:SS'"
+
+
+class Scenario:
+    """ Escenario de benchmark: una función que ejecuta una operación y retorna las filas procesadas."""
+
+    def __init__(self, name: str, description: str, setup: Callable[[], Callable[[], int]]) -> None:
+        self.name = name
+        self.description = description
+        self.setup = setup
+
+
+def prepare_tables(rows: int, lob_rows: int, lob_size: int) -> None:
+    """Registrar las tablas de los escenarios en el driver falso."""
+    fake_oracle.clear_tables()
+    description, data = fake_oracle.sample_table(rows)
+    fake_oracle.register_table("select id, name, amount, created from bench_rows", description, data)
+    description, data = fake_oracle.sample_table(lob_rows, lob_size=lob_size)
+    fake_oracle.register_table("select id, name, amount, created, notes from bench_lobs", description, data)
+    description, data = fake_oracle.sample_table(1)
+    fake_oracle.register_table("select id, name, amount, created from bench_lookup", description, data)
+    description, data = fake_oracle.sample_table(20)
+    for query in PAGE_QUERIES:
+        fake_oracle.register_table(query, description, data)
+    fake_oracle.register_block(PAGE_BLOCK, cursors={'summary': PAGE_QUERIES[0], 'detail': PAGE_QUERIES[1]},
+                               implicit=PAGE_QUERIES[2:])
+
+
+def scenarios(args) -> List[Scenario]:
+    """Construir los escenarios con los parámetros de la línea de comandos."""
+
+    def connection(**kwargs) -> ConnectionDB:
+        return ConnectionDB(SETUP, persistent=True, **kwargs)
+
+    def read(datatype: str, fetch_profile: str = 'auto'):
+        def setup():
+            cnx = connection(fetch_profile=fetch_profile)
+            return lambda: len_rows(cnx.read_data(QUERY, datatype=datatype))
+        return setup
+
+    def lob(lob_fetch: str):
+        def setup():
+            cnx = connection(lob_fetch=lob_fetch)
+            return lambda: len_rows(cnx.read_data(LOB_QUERY, datatype='list'))
+        return setup
+
+    def batches():
+        cnx = connection()
+        return lambda: sum(len(rows) for rows in cnx.read_batches(QUERY, batch_size=args.batch_size))
+
+    def lookup(fetch_profile: str):
+        def setup():
+            cnx = connection()
+            return lambda: sum(len_rows(cnx.read_data(LOOKUP_QUERY, {'id': number}, fetch_profile=fetch_profile))
+                               for number in range(args.lookups))
+        return setup
+
+    def pool_contention():
+        pool = PoolDB(setup=dict(SETUP, sdi='BENCH_POOL'), pool_size=args.pool_size)
+        executor = ThreadPoolExecutor(max_workers=args.threads)
+
+        def operation() -> int:
+            futures = [executor.submit(pool.read_data, LOOKUP_QUERY, {'id': number}, 'list', 'lookup')
+                       for number in range(args.lookups)]
+            # Las consultas que no obtienen sesión retornan None y no suman filas.
+            return sum(len_rows(future.result()) for future in futures)
+
+        operation.close = lambda: (executor.shutdown(), pool.close())
+        return operation
+
+    def async_gather():
+        loop = asyncio.new_event_loop()
+        db = AsyncDB(dict(SETUP, sdi='BENCH_ASYNC'), pool_min=1, pool_max=args.pool_size)
+
+        async def gather() -> int:
+            results = await asyncio.gather(*[db.read_data(LOOKUP_QUERY, {'id': number}, 'list', 'lookup')
+                                             for number in range(args.lookups)])
+            return sum(len_rows(result) for result in results)
+
+        operation = lambda: loop.run_until_complete(gather())  # noqa: E731
+        operation.close = lambda: (loop.run_until_complete(db.close()), loop.close())
+        return operation
+
+    def async_read_many():
+        loop = asyncio.new_event_loop()
+        db = AsyncDB(dict(SETUP, sdi='BENCH_ASYNC_MANY'), pool_min=1, pool_max=args.pool_size)
+        queries = [(LOOKUP_QUERY, {'id': number}) for number in range(args.lookups)]
+
+        async def read_many() -> int:
+            results = await db.read_many(queries, 'list', fetch_profile='lookup')
+            return sum(len_rows(result.data) for result in results)
+
+        operation = lambda: loop.run_until_complete(read_many())  # noqa: E731
+        operation.close = lambda: (loop.run_until_complete(db.close()), loop.close())
+        return operation
+
+    def pool_session(tagged: bool):
+        def setup():
+            def init_session(cnx, requested_tag):
+                with cnx.cursor() as cursor:
+                    cursor.execute(ALTER_SESSION)
+
+            if not tagged:
+                pool = PoolDB(setup=dict(SETUP, sdi='BENCH_ALTER'), pool_size=args.pool_size)
+
+                def operation() -> int:
+                    rows = 0
+                    for number in range(args.lookups):
+                        pool.execute_query(ALTER_SESSION)
+                        rows += len_rows(pool.read_data(LOOKUP_QUERY, {'id': number}, 'list', 'lookup'))
+                    return rows
+            else:
+                pool = PoolDB(setup=dict(SETUP, sdi='BENCH_TAGGED'), pool_size=args.pool_size,
+                              session_callback=init_session, tag='nls=iso')
+
+                def operation() -> int:
+                    return sum(len_rows(pool.read_data(LOOKUP_QUERY, {'id': number}, 'list', 'lookup'))
+                               for number in range(args.lookups))
+
+            operation.close = pool.close
+            return operation
+        return setup
+
+    def page(multi: bool):
+        def setup():
+            pool = PoolDB(setup=dict(SETUP, sdi='BENCH_PAGE_MULTI' if multi else 'BENCH_PAGE'),
+                          pool_size=args.pool_size)
+            if multi:
+                operation = lambda: sum(len_rows(data) for data in pool.read_multi(  # noqa: E731
+                    PAGE_BLOCK, cursors=['summary', 'detail'], fetch_profile='lookup').values())
+            else:
+                operation = lambda: sum(len_rows(pool.read_data(query, fetch_profile='lookup'))  # noqa: E731
+                                        for query in PAGE_QUERIES)
+            operation.close = pool.close
+            return operation
+        return setup
+
+    return [
+        Scenario('read_dict', "read_data datatype='dict'", read('dict')),
+        Scenario('read_list', "read_data datatype='list'", read('list')),
+        Scenario('read_columnar', "read_data datatype='columnar'", read('columnar')),
+        Scenario('read_bulk_profile', "read_data datatype='list', fetch_profile='bulk'", read('list', 'bulk')),
+        Scenario('read_batches', f"read_batches batch_size={args.batch_size}", batches),
+        Scenario('lob_inline', "CLOB leído en línea (lob_fetch='inline')", lob('inline')),
+        Scenario('lob_stream', "CLOB leído por localizador (lob_fetch='stream')", lob('stream')),
+        Scenario('lookup_auto', f"{args.lookups} consultas de una fila, fetch_profile='auto'", lookup('auto')),
+        Scenario('lookup_profile', f"{args.lookups} consultas de una fila, fetch_profile='lookup'", lookup('lookup')),
+        Scenario('pool_contention', f"{args.lookups} consultas en {args.threads} hilos, pool de {args.pool_size}",
+                 pool_contention),
+        Scenario('async_gather', f"{args.lookups} consultas con asyncio.gather, pool de {args.pool_size}",
+                 async_gather),
+        Scenario('async_read_many', f"{args.lookups} consultas con read_many, pool de {args.pool_size}",
+                 async_read_many),
+        Scenario('pool_alter_session', f"{args.lookups} consultas con ALTER SESSION antes de cada una",
+                 pool_session(False)),
+        Scenario('pool_tagged', f"{args.lookups} consultas con sesiones etiquetadas y session_callback",
+                 pool_session(True)),
+        Scenario('page_read_data', f"{len(PAGE_QUERIES)} resultados de una página con read_data", page(False)),
+        Scenario('page_read_multi', f"{len(PAGE_QUERIES)} resultados de una página con un solo read_multi", page(True)),
+    ]
+
+
+def len_rows(data) -> int:
+    """Contar las filas de un resultado de read_data con cualquier datatype."""
+    if data is None:
+        return 0
+    if isinstance(data, list) and len(data) == 2 and isinstance(data[1], list) and isinstance(data[0], list):
+        return len(data[1])
+    if isinstance(data, dict):
+        return len(next(iter(data.values()), ()))
+    return len(data)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Percentil con interpolación lineal."""
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    position = (len(ordered) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def measure(scenario: Scenario, repeat: int, warmup: int) -> Dict[str, float]:
+    """Ejecutar un escenario y medir latencia, filas por segundo y memoria máxima."""
+    operation = scenario.setup()
+    try:
+        for _ in range(warmup):
+            operation()
+        latencies = []
+        rows = 0
+        gc.collect()
+        for _ in range(repeat):
+            start = time.perf_counter()
+            rows += operation()
+            latencies.append(time.perf_counter() - start)
+        # La memoria se mide en una ejecución aparte porque tracemalloc hace más lenta la ejecución.
+        gc.collect()
+        tracemalloc.start()
+        operation()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        close = getattr(operation, 'close', None)
+        if close is not None:
+            close()
+    total = sum(latencies)
+    return {
+        'rows': rows // repeat,
+        'rows_per_second': rows / total if total else 0.0,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'peak_mb': peak / (1024 * 1024),
+    }
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Comparar los resultados con la línea base.
+
+    Returns:
+        List[str]: Regresiones encontradas.
+    """
+    regressions = []
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            continue
+        if current['rows_per_second'] < previous['rows_per_second'] * (1 - tolerance):
+            regressions.append(f"{name}: rows/s {current['rows_per_second']:.0f} < {previous['rows_per_second']:.0f}")
+        if current['p99_ms'] > previous['p99_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p99 {current['p99_ms']:.2f} ms > {previous['p99_ms']:.2f} ms")
+        if current['peak_mb'] > previous['peak_mb'] * (1 + tolerance) + 0.5:
+            regressions.append(f"{name}: peak {current['peak_mb']:.1f} MB > {previous['peak_mb']:.1f} MB")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks de OracleCnx con un driver cx_Oracle falso.")
+    parser.add_argument('--rows', type=int, default=50000, help="Filas de la tabla principal.")
+    parser.add_argument('--lob-rows', type=int, default=2000, help="Filas de la tabla con CLOB.")
+    parser.add_argument('--lob-size', type=int, default=4000, help="Caracteres de cada CLOB.")
+    parser.add_argument('--lookups', type=int, default=200, help="Consultas de una fila por iteración.")
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--pool-size', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.2, help="Milisegundos por viaje a la base de datos.")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--only', nargs='*', help="Escenarios a ejecutar.")
+    parser.add_argument('--save-baseline', metavar='PATH', help="Guardar los resultados como línea base.")
+    parser.add_argument('--compare', metavar='PATH', help="Comparar contra una línea base guardada.")
+    parser.add_argument('--tolerance', type=float, default=0.15, help="Variación permitida frente a la línea base.")
+    parser.add_argument('--log', action='store_true', help="Mantener los logs de OracleCnx.")
+    parser.add_argument('--list', action='store_true', help="Listar los escenarios y terminar.")
+    args = parser.parse_args()
+
+    if args.list:
+        for scenario in scenarios(args):
+            print(f"{scenario.name:<20} {scenario.description}")
+        return 0
+
+    if not args.log:
+        logger.disable("OracleCnx")
+    fake_oracle.configure(round_trip=args.latency / 1000)
+    prepare_tables(args.rows, args.lob_rows, args.lob_size)
+
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {key: value for key, value in vars(args).items()
+                       if key not in ('only', 'save_baseline', 'compare', 'log', 'list')},
+        'scenarios': {},
+    }
+    print(f"{'scenario':<20} {'rows':>8} {'rows/s':>12} {'p50 ms':>9} {'p99 ms':>9} {'peak MB':>8} {'trips':>7}")
+    for scenario in scenarios(args):
+        if args.only and scenario.name not in args.only:
+            continue
+        fake_oracle.reset_stats()
+        result = measure(scenario, args.repeat, args.warmup)
+        result['round_trips'] = fake_oracle.STATS['round_trips'] // (args.repeat + args.warmup + 1)
+        results['scenarios'][scenario.name] = result
+        print(f"{scenario.name:<20} {result['rows']:>8} {result['rows_per_second']:>12.0f} "
+              f"{result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['peak_mb']:>8.1f} "
+              f"{result['round_trips']:>7}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print("No regressions against the baseline.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
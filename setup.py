@@ -21,6 +21,14 @@ INSTALL_REQUIRES = [
     'loguru>=0.7.2'
       ]
 
+#Paquetes opcionales para los modos de lectura columnar (datatype='numpy' o 'pandas')
+EXTRAS_REQUIRE = {
+    'numpy': ['numpy'],
+    'pandas': ['numpy', 'pandas>=1.2'],
+    'parquet': ['pyarrow'],
+    'thin': ['oracledb'],
+}
+
 setup(
     name=PACKAGE_NAME,
     version=VERSION,
@@ -31,6 +39,7 @@ setup(
     author_email=AUTHOR_EMAIL,
     url=URL,
     install_requires=INSTALL_REQUIRES,
+    extras_require=EXTRAS_REQUIRE,
     license=LICENSE,
     packages=find_packages(),
     include_package_data=True